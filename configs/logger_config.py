@@ -1,33 +1,56 @@
+import atexit
+import json
 import logging
 import os
-from logging.handlers import TimedRotatingFileHandler
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+from typing import Dict, List, Optional
 
+from configs.variable_config import LOGGING_CONFIG
 
-class LoggerConfig:
 
-    @staticmethod
-    def logger_config(
-        log_name: str,
-        log_file: str = "logs/main_pipeline.log",
-        log_level: int = logging.INFO,
-    ):
-        # Lấy thư mục gốc của project (cmc-project/)
-        # __file__ = /home/duc_le/cmc-project/config/logger_config.py
-        # dirname(__file__) = /home/duc_le/cmc-project/config
-        # dirname(dirname(__file__)) = /home/duc_le/cmc-project
-        root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+class JsonFormatter(logging.Formatter):
+    """Mỗi bản ghi là 1 dòng JSON: ts, level, process, logger, msg và các trường
+    truyền qua extra={"fields": {...}}."""
 
-        # Đảm bảo thư mục logs tồn tại
-        log_dir = os.path.join(root_dir, "logs")
-        os.makedirs(log_dir, exist_ok=True)
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S")
+            + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "process": record.processName,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if isinstance(fields, dict):
+            entry.update(fields)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
 
-        base_path = os.path.join(root_dir, log_file)
 
-        # formatter
-        formatter = logging.Formatter(
+class LoggerConfig:
+    # log_file -> handler ghi ra file/console, dùng chung cho mọi logger (mở file 1 lần)
+    _handlers: Dict[str, List[logging.Handler]] = {}
+    # log_file -> QueueHandler gắn vào logger khi bật ghi log bất đồng bộ
+    _queue_handlers: Dict[str, QueueHandler] = {}
+    _listeners: List[QueueListener] = []
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _formatter() -> logging.Formatter:
+        if LOGGING_CONFIG.get("format") == "json":
+            return JsonFormatter()
+        return logging.Formatter(
             "%(asctime)s - %(processName)s - %(levelname)s - %(name)s - %(message)s"
         )
 
+    @classmethod
+    def _build_handlers(cls, base_path: str) -> List[logging.Handler]:
+        formatter = cls._formatter()
+
         # TimedRotatingFileHandler - Xoay vòng log mỗi ngày lúc nửa đêm
         # when='midnight' - Xoay vòng vào lúc 00:00:00 mỗi ngày
         # interval=1 - Mỗi 1 ngày
@@ -45,15 +68,72 @@ class LoggerConfig:
         file_handler.setFormatter(formatter)
         # Đặt suffix cho file backup theo định dạng ngày
         file_handler.suffix = "%Y-%m-%d"
+        handlers: List[logging.Handler] = [file_handler]
+
+        if LOGGING_CONFIG.get("console", True):
+            console_handler = logging.StreamHandler()
+            console_handler.setFormatter(formatter)
+            handlers.append(console_handler)
+        return handlers
+
+    @classmethod
+    def _handlers_for(cls, base_path: str) -> List[logging.Handler]:
+        """Handler gắn vào logger: QueueHandler (async) hoặc handler ghi trực tiếp."""
+        with cls._lock:
+            if base_path not in cls._handlers:
+                cls._handlers[base_path] = cls._build_handlers(base_path)
+            if not LOGGING_CONFIG.get("async", True):
+                return cls._handlers[base_path]
+
+            if base_path not in cls._queue_handlers:
+                # Thread nền ghi file/console; thread gọi log chỉ đẩy vào queue
+                log_queue: "queue.Queue" = queue.Queue(-1)
+                listener = QueueListener(
+                    log_queue, *cls._handlers[base_path], respect_handler_level=True
+                )
+                listener.start()
+                if not cls._listeners:
+                    atexit.register(cls.shutdown)
+                cls._listeners.append(listener)
+                cls._queue_handlers[base_path] = QueueHandler(log_queue)
+            return [cls._queue_handlers[base_path]]
+
+    @classmethod
+    def shutdown(cls):
+        """Ghi nốt các bản ghi còn trong queue (tự gọi khi process thoát)."""
+        with cls._lock:
+            listeners, cls._listeners = cls._listeners, []
+            cls._queue_handlers.clear()
+        for listener in listeners:
+            listener.stop()
+
+    @staticmethod
+    def logger_config(
+        log_name: str,
+        log_file: str = "logs/main_pipeline.log",
+        log_level: Optional[int] = None,
+    ):
+        # Lấy thư mục gốc của project (cmc-project/)
+        # __file__ = /home/duc_le/cmc-project/config/logger_config.py
+        # dirname(__file__) = /home/duc_le/cmc-project/config
+        # dirname(dirname(__file__)) = /home/duc_le/cmc-project
+        root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+        # Đảm bảo thư mục logs tồn tại
+        log_dir = os.path.join(root_dir, "logs")
+        os.makedirs(log_dir, exist_ok=True)
+
+        base_path = os.path.join(root_dir, log_file)
 
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(formatter)
+        if log_level is None:
+            log_level = logging.getLevelName(
+                str(LOGGING_CONFIG.get("level", "INFO")).upper()
+            )
 
         logger = logging.getLogger(log_name)
 
         if not logger.handlers:
-            list_handler = [file_handler, console_handler]
-            for h in list_handler:
+            for h in LoggerConfig._handlers_for(base_path):
                 logger.addHandler(h)
 
         logger.propagate = False
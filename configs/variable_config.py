@@ -11,24 +11,232 @@ MONGO_CONFIG = {
     "authSource": os.getenv("MONGO_AUTH", "admin"),
 }
 
+LOGGING_CONFIG = {
+    # DEBUG để xem chi tiết từng request API / từng batch ghi MongoDB
+    "level": os.getenv("LOG_LEVEL", "INFO"),
+    # "text" (mặc định) hoặc "json" (1 dòng JSON / bản ghi, kèm trường có cấu trúc)
+    "format": os.getenv("LOG_FORMAT", "text"),
+    # Ghi file/console bằng thread nền qua queue, thread gọi log không chờ I/O
+    "async": os.getenv("LOG_ASYNC", "1").lower() not in ("0", "false", "no"),
+    "console": os.getenv("LOG_CONSOLE", "1").lower() not in ("0", "false", "no"),
+}
+
 EXTRACT_DATA_CONFIG = {
     "database": "cmc_db",
     "historical_collection": "cmc",
+    # Lưu tiến độ backfill lịch sử theo symbol (resume sau crash)
+    "checkpoint_collection": "cmc_backfill_checkpoints",
     "symbols": ["eth", "bnb", "xrp"],
+    # Các interval cần lưu cho mọi symbol (mặc định chỉ interval gốc api.interval)
+    "intervals": ["15m", "1h", "4h", "1d"],
+    # Ghi đè theo symbol, vd: {"eth": ["15m", "1h", "1d"]}
+    "symbol_intervals": {},
+    # Interval được tính từ nến gốc đã lưu thay vì gọi API (phải là bội số của
+    # api.interval). Lịch sử có sẵn: python main.py rollup
+    "derived_intervals": ["1h", "4h", "1d"],
+    "rollup": {
+        # Số ngày nến gốc đọc mỗi batch khi dựng lại lịch sử
+        "batch_days": 30,
+        # Lúc khởi động tự dựng tiếp nến derived còn thiếu (từ watermark)
+        "catch_up_on_start": True,
+    },
+    # Xuất nến ra Parquet cho phân tích (python main.py export, cần pyarrow)
+    "export": {
+        # <output_dir>/<interval>/<SYMBOL>/<YYYY-MM>.parquet + _manifest.json
+        "output_dir": "exports/parquet",
+        # Số nến đọc từ cursor MongoDB mỗi lần (= 1 row group Parquet)
+        "batch_size": 5000,
+        "compression": "zstd",
+    },
     # Các cấu hình liên quan tới việc gọi API để extract dữ liệu
     "api": {
         # Template URL phải chứa các placeholder: {id}, {convertId}, {timeStart}, {timeEnd}, {interval}
         "url_template": (
             "https://api.coinmarketcap.com/data-api/v3.1/cryptocurrency/historical?id={id}&convertId={convertId}&timeStart={timeStart}&timeEnd={timeEnd}&interval={interval}"
         ),
-        # số giây cho mỗi lần request khi lùi về quá khứ
-        # API giới hạn 399 bản ghi => 399 * 15 phút = 99.75 giờ ≈ 4.16 ngày
-        # Dùng 4 ngày để an toàn
-        "batch_seconds": 4 * 24 * 3600,  # 4 ngày = 345600 giây
+        # Interval gốc: lưu trong historical_collection, các interval khác lưu ở
+        # collection thêm hậu tố (vd: cmc_1h)
+        "interval": "15m",
+        # API giới hạn 399 bản ghi/request. Độ dài mỗi window được tự tính theo
+        # interval: (399 - 1) * interval (15m ≈ 4.1 ngày, 1h ≈ 16.6 ngày)
+        "max_records_per_request": 399,
+        # Số window được fetch song song cho mỗi symbol khi backfill lịch sử
+        "backfill_workers": 8,
+        # Số lần thử lại một window lỗi trước khi bỏ qua
+        "window_retries": 2,
+        # Không lùi quá mốc này (CMC có dữ liệu từ 04/2013)
+        "backfill_earliest": "2013-04-01",
+        # Token bucket dùng chung cho mọi request tới CMC (thread pool + asyncio)
+        "rate_limit": {
+            "requests_per_second": 2.0,
+            "burst": 5,
+            # Khi bị 429: giảm tốc độ theo hệ số, không thấp hơn mức tối thiểu
+            "min_requests_per_second": 0.2,
+            "backoff_factor": 0.5,
+            # Mỗi request thành công tăng lại tốc độ thêm bước này
+            "recovery_step": 0.05,
+            # Số giây chờ khi 429 không có header Retry-After
+            "default_retry_after": 30,
+        },
+        # HTTP session đồng bộ dùng chung (requests.Session + connection pool)
+        "http": {
+            # None = tự tính theo max(backfill_workers, max_workers)
+            "pool_size": None,
+            "pool_connections": 4,
+            "timeout": 30,
+        },
+        # HTTP client async cho realtime (một connection pool keep-alive dùng chung)
+        "async_http": {
+            "pool_size": 100,
+            "keepalive_timeout": 60,
+            "timeout": 30,
+            "max_retries": 3,
+        },
         # convertId mặc định (cần chỉnh nếu muốn)
         "convert_id": 2781,
     },
-    # mapping symbol -> CMC id (chỉnh nếu cần)
+    # Cách lưu các cột thời gian của nến (datetime, time_open, time_close, ...)
+    "storage": {
+        # "string": 'YYYY-MM-DD HH:MM:SS' (mặc định, tương thích dữ liệu cũ)
+        # "datetime": BSON Date - nhỏ hơn, so sánh/range query nhanh hơn
+        # "epoch": số nguyên giây Unix
+        # Đổi mode xong cần chạy: python main.py migrate-datetime <mode>
+        "datetime_mode": "string",
+        # Cách bố trí nến:
+        # "document": 1 document/nến trong historical_collection (mặc định)
+        # "timeseries": historical_collection là time-series collection (cần datetime_mode="datetime")
+        # "bucket": 1 document/symbol/ngày chứa mảng cột trong bucket_collection,
+        #           historical_collection trở thành view trải phẳng để đọc như cũ
+        "layout": "document",
+        "timeseries_granularity": "minutes",
+        "bucket_collection": "cmc_buckets",
+    },
+    # Lịch poll realtime theo mốc đóng nến (thay cho poll cố định mỗi 60 giây)
+    "scheduler": {
+        # Chờ thêm sau mốc đóng nến để CMC kịp có dữ liệu
+        "close_delay_seconds": 20,
+        # Nến dự kiến chưa có thì poll lại sau số giây này
+        "late_poll_seconds": 30,
+        # Trễ quá lâu thì thôi poll nhanh, chờ mốc kế tiếp
+        "late_give_up_seconds": 600,
+    },
+    # Endpoint metrics kiểu Prometheus (http://host:port/metrics) của daemon
+    "metrics": {
+        "enabled": True,
+        "host": "127.0.0.1",
+        "port": 9108,
+    },
+    # Chạy realtime trên nhiều host: các instance chia nhau symbol qua MongoDB
+    # (mỗi symbol chỉ 1 instance poll, instance chết thì symbol chuyển sang instance khác)
+    "realtime_shards": {
+        "enabled": False,
+        "collection": "cmc_realtime_members",
+        # Không heartbeat quá số giây này thì coi như instance đã chết
+        "lease_seconds": 90,
+        "heartbeat_seconds": 30,
+    },
+    # Watermark (nến mới nhất mỗi symbol) giữ trong RAM cho realtime
+    "watermark": {
+        # Định kỳ đối chiếu lại với DB bằng 1 aggregation
+        "refresh_seconds": 3600,
+    },
+    # Bù nến thiếu ở giữa chuỗi (python main.py repair-gaps, hoặc task nền của realtime)
+    "gap_collection": "cmc_gap_repairs",
+    "gap_repair": {
+        "enabled": True,
+        # Chu kỳ task nền và số ngày gần nhất được quét mỗi lần
+        "interval_seconds": 6 * 3600,
+        "lookback_days": 7,
+        # Gap thử đủ số lần này mà CMC vẫn không có dữ liệu thì bỏ qua
+        "max_attempts": 3,
+    },
+    # Backfill phân tán: python main.py backfill-worker (nhiều process / nhiều host)
+    "backfill_queue": {
+        "collection": "cmc_backfill_work",
+        "job_collection": "cmc_backfill_jobs",
+        # Worker không heartbeat quá số giây này thì window được worker khác lấy lại
+        "lease_seconds": 120,
+        "heartbeat_seconds": 30,
+        # Số window chưa xong giữ sẵn cho mỗi symbol
+        "windows_ahead": 16,
+        # Số lần lease tối đa cho 1 window trước khi đánh dấu failed
+        "max_attempts": 3,
+        # Không có window để lease: chờ poll_seconds, quá idle_exit_seconds thì thoát
+        "poll_seconds": 5,
+        "idle_exit_seconds": 300,
+        # Số host chạy backfill-worker cùng lúc: api.rate_limit là tổng cho mọi
+        # host, mỗi process dùng rate_limit / (hosts * --processes)
+        "hosts": 1,
+    },
+    # python main.py benchmark: Fake CMC API + MongoDB (mongomock hoặc local)
+    "benchmark": {
+        "symbols": 10,
+        # Số ngày lịch sử của mỗi symbol (scenario historical / load)
+        "days": 30,
+        # Số vòng realtime (vòng đầu bù 7 ngày, các vòng sau là vòng ổn định)
+        "cycles": 5,
+        # Độ trễ / lỗi giả lập của Fake CMC API
+        "latency_ms": 50,
+        "jitter_ms": 20,
+        "error_rate": 0.0,
+        # Ghi đè rate limit để không đo chính rate limiter
+        "requests_per_second": 1000,
+        # "mock": mongomock trong RAM, "local": MongoDB theo MONGO_CONFIG
+        "mongo": "mock",
+        # Database riêng cho benchmark (bị xóa trước mỗi scenario)
+        "database": "cmc_bench",
+        "output_dir": "bench_results",
+        "seed": 42,
+        # --compare: chậm đi quá tỉ lệ này thì đánh dấu regression
+        "regression_threshold": 0.1,
+    },
+    # Cache response API của window lịch sử đã đóng trên đĩa (nén gzip, LRU)
+    "response_cache": {
+        "enabled": True,
+        "directory": "cache/responses",
+        "max_bytes": 512 * 1024 * 1024,
+        # Window chỉ được cache khi nến cuối đã đóng quá số giây này
+        "closed_after_seconds": 3600,
+        # Response rỗng có thể do CMC trả thiếu tạm thời, mặc định không cache
+        "cache_empty": False,
+        # Không đọc cache (vẫn ghi response mới); hoặc --no-cache trên dòng lệnh
+        "bypass": os.getenv("CMC_CACHE_BYPASS", "0").lower() in ("1", "true", "yes"),
+    },
+    # Lưu trạng thái các lệnh migration (resume khi bị dừng giữa chừng)
+    "migration_collection": "cmc_migrations",
+    # Stream backfill lịch sử: fetch → queue giới hạn → load (RAM không tăng theo lịch sử)
+    "stream": {
+        # Số DataFrame tối đa chờ ghi trong queue
+        "queue_size": 8,
+        # Số thread ghi MongoDB
+        "load_workers": 2,
+        # Gộp các window tới khi đủ số bản ghi này mới ghi
+        "flush_rows": 1000,
+    },
+    # Tra CMC ID hàng loạt + danh sách symbol động (python main.py symbols [--refresh])
+    "symbol_registry": {
+        # 1 request lấy mapping symbol -> id của mọi coin
+        "map_url": (
+            "https://api.coinmarketcap.com/data-api/v3/map/all?listing_status=active&start=1&limit=10000"
+        ),
+        # Top coin theo market cap ({limit} = universe.top_n)
+        "listing_url": (
+            "https://api.coinmarketcap.com/data-api/v3/cryptocurrency/listing?start=1&limit={limit}&sortBy=market_cap&sortType=desc"
+        ),
+        # File JSON cục bộ thay cho API ({symbol: id} hoặc [{symbol, id, rank}])
+        "mapping_file": None,
+        # Cache trên đĩa (tương đối với thư mục project) và trong MongoDB (TTL index)
+        "cache_file": "cache/cmc_symbol_registry.json",
+        "collection": "cmc_symbol_registry",
+        "ttl_seconds": 24 * 3600,
+        # TTL index MongoDB xóa hẳn mapping cũ: phải lớn hơn nhiều ttl_seconds để
+        # mapping quá hạn vẫn dùng tạm được khi API lỗi
+        "mongo_expire_seconds": 7 * 24 * 3600,
+        # "config": chỉ các symbol trong "symbols"
+        # "top": top_n coin theo market cap + các symbol trong "symbols"
+        "universe": {"mode": "config", "top_n": 100},
+    },
+    # Ghim CMC id thủ công (ưu tiên hơn symbol_registry)
     "cmc_symbol_ids": {
         "eth": 1027,
         "bnb": 1839,
@@ -355,10 +355,16 @@ class CandlestickMain:
 
         self.logger = LoggerConfig.logger_config("Main Candlestick")
         self.historical_completed = False
+        # Inventory {SYMBOL: {count, first, last}} lấy 1 lần lúc kiểm tra, dùng chung cho các stage
+        self.inventory = None
+        self.historical_ran = False
         self.skip_existing = skip_existing  # Chỉ trích xuất dữ liệu còn thiếu
 
         # Lấy cấu hình
-        self.symbols = EXTRACT_DATA_CONFIG.get("symbols", ["eth", "bnb", "xrp"])
+        from extract.symbol_registry import SymbolRegistry
+
+        # Symbol theo dõi: danh sách trong config hoặc top N theo market cap
+        self.symbols = SymbolRegistry().symbols()
         self.database = EXTRACT_DATA_CONFIG.get("database", "cmc_db")
         self.collection_name = EXTRACT_DATA_CONFIG.get("historical_collection", "cmc")
 
@@ -368,11 +374,23 @@ class CandlestickMain:
         self.db = self.mongo_client.get_database(self.database)
         self.collection = self.db.get_collection(self.collection_name)
 
+        # Tạo index một lần lúc khởi động (đường load không còn gọi create_index)
+        self._bootstrap_indexes()
+
         # Setup signal handlers cho graceful shutdown
         signal.signal(signal.SIGTERM, self._signal_handler)
         signal.signal(signal.SIGINT, self._signal_handler)
         self.shutdown_requested = False
 
+    def _bootstrap_indexes(self):
+        """Kiểm tra và tạo các index còn thiếu, log kích thước index"""
+        from load.index_manager import IndexManager
+
+        try:
+            IndexManager().ensure_indexes()
+        except Exception as e:
+            self.logger.error(f"Lỗi khi khởi tạo index: {str(e)}")
+
     def _signal_handler(self, signum, frame):
         """Handle shutdown signals gracefully"""
         self.logger.info(f"Nhận tín hiệu shutdown: {signum}")
@@ -391,37 +409,49 @@ class CandlestickMain:
             self.logger.info("KIỂM TRA DỮ LIỆU TRONG DATABASE")
             self.logger.info("=" * 80)
 
-            total_docs = self.collection.count_documents({})
-            self.logger.info(f"Tổng số documents trong DB: {total_docs:,}")
+            from load.storage_backend import StorageBackend
+
+            # 1 aggregation group theo symbol: count / cũ nhất / mới nhất
+            self.inventory = StorageBackend.create().inventory(self.db, self.symbols)
+            total_docs = sum(info["count"] for info in self.inventory.values())
+            self.logger.info(f"Tổng số documents của các symbol: {total_docs:,}")
 
             symbols_without_data = []
             symbols_with_data = []
 
             for symbol in self.symbols:
-                # Đếm số lượng records của symbol
-                count = self.collection.count_documents({"symbol": symbol.upper()})
+                info = self.inventory.get(symbol.upper())
 
-                if count == 0:
+                if not info:
                     self.logger.warning(
                         f"[{symbol.upper()}] Chưa có dữ liệu trong DB (0 records)"
                     )
                     symbols_without_data.append(symbol)
                 else:
-                    # Lấy thông tin data mới nhất
-                    latest_record = self.collection.find_one(
-                        {"symbol": symbol.upper()}, sort=[("datetime", -1)]
+                    self.logger.info(
+                        f"[{symbol.upper()}] Đã có {info['count']:,} records, "
+                        f"từ {info['first']} đến {info['last']}"
                     )
-                    if latest_record and "datetime" in latest_record:
-                        latest_dt_str = latest_record["datetime"]
-                        self.logger.info(
-                            f"[{symbol.upper()}] Đã có {count:,} records, mới nhất: {latest_dt_str}"
-                        )
-                    else:
-                        self.logger.info(
-                            f"[{symbol.upper()}] Đã có {count:,} records trong DB"
-                        )
                     symbols_with_data.append(symbol)
 
+            # Interval khác interval gốc mà gọi API riêng cũng cần có dữ liệu
+            from util.interval_util import IntervalUtil
+
+            for interval, interval_symbols in IntervalUtil.fetch_plan(
+                self.symbols
+            ).items():
+                if interval == IntervalUtil.base_interval():
+                    continue
+                interval_inventory = StorageBackend.create(
+                    interval=interval
+                ).inventory(self.db, interval_symbols)
+                for symbol in interval_symbols:
+                    if symbol.upper() not in interval_inventory:
+                        self.logger.warning(
+                            f"[{symbol.upper()}] Chưa có dữ liệu interval {interval}"
+                        )
+                        symbols_without_data.append(f"{symbol}({interval})")
+
             self.logger.info("=" * 80)
             if symbols_without_data:
                 reason = (
@@ -486,10 +516,10 @@ class CandlestickMain:
 
             from pipeline.pipeline import HistoricalPipeline
 
-            historical_pipeline = HistoricalPipeline()
+            self.historical_ran = True
             # Chạy pipeline với error handling
             try:
-                historical_pipeline.run()
+                HistoricalPipeline.run_all_intervals(inventory=self.inventory)
             except Exception as e:
                 self.logger.error(
                     f"Lỗi trong historical pipeline, nhưng sẽ tiếp tục realtime: {str(e)}"
@@ -505,6 +535,19 @@ class CandlestickMain:
             self.logger.exception(e)
             self.historical_completed = True  # Đánh dấu hoàn thành để tiếp tục realtime
 
+    def catch_up_rollups(self):
+        """Dựng nến derived còn thiếu từ watermark (nhanh nếu đã cập nhật)"""
+        if not EXTRACT_DATA_CONFIG.get("rollup", {}).get("catch_up_on_start", True):
+            return
+        try:
+            from load.rollup_engine import RollupEngine
+
+            results = RollupEngine().rebuild_all(self.db, self.symbols)
+            self.logger.info(f"Roll-up lúc khởi động: {results}")
+        except Exception as e:
+            # Không chặn realtime nếu roll-up lỗi
+            self.logger.error(f"Lỗi khi dựng nến derived: {str(e)}")
+
     def run_realtime(self):
         """Chạy pipeline realtime liên tục - với resilient error handling"""
         try:
@@ -515,6 +558,14 @@ class CandlestickMain:
             from pipeline.realtime_pipeline import RealtimePipeline
 
             realtime_pipeline = RealtimePipeline()
+            if self.inventory is not None and not self.historical_ran:
+                # Không có ghi mới từ historical → watermark lấy luôn từ inventory
+                from load.watermark_cache import WatermarkCache
+
+                WatermarkCache().seed(
+                    {symbol: info["last"] for symbol, info in self.inventory.items()},
+                    self.symbols,
+                )
 
             # Bắt đầu vòng lặp realtime liên tục
             self.logger.info("=" * 80)
@@ -546,9 +597,17 @@ class CandlestickMain:
                 self.logger.info("Chế độ: Trích xuất toàn bộ lại từ đầu")
             self.logger.info("=" * 80)
 
+            # Endpoint metrics (latency từng stage, request, độ trễ nến)
+            from util.metrics import Metrics
+
+            Metrics().serve()
+
             # Bước 1: Chạy pipeline lịch sử (chỉ 1 lần)
             self.run_historical()
 
+            # Dựng tiếp nến derived cho lịch sử chưa được roll-up
+            self.catch_up_rollups()
+
             # Bước 2: Chạy pipeline realtime liên tục
             self.run_realtime()
 
@@ -614,6 +673,10 @@ def main():
 
     command = sys.argv[1].lower()
 
+    if "--no-cache" in sys.argv:
+        # Gọi lại API cho mọi window lịch sử (response mới vẫn được ghi vào cache)
+        EXTRACT_DATA_CONFIG.setdefault("response_cache", {})["bypass"] = True
+
     if command == "--daemon":
         # Chạy logic chính của CandlestickMain
         try:
@@ -649,6 +712,191 @@ def main():
             print(conv.iso_to_sql_datetime(iso))
             return
 
+        # Nếu truyền đối số 'migrate-datetime [mode]' thì chuyển các cột thời gian đã lưu
+        if len(sys.argv) >= 2 and sys.argv[1] == "migrate-datetime":
+            from configs.variable_config import EXTRACT_DATA_CONFIG
+            from load.datetime_migration import DatetimeMigration
+
+            args = [arg for arg in sys.argv[2:] if not arg.startswith("--")]
+            mode = (
+                args[0]
+                if args
+                else EXTRACT_DATA_CONFIG.get("storage", {}).get("datetime_mode")
+            )
+            print("\n" + "=" * 80)
+            print(f"MIGRATE DATETIME - Chuyển dữ liệu sang datetime_mode={mode}")
+            print("=" * 80)
+
+            intervals = None
+            for arg in sys.argv[2:]:
+                if arg.startswith("--interval="):
+                    intervals = arg.split("=", 1)[1].split(",")
+            stats = DatetimeMigration.run_all(
+                target_mode=mode, intervals=intervals, reset="--reset" in sys.argv
+            )
+            print(f"\nHoàn thành migration: {stats}")
+            return
+
+        # Nếu truyền đối số 'repair-gaps [symbol ...]' thì quét và bù nến thiếu
+        if len(sys.argv) >= 2 and sys.argv[1] == "repair-gaps":
+            from pipeline.gap_repair import GapRepair
+
+            args = [arg for arg in sys.argv[2:] if not arg.startswith("--")]
+            days = None
+            for arg in sys.argv[2:]:
+                if arg.startswith("--days="):
+                    days = float(arg.split("=", 1)[1])
+            print("\n" + "=" * 80)
+            print("REPAIR GAPS - Quét và bù nến thiếu")
+            print("=" * 80)
+
+            stats = GapRepair().run(
+                symbols=args or None,
+                lookback_days=days,
+                dry_run="--dry-run" in sys.argv,
+            )
+            print(f"\nKết quả: {stats}")
+            return
+
+        # Nếu truyền đối số 'symbols' thì in các symbol theo dõi và CMC ID
+        if len(sys.argv) >= 2 and sys.argv[1] == "symbols":
+            from extract.symbol_registry import SymbolRegistry
+
+            registry = SymbolRegistry()
+            if "--refresh" in sys.argv:
+                registry.refresh()
+            symbols = registry.symbols()
+            ids = registry.resolve(symbols)
+            print(f"\n{len(symbols)} symbol ({registry.mode}), {len(ids)} có CMC ID:")
+            for symbol in symbols:
+                print(f"  {symbol:<12} {ids.get(symbol, '-')}")
+            return
+
+        # Nếu truyền đối số 'backfill-worker' thì chạy worker backfill phân tán
+        if len(sys.argv) >= 2 and sys.argv[1] == "backfill-worker":
+            from load.backfill_queue import BackfillQueue
+            from load.index_manager import IndexManager
+            from pipeline.backfill_worker import BackfillWorker
+
+            args = [arg for arg in sys.argv[2:] if not arg.startswith("--")]
+            options = dict(
+                arg[2:].split("=", 1) for arg in sys.argv[2:] if "=" in arg
+            )
+            interval = options.get("interval")
+            print("\n" + "=" * 80)
+            print("BACKFILL WORKER - Lấy window từ hàng đợi MongoDB")
+            print("=" * 80)
+
+            IndexManager().ensure_indexes()
+            if "--status" in sys.argv:
+                print(BackfillQueue(interval).status())
+                return
+            if "--retry-failed" in sys.argv:
+                print(f"Đưa lại {BackfillQueue(interval).retry_failed()} window failed")
+            BackfillWorker.run_processes(
+                processes=int(options.get("processes", 1)),
+                interval=interval,
+                workers=int(options["workers"]) if "workers" in options else None,
+                symbols=args or None,
+                hosts=int(options["hosts"]) if "hosts" in options else None,
+            )
+            print(f"\nTrạng thái queue: {BackfillQueue(interval).status()}")
+            return
+
+        # Nếu truyền đối số 'rollup [symbol ...]' thì dựng nến derived từ nến gốc đã lưu
+        if len(sys.argv) >= 2 and sys.argv[1] == "rollup":
+            from load.index_manager import IndexManager
+            from load.rollup_engine import RollupEngine
+
+            args = [arg for arg in sys.argv[2:] if not arg.startswith("--")]
+            intervals = None
+            for arg in sys.argv[2:]:
+                if arg.startswith("--interval="):
+                    intervals = arg.split("=", 1)[1].split(",")
+            print("\n" + "=" * 80)
+            print("ROLLUP - Dựng nến derived từ nến gốc đã lưu")
+            print("=" * 80)
+
+            IndexManager().ensure_indexes()
+            db = MongoConfig().get_client().get_database(
+                EXTRACT_DATA_CONFIG.get("database", "cmc_db")
+            )
+            results = RollupEngine().rebuild_all(
+                db, symbols=args or None, intervals=intervals, full="--full" in sys.argv
+            )
+            print(f"\nKết quả: {results}")
+            return
+
+        # Nếu truyền đối số 'export [symbol ...]' thì xuất nến ra Parquet theo symbol / tháng
+        if len(sys.argv) >= 2 and sys.argv[1] == "export":
+            from load.parquet_export import ParquetExport
+
+            args = [arg for arg in sys.argv[2:] if not arg.startswith("--")]
+            options = dict(
+                arg[2:].split("=", 1) for arg in sys.argv[2:] if "=" in arg
+            )
+            print("\n" + "=" * 80)
+            print("EXPORT - Xuất nến ra Parquet (chỉ tháng mới / thay đổi)")
+            print("=" * 80)
+
+            db = MongoConfig().get_client().get_database(
+                EXTRACT_DATA_CONFIG.get("database", "cmc_db")
+            )
+            exporter = ParquetExport(
+                interval=options.get("interval"), output_dir=options.get("output")
+            )
+            results = exporter.export_all(
+                db, symbols=args or None, full="--full" in sys.argv
+            )
+            print(f"\nKết quả: {results}")
+            print(f"Thư mục: {exporter.output_dir}")
+            return
+
+        # Nếu truyền đối số 'benchmark [scenario ...]' thì đo pipeline trên Fake CMC API
+        if len(sys.argv) >= 2 and sys.argv[1] == "benchmark":
+            from benchmark.bench_runner import BenchmarkRunner
+
+            args = [arg for arg in sys.argv[2:] if not arg.startswith("--")]
+            options = dict(
+                arg[2:].split("=", 1) for arg in sys.argv[2:] if "=" in arg
+            )
+            numbers = {
+                "symbols": int,
+                "days": float,
+                "cycles": int,
+                "latency-ms": float,
+                "jitter-ms": float,
+                "error-rate": float,
+                "requests-per-second": float,
+            }
+            overrides = {
+                key.replace("-", "_"): cast(options[key])
+                for key, cast in numbers.items()
+                if key in options
+            }
+            print("\n" + "=" * 80)
+            print("BENCHMARK - Fake CMC API")
+            print("=" * 80)
+
+            runner = BenchmarkRunner(
+                mongo=options.get("mongo"), logs="--logs" in sys.argv or None, **overrides
+            )
+            report = runner.run(args or None)
+            for name, result in report["results"].items():
+                print(f"\n[{name}]")
+                for key, value in result.items():
+                    print(f"  {key}: {value}")
+            if "compare" in options:
+                print(f"\nSo với {options['compare']}:")
+                for row in runner.compare(report, options["compare"]):
+                    flag = "  ← REGRESSION" if row["regression"] else ""
+                    print(
+                        f"  {row['scenario']}.{row['metric']}: {row['baseline']} → "
+                        f"{row['current']} ({row['change']:+.1%}){flag}"
+                    )
+            print(f"\nKết quả: {report['output_file']}")
+            return
+
         # Nếu truyền đối số 'realtime' thì chỉ chạy realtime pipeline LIÊN TỤC
         if len(sys.argv) >= 2 and sys.argv[1] == "realtime":
             from pipeline.realtime_pipeline import RealtimePipeline
@@ -657,6 +905,11 @@ def main():
             print("CHẾ ĐỘ REALTIME - Chỉ chạy Realtime Pipeline")
             print("=" * 80)
 
+            from load.index_manager import IndexManager
+            from util.metrics import Metrics
+
+            IndexManager().ensure_indexes()
+            Metrics().serve()
             realtime_pipe = RealtimePipeline()
             asyncio.run(realtime_pipe.run())
             return
@@ -702,8 +955,10 @@ def main():
             print("CHẾ ĐỘ HISTORICAL - Chỉ chạy Historical Pipeline")
             print("=" * 80)
 
-            historical_pipe = HistoricalPipeline()
-            historical_pipe.run()
+            from load.index_manager import IndexManager
+
+            IndexManager().ensure_indexes()
+            HistoricalPipeline.run_all_intervals()
             print("\nHoàn thành Historical Pipeline")
             return
 
@@ -713,7 +968,36 @@ def main():
         print("  python main.py all          # Chạy đầy đủ (historical + realtime)")
         print("  python main.py realtime     # Chỉ chạy realtime")
         print("  python main.py historical   # Chỉ chạy historical")
+        print(
+            "  python main.py historical --no-cache  # Không đọc cache response"
+            " (cũng dùng được với lệnh khác)"
+        )
         print("  python main.py convert ISO  # Convert ISO string")
+        print(
+            "  python main.py migrate-datetime [string|datetime|epoch]"
+            " [--interval=15m,1h] [--reset]  # Chuyển kiểu lưu thời gian"
+        )
+        print(
+            "  python main.py repair-gaps [symbol ...] [--days=N] [--dry-run]"
+            "  # Quét và bù nến thiếu"
+        )
+        print("  python main.py symbols [--refresh]  # Symbol theo dõi và CMC ID")
+        print(
+            "  python main.py backfill-worker [symbol ...] [--processes=N] [--workers=N]"
+            " [--hosts=N] [--interval=15m] [--status] [--retry-failed]"
+        )
+        print(
+            "  python main.py rollup [symbol ...] [--interval=1h,4h] [--full]"
+        )
+        print(
+            "  python main.py export [symbol ...] [--interval=15m] [--output=DIR]"
+            " [--full]  # Xuất Parquet theo symbol / tháng"
+        )
+        print(
+            "  python main.py benchmark [historical realtime load] [--symbols=N]"
+            " [--days=N] [--cycles=N] [--latency-ms=N] [--error-rate=X]"
+            " [--mongo=mock|local] [--logs] [--compare=file.json]"
+        )
         print("  python main.py start        # Khởi động daemon")
         print("  python main.py stop         # Dừng daemon")
         print("  python main.py restart      # Khởi động lại daemon")
@@ -0,0 +1,436 @@
+"""
+Benchmark Runner - Đo throughput / RAM của pipeline trên Fake CMC API.
+
+    python main.py benchmark [historical realtime load] [--symbols=N] [--days=N]
+        [--cycles=N] [--latency-ms=N] [--error-rate=0.01] [--mongo=mock|local]
+        [--logs] [--compare=bench_results/<file>.json]
+
+- FakeCmcApi chạy trong process chính; mỗi scenario chạy trong 1 process
+  riêng (spawn) để peak RSS không lẫn giữa các scenario và singleton
+  (rate limiter, HTTP session, Mongo client) bắt đầu sạch
+- mongo="mock": mongomock trong RAM (chỉ cần cho benchmark, không có trong
+  requirements); mongo="local": MongoDB theo MONGO_CONFIG, database riêng
+  benchmark.database được xóa trước mỗi scenario
+- Kết quả ghi JSON vào output_dir (kèm commit git) để so sánh giữa các commit
+  bằng --compare
+- Mặc định tắt log của pipeline; --logs bật lại để đo cả chi phí ghi log
+
+Scenario:
+- historical: HistoricalPipeline backfill days ngày cho N symbol
+- realtime: cycles vòng RealtimePipeline.run_once cho N symbol (vòng đầu bù
+  7 ngày từ DB rỗng, các vòng sau là vòng ổn định)
+- load: chỉ ghi MongoDB (HistoricalLoad) - lần đầu insert, lần hai ghi lại
+  dữ liệu giống hệt (unchanged)
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import queue
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from configs.logger_config import LoggerConfig
+from configs.variable_config import EXTRACT_DATA_CONFIG
+from benchmark.fake_cmc_api import FakeCmcApi
+
+SCENARIOS = ["historical", "realtime", "load"]
+
+# (scenario, chỉ số, lớn hơn là tốt hơn) dùng khi --compare
+KEY_METRICS = [
+    ("historical", "records_per_second", True),
+    ("historical", "peak_rss_mb", False),
+    ("realtime", "first_cycle_seconds", False),
+    ("realtime", "steady_cycle_seconds", False),
+    ("realtime", "peak_rss_mb", False),
+    ("load", "insert_rows_per_second", True),
+    ("load", "rewrite_rows_per_second", True),
+    ("load", "peak_rss_mb", False),
+]
+
+# CMC ID giả cho symbol benchmark, không trùng coin thật trong cmc_symbol_ids
+BASE_CMC_ID = 900000
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Peak RSS của process hiện tại (MB), None nếu hệ điều hành không hỗ trợ."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux trả KB, macOS trả byte
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _git_commit() -> Dict[str, object]:
+    root_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=root_dir,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        dirty = bool(
+            subprocess.run(
+                ["git", "status", "--porcelain", "--untracked-files=no"],
+                cwd=root_dir,
+                capture_output=True,
+                text=True,
+            ).stdout.strip()
+        )
+        return {"commit": commit, "dirty": dirty}
+    except Exception:
+        return {"commit": None, "dirty": None}
+
+
+class BenchmarkRunner:
+    def __init__(self, **overrides):
+        self.logger = LoggerConfig.logger_config("Benchmark")
+        self.config = dict(EXTRACT_DATA_CONFIG.get("benchmark", {}))
+        self.config.update({k: v for k, v in overrides.items() if v is not None})
+        self.symbols = int(self.config.get("symbols", 10))
+        self.days = float(self.config.get("days", 30))
+        self.cycles = max(1, int(self.config.get("cycles", 5)))
+        self.mongo = self.config.get("mongo", "mock")
+        root_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+        self.output_dir = os.path.join(
+            root_dir, self.config.get("output_dir", "bench_results")
+        )
+
+    def params(self) -> Dict[str, object]:
+        """Tham số của lần chạy (ghi vào JSON để biết kết quả có so sánh được không)."""
+        return {
+            "symbols": self.symbols,
+            "days": self.days,
+            "cycles": self.cycles,
+            "latency_ms": float(self.config.get("latency_ms", 0)),
+            "jitter_ms": float(self.config.get("jitter_ms", 0)),
+            "error_rate": float(self.config.get("error_rate", 0)),
+            "requests_per_second": float(self.config.get("requests_per_second", 1000)),
+            "mongo": self.mongo,
+            "database": self.config.get("database", "cmc_bench"),
+            "logs": bool(self.config.get("logs", False)),
+            "seed": int(self.config.get("seed", 42)),
+            "interval": EXTRACT_DATA_CONFIG.get("api", {}).get("interval", "15m"),
+            "stream": EXTRACT_DATA_CONFIG.get("stream", {}),
+            "backfill_workers": EXTRACT_DATA_CONFIG.get("api", {}).get(
+                "backfill_workers"
+            ),
+        }
+
+    def run(self, scenarios: Optional[List[str]] = None) -> Dict[str, object]:
+        scenarios = scenarios or SCENARIOS
+        unknown = [name for name in scenarios if name not in SCENARIOS]
+        if unknown:
+            raise ValueError(f"Scenario không hợp lệ: {unknown} (có: {SCENARIOS})")
+
+        params = self.params()
+        api = FakeCmcApi(
+            listed_at=datetime.utcnow() - timedelta(days=self.days),
+            latency_ms=params["latency_ms"],
+            jitter_ms=params["jitter_ms"],
+            error_rate=params["error_rate"],
+            seed=params["seed"],
+        ).start()
+
+        context = multiprocessing.get_context("spawn")
+        results = {}
+        try:
+            for name in scenarios:
+                self.logger.info(f"Benchmark {name} ({self.symbols} symbol) ...")
+                api.reset_stats()
+                result_queue = context.Queue()
+                child = context.Process(
+                    target=_run_scenario,
+                    args=(name, params, api.url_template, result_queue),
+                    name=f"benchmark-{name}",
+                )
+                child.start()
+                # Đọc kết quả trước join để queue không chặn process con
+                while True:
+                    try:
+                        result = result_queue.get(timeout=1)
+                        break
+                    except queue.Empty:
+                        if not child.is_alive():
+                            result = {"error": f"process thoát ({child.exitcode})"}
+                            break
+                child.join()
+                result["api"] = api.stats()
+                results[name] = result
+                self.logger.info(f"Benchmark {name}: {self._summary(result)}")
+        finally:
+            api.stop()
+
+        report = {
+            "created_at": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+            **_git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": params,
+            "results": results,
+        }
+        report["output_file"] = self.save(report)
+        return report
+
+    @staticmethod
+    def _summary(result: Dict) -> str:
+        if "error" in result:
+            return f"LỖI: {result['error']}"
+        keys = [key for scenario, key, _ in KEY_METRICS if key in result]
+        return ", ".join(f"{key}={result[key]}" for key in dict.fromkeys(keys))
+
+    def save(self, report: Dict) -> str:
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(
+            self.output_dir, f"bench_{stamp}_{report.get('commit') or 'nogit'}.json"
+        )
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        self.logger.info(f"Đã ghi kết quả benchmark: {path}")
+        return path
+
+    def compare(self, report: Dict, baseline_file: str) -> List[Dict[str, object]]:
+        """So sánh các chỉ số chính với file kết quả cũ.
+
+        Returns:
+            [{scenario, metric, baseline, current, change, regression}], change là
+            tỉ lệ thay đổi theo hướng "tốt hơn" (âm = chậm đi / tốn RAM hơn)
+        """
+        threshold = float(self.config.get("regression_threshold", 0.1))
+        with open(baseline_file, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+        rows = []
+        for scenario, metric, higher_is_better in KEY_METRICS:
+            old = baseline.get("results", {}).get(scenario, {}).get(metric)
+            new = report.get("results", {}).get(scenario, {}).get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old if higher_is_better else (old - new) / old
+            rows.append(
+                {
+                    "scenario": scenario,
+                    "metric": metric,
+                    "baseline": old,
+                    "current": new,
+                    "change": round(change, 4),
+                    "regression": change < -threshold,
+                }
+            )
+        if baseline.get("params") != report.get("params"):
+            self.logger.warning(
+                "Tham số benchmark khác với baseline, kết quả có thể không so sánh được"
+            )
+        return rows
+
+
+# ---------------------------------------------------------------------------
+# Chạy trong process con (spawn)
+# ---------------------------------------------------------------------------
+
+
+def _configure(params: Dict, url_template: str) -> List[str]:
+    """Ghi đè config cho benchmark trước khi import các module pipeline.
+
+    Sửa config / logging toàn cục của process: chỉ gọi trong process scenario
+    (spawn) riêng.
+    """
+    if not params["logs"]:
+        logging.disable(logging.CRITICAL)
+    return apply_bench_config(EXTRACT_DATA_CONFIG, params, url_template)
+
+
+def apply_bench_config(config: Dict, params: Dict, url_template: str) -> List[str]:
+    """Áp cấu hình benchmark lên config (dạng EXTRACT_DATA_CONFIG). Returns: symbols.
+
+    Sửa trực tiếp config (kể cả dict con "api"): truyền bản deepcopy nếu không
+    muốn đổi config gốc.
+    """
+    symbols = [f"bench{i:04d}" for i in range(params["symbols"])]
+    config["database"] = params["database"]
+    config["symbols"] = symbols
+    config["cmc_symbol_ids"] = {
+        symbol: BASE_CMC_ID + i for i, symbol in enumerate(symbols)
+    }
+    config["symbol_registry"] = dict(
+        config.get("symbol_registry", {}), universe={"mode": "config"}
+    )
+    # Chỉ interval gốc: đo extract/load, không lẫn chi phí rollup
+    config["intervals"] = [params["interval"]]
+    config["symbol_intervals"] = {}
+    config["derived_intervals"] = []
+    config["rollup"] = dict(config.get("rollup", {}), catch_up_on_start=False)
+    config["gap_repair"] = dict(config.get("gap_repair", {}), enabled=False)
+    config["realtime_shards"] = dict(config.get("realtime_shards", {}), enabled=False)
+    config["metrics"] = dict(config.get("metrics", {}), enabled=False)
+    # Đo đường gọi API thật, không đọc/ghi cache response của project
+    config["response_cache"] = dict(config.get("response_cache", {}), enabled=False)
+
+    api = config["api"]
+    api["url_template"] = url_template
+    # Rate limiter không được là nút thắt (trừ khi muốn đo chính nó)
+    rps = params["requests_per_second"]
+    api["rate_limit"] = dict(
+        api.get("rate_limit", {}), requests_per_second=rps, burst=max(1, int(rps))
+    )
+    return symbols
+
+
+def _connect(params: Dict):
+    from configs.mongo_config import MongoConfig
+
+    if params["mongo"] == "mock":
+        try:
+            import mongomock
+        except ImportError:
+            raise RuntimeError(
+                "mongo=mock cần thư viện mongomock (pip install mongomock), "
+                "hoặc dùng --mongo=local"
+            )
+        MongoConfig()._client = mongomock.MongoClient()
+    return prepare_database(MongoConfig().get_client(), params)
+
+
+def prepare_database(client, params: Dict):
+    """Xóa database benchmark và tạo lại index (theo config hiện tại)."""
+    client.drop_database(params["database"])
+
+    from load.index_manager import IndexManager
+
+    IndexManager().ensure_indexes()
+    return client.get_database(params["database"])
+
+
+def _bench_historical(params: Dict, symbols: List[str], db) -> Dict:
+    from pipeline.pipeline import HistoricalPipeline
+    from load.storage_backend import StorageBackend
+
+    pipeline = HistoricalPipeline()
+    started = time.perf_counter()
+    pipeline.run()
+    elapsed = time.perf_counter() - started
+
+    records = db.get_collection(
+        StorageBackend.create().collection_name
+    ).count_documents({})
+    return {
+        "symbols": len(symbols),
+        "records": records,
+        "seconds": round(elapsed, 3),
+        "records_per_second": round(records / elapsed, 1) if elapsed else None,
+        "symbols_per_second": round(len(symbols) / elapsed, 3) if elapsed else None,
+    }
+
+
+def _bench_realtime(params: Dict, symbols: List[str], db) -> Dict:
+    import asyncio
+
+    from pipeline.realtime_pipeline import RealtimePipeline
+    from load.storage_backend import StorageBackend
+
+    pipeline = RealtimePipeline()
+    durations = []
+
+    async def cycles():
+        try:
+            for _ in range(params["cycles"]):
+                started = time.perf_counter()
+                await pipeline.run_once()
+                durations.append(time.perf_counter() - started)
+        finally:
+            await pipeline.extractor.aclose()
+
+    asyncio.run(cycles())
+    records = db.get_collection(
+        StorageBackend.create().collection_name
+    ).count_documents({})
+    steady = durations[1:]
+    return {
+        "symbols": len(symbols),
+        "cycles": len(durations),
+        "records": records,
+        "cycle_seconds": [round(value, 3) for value in durations],
+        "first_cycle_seconds": round(durations[0], 3),
+        "steady_cycle_seconds": (
+            round(statistics.median(steady), 3) if steady else None
+        ),
+    }
+
+
+def _bench_load(params: Dict, symbols: List[str], db) -> Dict:
+    from load.load import HistoricalLoad
+    from util.interval_util import IntervalUtil
+    from util.quote_normalizer import QuoteNormalizer
+
+    # Dữ liệu giống hệt scenario historical nhưng sinh trực tiếp, không qua HTTP
+    step = IntervalUtil.to_seconds(params["interval"])
+    end = int(time.time()) // step * step
+    start = end - int(params["days"] * 86400) // step * step
+    flush_rows = int(EXTRACT_DATA_CONFIG.get("stream", {}).get("flush_rows", 1000))
+
+    started = time.perf_counter()
+    frames = {}
+    for i, symbol in enumerate(symbols):
+        quotes = [
+            FakeCmcApi.quote(BASE_CMC_ID + i, open_ts, step)
+            for open_ts in range(start, end, step)
+        ]
+        frames[symbol] = QuoteNormalizer().to_dataframe(quotes, symbol)
+    parse_seconds = time.perf_counter() - started
+    rows = sum(len(df) for df in frames.values())
+
+    loader = HistoricalLoad()
+
+    def write_all() -> float:
+        started = time.perf_counter()
+        for symbol, df in frames.items():
+            # Cùng cỡ lô với writer của HistoricalPipeline
+            for offset in range(0, len(df), flush_rows):
+                loader._load_dataframe(df.iloc[offset : offset + flush_rows], symbol)
+        return time.perf_counter() - started
+
+    insert_seconds = write_all()
+    rewrite_seconds = write_all()
+    return {
+        "symbols": len(symbols),
+        "rows": rows,
+        "parse_seconds": round(parse_seconds, 3),
+        "insert_seconds": round(insert_seconds, 3),
+        "insert_rows_per_second": round(rows / insert_seconds, 1),
+        "rewrite_seconds": round(rewrite_seconds, 3),
+        "rewrite_rows_per_second": round(rows / rewrite_seconds, 1),
+    }
+
+
+def _run_scenario(name: str, params: Dict, url_template: str, result_queue):
+    try:
+        symbols = _configure(params, url_template)
+        db = _connect(params)
+        baseline_rss = _peak_rss_mb()
+        bench = {
+            "historical": _bench_historical,
+            "realtime": _bench_realtime,
+            "load": _bench_load,
+        }[name]
+        result = bench(params, symbols, db)
+        result["baseline_rss_mb"] = baseline_rss
+        result["peak_rss_mb"] = _peak_rss_mb()
+        if params["mongo"] != "mock":
+            db.client.drop_database(params["database"])
+    except Exception as e:
+        result = {"error": f"{type(e).__name__}: {str(e)}"}
+    result_queue.put(result)
+
+
+__all__ = ["BenchmarkRunner", "SCENARIOS", "apply_bench_config", "prepare_database"]
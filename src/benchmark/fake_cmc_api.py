@@ -0,0 +1,247 @@
+"""
+Fake CMC API - Giả lập endpoint historical của CMC để benchmark / chạy thử offline.
+
+- Cùng query string như url_template thật: id, convertId, timeStart, timeEnd, interval
+- Trả tối đa max_records bản ghi mỗi request (giống giới hạn 399 của CMC), số
+  request bị cắt bớt được đếm trong stats()["truncated"]
+- Coin niêm yết từ listed_at: window cũ hơn trả về quotes rỗng
+- Giá sinh tất định theo (id, thời điểm): chạy lại cho cùng dữ liệu
+- Giả lập độ trễ (latency_ms ± jitter_ms) và lỗi (error_rate, error_status);
+  request nào lỗi được quyết định bằng hash(seed, request, lần thử) nên không
+  phụ thuộc thứ tự thread
+Sử dụng:
+    with FakeCmcApi(latency_ms=50, error_rate=0.01) as api:
+        EXTRACT_DATA_CONFIG["api"]["url_template"] = api.url_template
+"""
+
+import gzip
+import hashlib
+import json
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from util.interval_util import IntervalUtil
+
+PATH = "/data-api/v3.1/cryptocurrency/historical"
+
+
+class FakeCmcApi:
+    def __init__(
+        self,
+        listed_at: Optional[datetime] = None,
+        latency_ms: float = 0,
+        jitter_ms: float = 0,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+        max_records: Optional[int] = None,
+        seed: int = 0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        # Mặc định: coin niêm yết 30 ngày trước (naive UTC)
+        self.listed_at = listed_at or datetime.utcnow() - timedelta(days=30)
+        self.latency_ms = float(latency_ms)
+        self.jitter_ms = float(jitter_ms)
+        self.error_rate = float(error_rate)
+        self.error_status = int(error_status)
+        self.max_records = int(max_records or IntervalUtil.max_records())
+        self.seed = seed
+        self.host = host
+        self.port = port
+
+        self._lock = threading.Lock()
+        self._attempts: Dict[str, int] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+        self.reset_stats()
+
+    # ------------------------------------------------------------------ dữ liệu
+    @staticmethod
+    def _iso(timestamp: float) -> str:
+        value = datetime.fromtimestamp(timestamp, timezone.utc)
+        return (
+            value.strftime("%Y-%m-%dT%H:%M:%S.") + f"{value.microsecond // 1000:03d}Z"
+        )
+
+    @classmethod
+    def quote(cls, cmc_id: int, open_ts: int, step: int) -> Dict:
+        """Một nến giả: timeOpen = đầu nến, timeClose = cuối nến - 1ms (như CMC)."""
+        base = 1 + (cmc_id % 97) * 10
+        phase = open_ts / 86400.0 + cmc_id
+        open_price = base * (1 + 0.05 * math.sin(phase))
+        close_price = base * (1 + 0.05 * math.sin(phase + step / 86400.0))
+        high = max(open_price, close_price) * 1.002
+        low = min(open_price, close_price) * 0.998
+        volume = base * 1000 * (2 + math.cos(phase * 7))
+        return {
+            "timeOpen": cls._iso(open_ts),
+            "timeClose": cls._iso(open_ts + step - 0.001),
+            "timeHigh": cls._iso(open_ts + step // 3),
+            "timeLow": cls._iso(open_ts + 2 * step // 3),
+            "quote": {
+                "open": round(open_price, 6),
+                "high": round(high, 6),
+                "low": round(low, 6),
+                "close": round(close_price, 6),
+                "volume": round(volume, 2),
+                "marketCap": round(close_price * 1e7, 2),
+                "circulatingSupply": 1e7,
+                "timestamp": cls._iso(open_ts + step - 0.001),
+            },
+        }
+
+    def quotes(
+        self, cmc_id: int, time_start: int, time_end: int, interval: str
+    ) -> Iterator[Dict]:
+        """Các nến đã đóng có thời điểm đóng trong (time_start, time_end].
+
+        Nến mở trước thời điểm niêm yết listed_at không tồn tại.
+        """
+        step = IntervalUtil.to_seconds(interval)
+        listed = IntervalUtil.utc_timestamp(self.listed_at)
+        now = time.time()
+        open_ts = max(time_start // step * step, -(-listed // step) * step)
+        while open_ts + step <= min(time_end, now):
+            yield self.quote(cmc_id, open_ts, step)
+            open_ts += step
+
+    # ------------------------------------------------------------------ lỗi giả
+    def _should_fail(self, key: str) -> bool:
+        if self.error_rate <= 0:
+            return False
+        with self._lock:
+            attempt = self._attempts.get(key, 0)
+            self._attempts[key] = attempt + 1
+        digest = hashlib.sha1(f"{self.seed}:{key}:{attempt}".encode()).digest()
+        return int.from_bytes(digest[:8], "big") / 2**64 < self.error_rate
+
+    def _delay(self, key: str) -> float:
+        if self.latency_ms <= 0 and self.jitter_ms <= 0:
+            return 0.0
+        digest = hashlib.sha1(f"{self.seed}:latency:{key}".encode()).digest()
+        jitter = (int.from_bytes(digest[:4], "big") / 2**32 * 2 - 1) * self.jitter_ms
+        return max(0.0, self.latency_ms + jitter) / 1000.0
+
+    # ------------------------------------------------------------------ thống kê
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {
+                "requests": 0,
+                "errors": 0,
+                "records": 0,
+                "truncated": 0,
+                "bytes": 0,
+            }
+
+    def _count(self, **values):
+        with self._lock:
+            for key, value in values.items():
+                self._stats[key] += value
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    # ------------------------------------------------------------------ HTTP
+    def handle(self, path: str, accept_gzip: bool = False):
+        """Xử lý 1 request. Returns: (status, headers, body)."""
+        parsed = urlparse(path)
+        if parsed.path != PATH:
+            return 404, {}, b""
+        self._count(requests=1)
+        params = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+        delay = self._delay(parsed.query)
+        if delay:
+            time.sleep(delay)
+
+        try:
+            cmc_id = int(params["id"])
+            time_start = int(params["timeStart"])
+            time_end = int(params["timeEnd"])
+            interval = params.get("interval", IntervalUtil.base_interval())
+            IntervalUtil.to_seconds(interval)
+        except (KeyError, ValueError):
+            self._count(errors=1)
+            return 400, {}, b'{"status": {"error_message": "bad request"}}'
+
+        if self._should_fail(parsed.query):
+            self._count(errors=1)
+            headers = {"Retry-After": "1"} if self.error_status == 429 else {}
+            return self.error_status, headers, b'{"status": {"error_code": "500"}}'
+
+        quotes: List[Dict] = []
+        truncated = 0
+        for quote in self.quotes(cmc_id, time_start, time_end, interval):
+            if len(quotes) >= self.max_records:
+                truncated = 1
+                break
+            quotes.append(quote)
+
+        body = json.dumps(
+            {
+                "data": {"id": cmc_id, "quotes": quotes},
+                "status": {"error_code": "0", "error_message": "SUCCESS"},
+            }
+        ).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if accept_gzip:
+            body = gzip.compress(body, compresslevel=1)
+            headers["Content-Encoding"] = "gzip"
+        self._count(records=len(quotes), truncated=truncated, bytes=len(body))
+        return 200, headers, body
+
+    @property
+    def url_template(self) -> str:
+        """url_template thay cho CMC thật (cùng placeholder với config api)."""
+        return (
+            f"http://{self.host}:{self.port}{PATH}?id={{id}}&convertId={{convertId}}"
+            "&timeStart={timeStart}&timeEnd={timeEnd}&interval={interval}"
+        )
+
+    def start(self) -> "FakeCmcApi":
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive như CMC để đo đúng connection pool của client
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                status, headers, body = api.handle(
+                    self.path, "gzip" in self.headers.get("Accept-Encoding", "")
+                )
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(
+            target=self._server.serve_forever, name="fake-cmc-api", daemon=True
+        ).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FakeCmcApi":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+__all__ = ["FakeCmcApi"]
@@ -0,0 +1,127 @@
+"""
+API Client - HTTP session dùng chung cho các extractor đồng bộ.
+
+- Một requests.Session với connection pool keep-alive (tránh TCP/TLS handshake mỗi batch)
+- Pool được đặt kích thước theo số worker song song
+- Yêu cầu response nén (gzip/deflate)
+- Mọi request đi qua RateLimiter dùng chung
+"""
+
+import threading
+from typing import Dict
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from configs.variable_config import EXTRACT_DATA_CONFIG
+from util.metrics import Metrics
+from util.rate_limiter import RateLimiter
+
+
+class ApiClient:
+    """Singleton HTTP client. Sử dụng: ApiClient().get(url)"""
+
+    _instance = None
+
+    def _init_config(self):
+        api_config = EXTRACT_DATA_CONFIG.get("api", {})
+        config = api_config.get("http", {})
+        # Pool phải đủ cho số request đồng thời lớn nhất (backfill hoặc thread pool)
+        default_pool_size = max(
+            int(api_config.get("backfill_workers", 8)),
+            int(api_config.get("max_workers", 5)),
+        )
+        self.pool_size = int(config.get("pool_size") or default_pool_size)
+        self.pool_connections = int(config.get("pool_connections", 4))
+        self.timeout = float(config.get("timeout", 30))
+        self.rate_limiter = RateLimiter()
+
+        self.session = requests.Session()
+        # pool_block=True: không mở quá pool_size kết nối tới một host
+        self.adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_size,
+            pool_block=True,
+        )
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+        self.session.headers.update(
+            {"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"}
+        )
+
+        self._lock = threading.Lock()
+        self._host_stats: Dict[str, Dict[str, int]] = {}
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ApiClient, cls).__new__(cls)
+            cls._instance._init_config()
+        return cls._instance
+
+    def get(self, url: str) -> requests.Response:
+        """GET qua session dùng chung (đã đi qua rate limiter).
+
+        Khi API trả 429, rate limiter được báo để chặn mọi caller tới hết Retry-After.
+        Caller tự gọi raise_for_status().
+        """
+        self.rate_limiter.acquire()
+        host = urlparse(url).netloc
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+        except requests.exceptions.RequestException:
+            self._record(host, error=True, status="error")
+            raise
+
+        self._record(
+            host, error=response.status_code >= 400, status=response.status_code
+        )
+        if response.status_code == 429:
+            self.rate_limiter.on_rate_limited(
+                RateLimiter.parse_retry_after(response.headers.get("Retry-After"))
+            )
+        elif response.ok:
+            self.rate_limiter.on_success()
+        return response
+
+    def _record(self, host: str, error: bool, status=None):
+        Metrics().inc("cmc_api_requests_total", host=host, status=status)
+        with self._lock:
+            stats = self._host_stats.setdefault(host, {"requests": 0, "errors": 0})
+            stats["requests"] += 1
+            if error:
+                stats["errors"] += 1
+
+    def pool_stats(self) -> Dict[str, Dict[str, int]]:
+        """Thống kê connection pool theo host.
+
+        Returns:
+            Dict host -> {requests, errors, connections_opened, idle_connections, pool_size}
+        """
+        with self._lock:
+            result = {host: dict(stats) for host, stats in self._host_stats.items()}
+
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = (
+                pool.host
+                if pool.port in (None, 80, 443)
+                else f"{pool.host}:{pool.port}"
+            )
+            stats = result.setdefault(host, {"requests": 0, "errors": 0})
+            # num_connections: số kết nối đã mở mới (nhỏ hơn nhiều so với requests = đang reuse)
+            stats["connections_opened"] = pool.num_connections
+            # Queue chứa None cho các slot chưa mở kết nối
+            idle = list(pool.pool.queue) if pool.pool else []
+            stats["idle_connections"] = sum(1 for conn in idle if conn is not None)
+            stats["pool_size"] = self.pool_size
+        return result
+
+    def close(self):
+        self.session.close()
+
+
+__all__ = ["ApiClient"]
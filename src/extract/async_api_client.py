@@ -0,0 +1,107 @@
+"""
+Async API Client - HTTP client không blocking cho CMC API.
+
+- Một aiohttp.ClientSession dùng chung với connection pool keep-alive
+- Mọi request đi qua RateLimiter dùng chung (acquire_async)
+- Retry với exponential backoff bằng asyncio.sleep (không block event loop)
+"""
+
+import asyncio
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+import aiohttp
+
+from configs.logger_config import LoggerConfig
+from configs.variable_config import EXTRACT_DATA_CONFIG
+from util.metrics import Metrics
+from util.rate_limiter import RateLimiter
+
+
+class AsyncApiClient:
+    def __init__(self):
+        self.logger = LoggerConfig.logger_config("Async API Client")
+        config = EXTRACT_DATA_CONFIG.get("api", {}).get("async_http", {})
+        self.pool_size = int(config.get("pool_size", 100))
+        self.keepalive_timeout = float(config.get("keepalive_timeout", 60))
+        self.timeout = float(config.get("timeout", 30))
+        self.max_retries = int(config.get("max_retries", 3))
+        self.rate_limiter = RateLimiter()
+
+        # Session gắn với event loop tạo ra nó, tạo lazy trong loop đang chạy
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"Accept-Encoding": "gzip, deflate"},
+            )
+            self._loop = loop
+        return self._session
+
+    async def get_json(self, url: str) -> Optional[Dict[str, Any]]:
+        """GET url và trả về JSON đã parse, retry với backoff.
+
+        Returns:
+            dict JSON, hoặc None nếu hết số lần retry
+        """
+        session = await self._get_session()
+        backoff_seconds = 1
+
+        for attempt in range(self.max_retries):
+            try:
+                await self.rate_limiter.acquire_async()
+                async with session.get(url) as response:
+                    self.logger.debug("API Response Status: %s", response.status)
+                    Metrics().inc(
+                        "cmc_api_requests_total",
+                        host=response.url.host,
+                        status=response.status,
+                    )
+                    if response.status == 429:
+                        # Rate limiter sẽ chặn mọi caller tới hết Retry-After
+                        self.rate_limiter.on_rate_limited(
+                            RateLimiter.parse_retry_after(
+                                response.headers.get("Retry-After")
+                            )
+                        )
+                    response.raise_for_status()
+                    data = await response.json(content_type=None)
+                self.rate_limiter.on_success()
+                return data
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if not isinstance(e, aiohttp.ClientResponseError):
+                    Metrics().inc(
+                        "cmc_api_requests_total",
+                        host=urlparse(url).netloc,
+                        status="error",
+                    )
+                self.logger.warning(
+                    f"API request thất bại (attempt {attempt + 1}/{self.max_retries}): {str(e)}"
+                )
+                if attempt < self.max_retries - 1:
+                    self.logger.info(f"Chờ {backoff_seconds}s trước khi retry...")
+                    await asyncio.sleep(backoff_seconds)
+                    backoff_seconds = min(backoff_seconds * 2, 60)  # Tối đa 60s
+                else:
+                    self.logger.error(f"Hết số lần retry cho API request: {str(e)}")
+        return None
+
+    async def close(self):
+        """Đóng session và connection pool."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
+
+
+__all__ = ["AsyncApiClient"]
@@ -1,14 +1,26 @@
-from datetime import datetime, timedelta
-from typing import Dict, List
-import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import json
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
 
 import pandas as pd
-import requests
 
 from configs.logger_config import LoggerConfig
 from configs.variable_config import EXTRACT_DATA_CONFIG
 from util.convert_datetime_util import ConvertDatetime
+from util.interval_util import IntervalUtil
+from util.metrics import Metrics
+from util.quote_normalizer import QuoteNormalizer
+from extract.api_client import ApiClient
+from extract.response_cache import ResponseCache
+from extract.symbol_registry import SymbolRegistry
+from load.checkpoint import BackfillCheckpoint
 
 
 class Extract:
@@ -21,29 +33,52 @@ class Extract:
     - Hỗ trợ nhiều symbol, mỗi symbol có ID riêng
     """
 
-    def __init__(self):
+    def __init__(self, interval: Optional[str] = None):
         self.logger = LoggerConfig.logger_config("Extract dữ liệu lịch sử CMC")
         self.config = EXTRACT_DATA_CONFIG
         self.api_config = self.config.get("api", {})
         self.url_template = self.api_config.get("url_template", "")
-        self.interval = self.api_config.get("interval", "15m")
-        self.batch_seconds = self.api_config.get("batch_seconds", 3 * 24 * 3600)
+        self.interval = interval or IntervalUtil.base_interval()
+        # Mỗi window vừa đủ giới hạn bản ghi của API với interval này
+        self.batch_seconds = IntervalUtil.batch_seconds(self.interval)
         self.convert_id = self.api_config.get("convert_id", 2781)
-        self.symbols = self.config.get("symbols", ["eth"])
-        self.cmc_symbol_ids = self.config.get("cmc_symbol_ids", {})
+        # Chỉ các symbol cần gọi API cho interval này
+        self.symbols = IntervalUtil.fetch_plan().get(self.interval, [])
+        # CMC ID tra hàng loạt qua SymbolRegistry (cache RAM / đĩa / MongoDB)
+        self.cmc_symbol_ids = SymbolRegistry().resolve(self.symbols)
         self.converter = ConvertDatetime()
+        self.normalizer = QuoteNormalizer()
 
-        # Delay giữa các request để tránh rate limit
-        self.request_delay = 0.5  # seconds (giảm delay do xử lý song song)
+        # Checkpoint backfill (resume sau crash)
+        self.checkpoint = BackfillCheckpoint(self.interval)
+
+        # HTTP session dùng chung (connection pool + rate limiter toàn process)
+        self.api_client = ApiClient()
+        # Cache response của window đã đóng trên đĩa (chạy lại backfill không gọi lại API)
+        self.response_cache = ResponseCache()
 
         # Số lượng worker threads cho song song
         self.max_workers = self.api_config.get("max_workers", 5)
 
-        self.logger.info(f"Khởi tạo Extract với symbols: {self.symbols}")
+        # Số window được fetch đồng thời cho mỗi symbol khi backfill
+        self.backfill_workers = self.api_config.get("backfill_workers", 8)
+        # Số lần thử lại một window bị lỗi trước khi bỏ qua
+        self.window_retries = self.api_config.get("window_retries", 2)
+        # Mốc sớm nhất được phép lùi tới (CMC có dữ liệu từ 04/2013)
+        self.earliest_time = datetime.strptime(
+            self.api_config.get("backfill_earliest", "2013-04-01"), "%Y-%m-%d"
+        )
+
+        self.logger.info(
+            f"Khởi tạo Extract ({self.interval}) với symbols: {self.symbols}"
+        )
         self.logger.info(
             f"Batch seconds: {self.batch_seconds} ({self.batch_seconds // 86400} ngày)"
         )
         self.logger.info(f"Max workers (song song): {self.max_workers}")
+        self.logger.info(
+            f"Backfill workers (window song song): {self.backfill_workers}"
+        )
 
     def extract(self) -> Dict[str, pd.DataFrame]:
         """Extract dữ liệu cho tất cả symbols SONG SONG.
@@ -57,11 +92,17 @@ class Extract:
         self.logger.info(f"Bắt đầu extract SONG SONG cho {len(self.symbols)} symbols")
         self.logger.info(f"{'='*60}")
 
-        # Sử dụng ThreadPoolExecutor để xử lý song song
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+        # Thread pool theo symbol + 1 pool window dùng chung cho mọi symbol
+        with ThreadPoolExecutor(
+            max_workers=self.max_workers
+        ) as executor, ThreadPoolExecutor(
+            max_workers=self.backfill_workers
+        ) as window_executor:
             # Submit tất cả các task
             future_to_symbol = {
-                executor.submit(self.extract_symbol, symbol.lower()): symbol.lower()
+                executor.submit(
+                    self.extract_symbol, symbol.lower(), window_executor
+                ): symbol.lower()
                 for symbol in self.symbols
             }
 
@@ -74,10 +115,6 @@ class Extract:
                     self.logger.info(
                         f"✓ Hoàn thành {symbol.upper()}: {len(df)} bản ghi"
                     )
-
-                    # Gửi cảnh báo nếu không có data
-                    if df.empty:
-                        pass
                 except Exception as e:
                     self.logger.error(f"✗ Lỗi khi extract {symbol.upper()}: {str(e)}")
                     result[symbol] = pd.DataFrame()
@@ -88,88 +125,235 @@ class Extract:
 
         return result
 
-    def extract_symbol(self, symbol: str) -> pd.DataFrame:
+    def extract_symbol(
+        self, symbol: str, executor: Optional[Executor] = None
+    ) -> pd.DataFrame:
         """Extract toàn bộ lịch sử cho một symbol, lùi dần về quá khứ.
 
+        Cùng thuật toán với HistoricalPipeline (backfill_symbol → iter_backfill:
+        window trên lưới epoch, đọc ResponseCache, resume từ checkpoint). Chỉ
+        extract: checkpoint không được đẩy tiếp vì dữ liệu chưa ghi MongoDB.
+
         Args:
             symbol: Tên symbol (eth, bnb, xrp, ...)
+            executor: Executor dùng chung cho các window (nếu None sẽ tự tạo)
 
         Returns:
             DataFrame chứa toàn bộ dữ liệu lịch sử
         """
-        # Lấy CMC ID cho symbol
-        cmc_id = self.cmc_symbol_ids.get(symbol.lower())
-        if not cmc_id:
-            self.logger.error(f"Không tìm thấy CMC ID cho symbol: {symbol}")
-            return pd.DataFrame()
+        return self.backfill_symbol(symbol.lower(), executor=executor)
 
-        all_data = []
+    def backfill_symbol(
+        self,
+        symbol: str,
+        executor: Optional[Executor] = None,
+        time_end: Optional[datetime] = None,
+    ) -> pd.DataFrame:
+        """Backfill toàn bộ lịch sử cho một symbol và gộp thành một DataFrame.
 
-        # Bắt đầu từ thời điểm hiện tại
-        time_end = datetime.now()
-        batch_count = 0
-        total_records = 0
+        Chỉ nên dùng cho khoảng ngắn; HistoricalPipeline dùng iter_backfill để stream.
 
-        self.logger.info(f"Bắt đầu từ thời điểm: {time_end}")
+        Args:
+            symbol: Tên symbol (eth, bnb, xrp, ...)
+            executor: Executor dùng chung (nếu None sẽ tự tạo ThreadPoolExecutor)
+            time_end: Thời điểm bắt đầu lùi về quá khứ (mặc định: hiện tại)
 
-        while True:
-            batch_count += 1
+        Returns:
+            DataFrame chứa toàn bộ dữ liệu lịch sử
+        """
+        frames = [
+            df
+            for _, df in self.iter_backfill(
+                symbol, executor=executor, time_end=time_end
+            )
+            if df is not None and not df.empty
+        ]
+        if not frames:
+            self.logger.warning(f"Không có dữ liệu nào được extract cho {symbol}")
+            return pd.DataFrame()
 
-            # Tính time_start (lùi về quá khứ)
-            time_start = time_end - timedelta(seconds=self.batch_seconds)
+        df = pd.concat(frames, ignore_index=True)
+        df = df.sort_values("datetime", kind="stable")
+        return df.drop_duplicates(
+            subset=["symbol", "datetime"], keep="first"
+        ).reset_index(drop=True)
 
-            self.logger.info(f"\nBatch #{batch_count}:")
-            self.logger.info(f"  Từ: {time_start}")
-            self.logger.info(f"  Đến: {time_end}")
+    def iter_backfill(
+        self,
+        symbol: str,
+        executor: Optional[Executor] = None,
+        time_end: Optional[datetime] = None,
+    ) -> Iterator[Tuple[Tuple[datetime, datetime], pd.DataFrame]]:
+        """Backfill lịch sử một symbol, sinh từng window đã chuẩn hóa ngay khi fetch xong.
 
-            # Gọi API
-            try:
-                records = self._fetch_batch(
-                    cmc_id=cmc_id, time_start=time_start, time_end=time_end
-                )
+        Khoảng thời gian được chia thành các window độc lập (mỗi window batch_seconds),
+        đánh số 0, 1, 2, ... từ mới đến cũ. Luôn giữ tối đa backfill_workers window
+        đang chạy; window đầu tiên trả về rỗng đánh dấu thời điểm coin bắt đầu niêm yết,
+        các window cũ hơn nó bị hủy/bỏ qua.
+
+        Window mới chỉ được submit khi caller lấy phần tử tiếp theo, nên caller chậm
+        (ví dụ: queue ghi MongoDB đầy) sẽ tự động hãm tốc độ fetch.
 
-                if not records or len(records) == 0:
-                    self.logger.info(f"  ✓ Không còn dữ liệu - Dừng lại")
-                    break
+        Args:
+            symbol: Tên symbol (eth, bnb, xrp, ...)
+            executor: Executor dùng chung (nếu None sẽ tự tạo ThreadPoolExecutor)
+            time_end: Thời điểm bắt đầu lùi về quá khứ (mặc định: hiện tại)
 
-                self.logger.info(f"  ✓ Lấy được: {len(records)} bản ghi")
-                all_data.extend(records)
-                total_records += len(records)
+        Yields:
+            ((time_start, time_end), DataFrame của window), DataFrame là None nếu
+            window lỗi sau khi đã retry hết số lần cho phép
+        """
+        cmc_id = self.cmc_symbol_ids.get(symbol.lower())
+        if not cmc_id:
+            self.logger.error(f"Không tìm thấy CMC ID cho symbol: {symbol}")
+            return
 
-                # Lùi thời gian cho batch tiếp theo
-                time_end = time_start
+        if time_end is None:
+            skip, time_end = self.checkpoint.resume_point(symbol)
+            if skip:
+                return
+        self.logger.info(
+            f"[{symbol.upper()}] Backfill song song từ {time_end} "
+            f"({self.backfill_workers} window đồng thời)"
+        )
 
-                # Delay giữa các request
-                time.sleep(self.request_delay)
+        own_executor = executor is None
+        if own_executor:
+            executor = ThreadPoolExecutor(max_workers=self.backfill_workers)
 
-            except Exception as e:
-                self.logger.error(f"  ✗ Lỗi tại batch #{batch_count}: {str(e)}")
-                # Có thể là đã hết dữ liệu hoặc lỗi API
-                break
+        total_records = 0
+        failed_windows = []
+        try:
+            for window, records in self._iter_windows(
+                cmc_id, symbol, time_end, executor
+            ):
+                if records is None:
+                    failed_windows.append(window)
+                    yield window, None
+                    continue
+                df = self._convert_to_dataframe(records, symbol)
+                total_records += len(df)
+                yield window, df
+        finally:
+            if own_executor:
+                executor.shutdown(wait=True)
 
         self.logger.info(f"\n{'='*60}")
-        self.logger.info(f"Tổng kết:")
-        self.logger.info(f"  - Tổng số batch: {batch_count}")
+        self.logger.info(f"[{symbol.upper()}] Tổng kết backfill:")
         self.logger.info(f"  - Tổng số bản ghi: {total_records}")
+        self.logger.info(f"  - Số window lỗi: {len(failed_windows)}")
         self.logger.info(f"{'='*60}")
 
-        # Chuyển đổi thành DataFrame
-        if not all_data:
-            self.logger.warning(f"Không có dữ liệu nào được extract cho {symbol}")
-            return pd.DataFrame()
+    def _iter_windows(
+        self,
+        cmc_id: int,
+        symbol: str,
+        time_end: datetime,
+        executor: Executor,
+    ):
+        """Sinh (window, records) theo thứ tự hoàn thành, dừng sớm khi gặp window rỗng.
 
-        df = self._convert_to_dataframe(all_data, symbol)
-        return df
+        records là None nếu window lỗi sau khi đã retry hết số lần cho phép.
+        """
+        # Tối thiểu 1 window đang chạy để tránh treo vòng lặp
+        workers = max(1, int(self.backfill_workers or 1))
+
+        next_index = 0
+        # Index của window rỗng mới nhất (= điểm bắt đầu niêm yết)
+        stop_index: Optional[int] = None
+        in_flight = {}
+        attempts: Dict[int, int] = {}
+
+        def window_of(index: int) -> Tuple[datetime, datetime]:
+            return IntervalUtil.backfill_window(time_end, self.batch_seconds, index)
+
+        def submit(index: int):
+            start, end = window_of(index)
+            future = executor.submit(
+                self._fetch_batch, cmc_id=cmc_id, time_start=start, time_end=end
+            )
+            in_flight[future] = index
 
+        while True:
+            while (
+                len(in_flight) < workers
+                and (stop_index is None or next_index < stop_index)
+                and window_of(next_index)[1] > self.earliest_time
+            ):
+                submit(next_index)
+                next_index += 1
+
+            if not in_flight:
+                break
+
+            done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+            for future in done:
+                index = in_flight.pop(future)
+                window = window_of(index)
+
+                # Window cũ hơn điểm niêm yết: bỏ qua kết quả
+                if stop_index is not None and index > stop_index:
+                    continue
+
+                try:
+                    records = future.result()
+                except Exception as e:
+                    attempts[index] = attempts.get(index, 0) + 1
+                    if attempts[index] <= self.window_retries:
+                        self.logger.warning(
+                            f"[{symbol.upper()}] Window #{index} lỗi "
+                            f"(lần {attempts[index]}), thử lại: {str(e)}"
+                        )
+                        submit(index)
+                    else:
+                        self.logger.error(
+                            f"[{symbol.upper()}] ✗ Bỏ qua window #{index} "
+                            f"({window[0]} → {window[1]}): {str(e)}"
+                        )
+                        yield window, None
+                    continue
+
+                if not records and index == 0:
+                    # Window 0 có thể chỉ dài vài phút (tới mốc lưới): rỗng chưa
+                    # có nghĩa là đã tới thời điểm niêm yết
+                    yield window, records
+                    continue
+                if not records:
+                    if stop_index is None or index < stop_index:
+                        stop_index = index
+                        self.logger.info(
+                            f"[{symbol.upper()}] ✓ Window #{index} rỗng - "
+                            f"đã tới thời điểm niêm yết ({window[1]})"
+                        )
+                        # Hủy các window cũ hơn chưa chạy
+                        for pending, pending_index in list(in_flight.items()):
+                            if pending_index > stop_index and pending.cancel():
+                                in_flight.pop(pending)
+                    continue
+
+                self.logger.debug(
+                    f"[{symbol.upper()}] ✓ Window #{index}: {len(records)} bản ghi"
+                )
+                yield window, records
+
+    @Metrics.timed("fetch", source="historical")
     def _fetch_batch(
-        self, cmc_id: int, time_start: datetime, time_end: datetime
+        self,
+        cmc_id: int,
+        time_start: datetime,
+        time_end: datetime,
+        use_cache: bool = True,
     ) -> List[Dict]:
         """Gọi API để lấy dữ liệu trong một khoảng thời gian.
 
+        Window đã đóng được đọc từ ResponseCache nếu có (và được ghi vào cache
+        sau khi gọi API); window còn mở luôn gọi API.
+
         Args:
             cmc_id: ID của coin trên CMC
             time_start: Thời điểm bắt đầu
             time_end: Thời điểm kết thúc
+            use_cache: False để luôn gọi API (vẫn làm mới cache)
 
         Returns:
             List các bản ghi dạng dict
@@ -187,19 +371,29 @@ class Extract:
             interval=self.interval,
         )
 
-        # Gọi API
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
-
-        data = response.json()
+        cache_key, body = self.response_cache.lookup(
+            cmc_id, self.convert_id, self.interval, ts_start, ts_end, use_cache
+        )
+        if body is None:
+            # Gọi API qua session dùng chung (keep-alive, gzip, rate limiter)
+            response = self.api_client.get(url)
+            response.raise_for_status()
+            body = response.content
+            data = response.json()
+        else:
+            data = json.loads(body)
 
         # Parse response
         if "data" not in data:
             return []
 
         quotes = data["data"].get("quotes", [])
+        # Window rỗng có thể do CMC trả thiếu tạm thời: mặc định không cache
+        if cache_key and (quotes or self.response_cache.cache_empty):
+            self.response_cache.put(cache_key, body)
         return quotes
 
+    @Metrics.timed("parse", source="historical")
     def _convert_to_dataframe(self, records: List[Dict], symbol: str) -> pd.DataFrame:
         """Chuyển đổi list các bản ghi thành DataFrame chuẩn.
 
@@ -208,50 +402,8 @@ class Extract:
             symbol: Tên symbol
 
         Returns:
-            DataFrame đã được chuẩn hóa
+            DataFrame đã được chuẩn hóa (sắp xếp tăng dần, không trùng datetime)
         """
-        rows = []
-
-        for quote in records:
-            try:
-                # Lấy thông tin từ quote
-                time_open = quote.get("timeOpen")
-                time_close = quote.get("timeClose")
-                time_high = quote.get("timeHigh")
-                time_low = quote.get("timeLow")
-
-                # Lấy thông tin giá
-                quote_data = quote.get("quote", {})
-
-                row = {
-                    "symbol": symbol.upper(),
-                    "datetime": self.converter.iso_to_sql_datetime(time_close),
-                    "time_open": self.converter.iso_to_sql_datetime(time_open),
-                    "time_close": self.converter.iso_to_sql_datetime(time_close),
-                    "time_high": self.converter.iso_to_sql_datetime(time_high),
-                    "time_low": self.converter.iso_to_sql_datetime(time_low),
-                    "open": quote_data.get("open"),
-                    "high": quote_data.get("high"),
-                    "low": quote_data.get("low"),
-                    "close": quote_data.get("close"),
-                    "volume": quote_data.get("volume"),
-                    "market_cap": quote_data.get("marketCap"),
-                    "circulating_supply": quote_data.get("circulatingSupply"),
-                }
-                rows.append(row)
-
-            except Exception as e:
-                self.logger.warning(f"Lỗi khi parse quote: {str(e)}")
-                continue
-
-        df = pd.DataFrame(rows)
-
-        # Sắp xếp theo thời gian (tăng dần)
-        if not df.empty and "datetime" in df.columns:
-            df = df.sort_values("datetime").reset_index(drop=True)
-
-        # Loại bỏ duplicate nếu có
-        if not df.empty:
-            df = df.drop_duplicates(subset=["symbol", "datetime"], keep="first")
-
+        df = self.normalizer.to_dataframe(records, symbol)
+        Metrics().inc("cmc_records_total", len(df), stage="parse", source="historical")
         return df
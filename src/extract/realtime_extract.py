@@ -9,42 +9,65 @@ Logic:
 """
 
 import asyncio
+import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 
 import pandas as pd
 import requests
-from pymongo import DESCENDING
 
 from configs.logger_config import LoggerConfig
 from configs.mongo_config import MongoConfig
 from configs.variable_config import EXTRACT_DATA_CONFIG
 from util.convert_datetime_util import ConvertDatetime
+from util.interval_util import IntervalUtil
+from util.metrics import Metrics
+from util.quote_normalizer import QuoteNormalizer
+from extract.api_client import ApiClient
+from extract.symbol_registry import SymbolRegistry
+from extract.async_api_client import AsyncApiClient
+from load.storage_backend import StorageBackend
+from load.watermark_cache import WatermarkCache
 
 
 class RealtimeExtract:
-    def __init__(self):
+    def __init__(self, interval: Optional[str] = None):
         self.logger = LoggerConfig.logger_config("Realtime Extract")
         self.config = EXTRACT_DATA_CONFIG
         self.api_config = self.config.get("api", {})
         self.url_template = self.api_config.get("url_template", "")
-        self.interval = self.api_config.get("interval", "15m")
+        self.interval = interval or IntervalUtil.base_interval()
         self.convert_id = self.api_config.get("convert_id", 2781)
-        self.symbols = self.config.get("symbols", ["eth"])
-        self.cmc_symbol_ids = self.config.get("cmc_symbol_ids", {})
+        # Chỉ các symbol cần gọi API cho interval này
+        self.symbols = IntervalUtil.fetch_plan().get(self.interval, [])
+        # CMC ID tra hàng loạt qua SymbolRegistry (cache RAM / đĩa / MongoDB)
+        self.cmc_symbol_ids = SymbolRegistry().resolve(self.symbols)
         self.converter = ConvertDatetime()
+        self.normalizer = QuoteNormalizer()
+        # HTTP session đồng bộ dùng chung (connection pool + rate limiter)
+        self.api_client = ApiClient()
+        # HTTP client async dùng chung một connection pool keep-alive
+        self.async_client = AsyncApiClient()
 
         # Kết nối MongoDB để kiểm tra data (lazy connection)
         self.mongo_config = MongoConfig()
         self.mongo_client = None
         self.db = None
         self.collection = None
-
-        # API giới hạn 399 bản ghi, tương đương khoảng 4 ngày với interval 15m
-        self.max_records_per_request = 399
-        self.max_batch_seconds = 4 * 24 * 3600  # 4 ngay
-
-        self.logger.info(f"Khởi tạo Realtime Extract với symbols: {self.symbols}")
+        # Đọc mốc mới nhất theo layout lưu trữ (không quét view của layout bucket)
+        self.storage = StorageBackend.create(interval=self.interval)
+        # Mốc mới nhất giữ trong RAM, RealtimeLoad cập nhật sau mỗi lần ghi
+        self.watermarks = WatermarkCache(self.interval)
+        # Thống kê vòng extract gần nhất (RealtimePipeline log 1 bản ghi tổng hợp)
+        self.last_summary: Dict = {}
+
+        # API giới hạn 399 bản ghi/request → độ dài window tính theo interval
+        self.max_records_per_request = IntervalUtil.max_records()
+        self.max_batch_seconds = IntervalUtil.batch_seconds(self.interval)
+
+        self.logger.info(
+            f"Khởi tạo Realtime Extract ({self.interval}) với symbols: {self.symbols}"
+        )
 
     def _get_mongo_client(self):
         """Lazy connection: tạo client khi cần, tự động reconnect nếu bị đóng."""
@@ -55,9 +78,7 @@ class RealtimeExtract:
                 self.db = self.mongo_client.get_database(
                     self.config.get("database", "cmc_db")
                 )
-                self.collection = self.db.get_collection(
-                    self.config.get("historical_collection", "cmc")
-                )
+                self.collection = self.db.get_collection(self.storage.collection_name)
                 self.logger.info("Kết nối MongoDB thành công")
             return self.collection
         except Exception as e:
@@ -68,7 +89,7 @@ class RealtimeExtract:
             return None
 
     def get_latest_datetime_in_db(self, symbol: str) -> Optional[datetime]:
-        """Lấy thời điểm mới nhất trong DB cho một symbol.
+        """Lấy thời điểm mới nhất trong DB cho một symbol (ưu tiên watermark cache).
 
         Args:
             symbol: Tên symbol (eth, bnb, xrp)
@@ -83,47 +104,77 @@ class RealtimeExtract:
                 self.logger.warning("Không thể kết nối MongoDB, trả về None")
                 return None
 
-            # Tìm bản ghi mới nhất theo datetime
-            latest_record = collection.find_one(
-                {"symbol": symbol.upper()}, sort=[("datetime", DESCENDING)]
-            )
+            hit, latest_dt = self.watermarks.get(symbol)
+            if hit:
+                return latest_dt
 
-            if latest_record and "datetime" in latest_record:
-                # Parse datetime string về datetime object
-                datetime_str = latest_record["datetime"]
-                latest_dt = datetime.strptime(datetime_str, "%Y-%m-%d %H:%M:%S")
-                self.logger.info(
+            # Tìm bản ghi mới nhất theo datetime (chuỗi, BSON Date hoặc epoch → datetime)
+            latest_dt = self.storage.latest_datetime(self.db, symbol)
+            self.watermarks.set(symbol, latest_dt)
+
+            if latest_dt is not None:
+                self.logger.debug(
                     f"Symbol {symbol.upper()}: Dữ liệu mới nhất trong DB: {latest_dt}"
                 )
                 return latest_dt
             else:
-                self.logger.info(f"Symbol {symbol.upper()}: Chưa có dữ liệu trong DB")
+                self.logger.debug(f"Symbol {symbol.upper()}: Chưa có dữ liệu trong DB")
                 return None
 
         except Exception as e:
             self.logger.error(f"Lỗi khi lấy datetime mới nhất cho {symbol}: {str(e)}")
             return None
 
-    async def extract(self) -> Dict[str, pd.DataFrame]:
-        """Extract dữ liệu realtime cho tất cả symbols song song bằng asyncio.
+    def refresh_watermarks(self):
+        """Nạp lại watermark cache từ DB nếu tới hạn (lỗi thì để từng symbol tự đọc)."""
+        try:
+            if self._get_mongo_client() is None:
+                return
+            self.watermarks.refresh_if_due(self.storage, self.db, self.symbols)
+        except Exception as e:
+            self.logger.error(f"Lỗi khi nạp watermark: {str(e)}")
+
+    async def extract(
+        self, symbols: Optional[List[str]] = None
+    ) -> Dict[str, pd.DataFrame]:
+        """Extract dữ liệu realtime cho các symbols song song bằng asyncio.
+
+        Args:
+            symbols: Chỉ extract các symbol này (mặc định: tất cả symbols)
 
         Returns:
             Dict mapping symbol -> DataFrame
         """
-        self.logger.info("\nBẮT ĐẦU REALTIME EXTRACT")
+        self.logger.debug("\nBẮT ĐẦU REALTIME EXTRACT")
+
+        # Nạp watermark mọi symbol bằng 1 aggregation (lần đầu / khi tới hạn đối chiếu)
+        await asyncio.to_thread(self.refresh_watermarks)
 
         # Chạy song song tất cả symbols với return_exceptions=True để không crash khi 1 task lỗi
-        tasks = [self.extract_symbol_async(symbol.lower()) for symbol in self.symbols]
+        symbols = symbols or self.symbols
+        tasks = [self.extract_symbol_async(symbol.lower()) for symbol in symbols]
         results = await asyncio.gather(*tasks, return_exceptions=True)
 
         # Xử lý kết quả - không raise exception, chỉ log
         result = {}
-        for symbol, res in zip(self.symbols, results):
+        # Thống kê cả vòng: pipeline log 1 bản ghi tổng hợp thay cho log từng symbol
+        summary = {
+            "symbols": len(symbols),
+            "with_data": 0,
+            "up_to_date": 0,
+            "no_data": 0,
+            "errors": 0,
+            "records": 0,
+        }
+        failed_symbols = []
+        for symbol, res in zip(symbols, results):
             symbol_lower = symbol.lower()
             if isinstance(res, Exception):
                 self.logger.error(f"Lỗi khi extract {symbol_lower.upper()}: {str(res)}")
                 # Không raise, chỉ log và tiếp tục với symbol khác
                 result[symbol_lower] = pd.DataFrame()
+                summary["errors"] += 1
+                failed_symbols.append(symbol_lower.upper())
             else:
                 try:
                     df, is_already_updated = res
@@ -135,25 +186,81 @@ class RealtimeExtract:
                     result[symbol_lower] = pd.DataFrame()
 
                 if not df.empty:
-                    self.logger.info(
-                        f"{symbol_lower.upper()}: Lấy được {len(df)} bản ghi mới"
+                    summary["with_data"] += 1
+                    summary["records"] += len(df)
+                    self.logger.debug(
+                        "%s: Lấy được %s bản ghi mới", symbol_lower.upper(), len(df)
                     )
                 else:
                     if is_already_updated:
-                        self.logger.info(
-                            f"{symbol_lower.upper()}: Không có dữ liệu mới (đã cập nhật)"
+                        summary["up_to_date"] += 1
+                        self.logger.debug(
+                            "%s: Không có dữ liệu mới (đã cập nhật)",
+                            symbol_lower.upper(),
                         )
                     else:
-                        self.logger.warning(
-                            f"{symbol_lower.upper()}: Không lấy được dữ liệu từ API"
+                        summary["no_data"] += 1
+                        failed_symbols.append(symbol_lower.upper())
+                        self.logger.debug(
+                            "%s: Không lấy được dữ liệu từ API", symbol_lower.upper()
                         )
 
-        self.logger.info("\nHOÀN THÀNH REALTIME EXTRACT")
+        # Vài symbol đầu không có dữ liệu / lỗi để tra cứu, không liệt kê hết
+        summary["failed_symbols"] = failed_symbols[:10]
+        self.last_summary = summary
+        self.logger.debug("\nHOÀN THÀNH REALTIME EXTRACT")
         return result
 
     async def extract_symbol_async(self, symbol: str):
-        """Async wrapper cho extract_symbol."""
-        return await asyncio.to_thread(self.extract_symbol, symbol)
+        """Extract dữ liệu realtime cho một symbol bằng HTTP client async.
+
+        Giống extract_symbol nhưng không chiếm thread: mọi request đi qua
+        session aiohttp dùng chung, backoff bằng asyncio.sleep.
+        """
+        cmc_id = self.cmc_symbol_ids.get(symbol.lower())
+        if not cmc_id:
+            self.logger.error(f"Không tìm thấy CMC ID cho symbol: {symbol}")
+            return pd.DataFrame(), False
+
+        hit, latest_dt = self.watermarks.get(symbol)
+        if not hit:
+            # Truy vấn MongoDB vẫn là blocking, chạy trong thread
+            latest_dt = await asyncio.to_thread(self.get_latest_datetime_in_db, symbol)
+
+        windows = self._plan_windows(latest_dt)
+        if windows is None:
+            return pd.DataFrame(), True
+
+        # Các window độc lập nên fetch đồng thời
+        results = await asyncio.gather(
+            *[
+                self._fetch_batch_async(
+                    cmc_id=cmc_id, time_start=current_start, time_end=current_end
+                )
+                for current_start, current_end in windows
+            ],
+            return_exceptions=True,
+        )
+
+        all_data = []
+        errors = []
+        for (current_start, current_end), records in zip(windows, results):
+            if isinstance(records, Exception):
+                self.logger.error(
+                    f"Lỗi khi fetch batch {current_start} → {current_end}: {str(records)}"
+                )
+                errors.append(records)
+                continue
+            if records:
+                self.logger.debug(f"Lấy được: {len(records)} bản ghi")
+                all_data.extend(records)
+            else:
+                self.logger.debug(f"Không có dữ liệu trong batch này")
+
+        if errors and len(errors) == len(windows):
+            # Mọi window đều lỗi: extract() tính là lỗi, không phải "không có dữ liệu"
+            raise errors[0]
+        return self._build_result(all_data, symbol, latest_dt)
 
     def extract_symbol(self, symbol: str):
         """Extract dữ liệu realtime cho một symbol.
@@ -175,13 +282,44 @@ class RealtimeExtract:
         # Lấy thời điểm mới nhất trong DB
         latest_dt = self.get_latest_datetime_in_db(symbol)
 
+        windows = self._plan_windows(latest_dt)
+        if windows is None:
+            return pd.DataFrame(), True  # True = đã cập nhật, không cần cảnh báo
+
+        all_data = []
+        for current_start, current_end in windows:
+            self.logger.debug(f"Lấy dữ liệu từ {current_start} đến {current_end}")
+
+            try:
+                records = self._fetch_batch(
+                    cmc_id=cmc_id, time_start=current_start, time_end=current_end
+                )
+
+                if records:
+                    self.logger.debug(f"Lấy được: {len(records)} bản ghi")
+                    all_data.extend(records)
+                else:
+                    self.logger.debug(f"Không có dữ liệu trong batch này")
+
+            except Exception as e:
+                self.logger.error(f"Lỗi khi fetch batch: {str(e)}")
+                break
+
+        return self._build_result(all_data, symbol, latest_dt)
+
+    def _plan_windows(self, latest_dt: Optional[datetime]):
+        """Tính các window cần lấy từ DB_latest đến HIỆN TẠI (mới → cũ).
+
+        Returns:
+            List[(time_start, time_end)], hoặc None nếu dữ liệu đã cập nhật
+        """
         # LOGIC ĐƠN GIẢN: Lấy từ DB_latest đến HIỆN TẠI
         # API sẽ tự trả về data có sẵn, không cần làm tròn phức tạp
         now = datetime.now()
         time_end = now
 
-        self.logger.info(f"Thời điểm hiện tại: {now.strftime('%Y-%m-%d %H:%M:%S')}")
-        self.logger.info(f"Lấy dữ liệu đến: {time_end.strftime('%Y-%m-%d %H:%M:%S')}")
+        self.logger.debug(f"Thời điểm hiện tại: {now.strftime('%Y-%m-%d %H:%M:%S')}")
+        self.logger.debug(f"Lấy dữ liệu đến: {time_end.strftime('%Y-%m-%d %H:%M:%S')}")
 
         if latest_dt:
             # Bắt đầu từ sau bản ghi mới nhất (thêm 1 phút để tránh trùng)
@@ -191,49 +329,35 @@ class RealtimeExtract:
             time_diff = (time_end - time_start).total_seconds()
 
             if time_diff <= 0:
-                self.logger.info(
+                self.logger.debug(
                     f"Dữ liệu đã cập nhật (DB mới nhất: {latest_dt.strftime('%Y-%m-%d %H:%M:%S')})"
                 )
-                return pd.DataFrame(), True  # True = đã cập nhật, không cần cảnh báo
+                return None
 
-            self.logger.info(
+            self.logger.debug(
                 f"Khoảng trống cần bù: {time_diff / 60:.1f} phút (từ {time_start.strftime('%Y-%m-%d %H:%M')} đến {time_end.strftime('%Y-%m-%d %H:%M')})"
             )
 
         else:
             # Nếu chưa có dữ liệu, lấy 7 ngày gần nhất
             time_start = time_end - timedelta(days=7)
-            self.logger.info("Chưa có dữ liệu trong DB, lấy 7 ngày gần nhất")
+            self.logger.debug("Chưa có dữ liệu trong DB, lấy 7 ngày gần nhất")
 
         # Nếu khoảng thời gian > max_batch_seconds, chia nhỏ ra
-        all_data = []
+        windows = []
         current_end = time_end
-
         while current_end > time_start:
             current_start = max(
                 time_start, current_end - timedelta(seconds=self.max_batch_seconds)
             )
-
-            self.logger.info(f"Lấy dữ liệu từ {current_start} đến {current_end}")
-
-            try:
-                records = self._fetch_batch(
-                    cmc_id=cmc_id, time_start=current_start, time_end=current_end
-                )
-
-                if records:
-                    self.logger.info(f"Lấy được: {len(records)} bản ghi")
-                    all_data.extend(records)
-                else:
-                    self.logger.info(f"Không có dữ liệu trong batch này")
-
-                # Lùi thời gian
-                current_end = current_start
-
-            except Exception as e:
-                self.logger.error(f"Lỗi khi fetch batch: {str(e)}")
-                break
-
+            windows.append((current_start, current_end))
+            current_end = current_start
+        return windows
+
+    def _build_result(
+        self, all_data: List[Dict], symbol: str, latest_dt: Optional[datetime]
+    ):
+        """Chuyển dữ liệu thô thành (DataFrame mới, is_already_updated)."""
         # Chuyển đổi thành DataFrame
         if not all_data:
             return pd.DataFrame(), False  # False = không có data từ API, cần cảnh báo
@@ -242,28 +366,90 @@ class RealtimeExtract:
 
         # Loại bỏ các bản ghi đã có trong DB (dựa vào datetime)
         if latest_dt and not df.empty:
-            latest_dt_str = latest_dt.strftime("%Y-%m-%d %H:%M:%S")
             original_len = len(df)
-            df = df[df["datetime"] > latest_dt_str]
+            df = df[df["datetime"] > pd.Timestamp(latest_dt)]
             removed = original_len - len(df)
             if removed > 0:
-                self.logger.info(
+                self.logger.debug(
                     f"Loại bỏ {removed} bản ghi trùng lặp (đã có trong DB)"
                 )
 
         # Nếu sau khi loại bỏ trùng lặp mà không còn data
         if df.empty:
-            if all_data:
-                # Có data từ API nhưng tất cả đều trùng -> đã cập nhật, không cần cảnh báo
-                self.logger.info("Tất cả dữ liệu từ API đều đã có trong DB")
-                return df, True
-            else:
-                # Không có data từ API -> cần cảnh báo
-                return df, False
+            # Có data từ API nhưng tất cả đều trùng -> đã cập nhật, không cần cảnh báo
+            self.logger.debug("Tất cả dữ liệu từ API đều đã có trong DB")
+            return df, True
 
         # Có data mới
         return df, False
 
+    def _build_url(self, cmc_id: int, time_start: datetime, time_end: datetime) -> str:
+        # Chuyển datetime sang Unix timestamp
+        ts_start = int(time_start.timestamp())
+        ts_end = int(time_end.timestamp())
+
+        return self.url_template.format(
+            id=cmc_id,
+            convertId=self.convert_id,
+            timeStart=ts_start,
+            timeEnd=ts_end,
+            interval=self.interval,
+        )
+
+    def _parse_quotes(self, data) -> List[Dict]:
+        """Lấy danh sách quotes từ JSON response."""
+        # Log chi tiết từng request chỉ ở DEBUG (đối số %s chỉ format khi bật DEBUG)
+        self.logger.debug(
+            "API Response Keys: %s",
+            list(data.keys()) if isinstance(data, dict) else "Not dict",
+        )
+
+        # Parse response
+        if not isinstance(data, dict) or "data" not in data:
+            self.logger.warning(f"API response không có key 'data': {data}")
+            return []
+
+        quotes = data["data"].get("quotes", [])
+        self.logger.debug("Số lượng records từ API: %s", len(quotes))
+
+        if quotes and self.logger.isEnabledFor(logging.DEBUG):
+            # Log sample record đầu tiên để debug
+            sample = quotes[0]
+            self.logger.debug(
+                "Sample record: timeClose=%s, quote=%s",
+                sample.get("timeClose"),
+                sample.get("quote", {}).get("close"),
+            )
+
+        return quotes
+
+    @Metrics.timed("fetch", source="realtime")
+    async def _fetch_batch_async(
+        self, cmc_id: int, time_start: datetime, time_end: datetime
+    ) -> List[Dict]:
+        """Phiên bản async của _fetch_batch, dùng session aiohttp dùng chung.
+
+        Raises:
+            RuntimeError: hết số lần retry hoặc response không parse được - lỗi
+                không bị coi là window rỗng (được đếm vào cmc_stage_errors_total)
+        """
+        url = self._build_url(cmc_id, time_start, time_end)
+        self.logger.debug("API URL: %s", url)
+
+        data = await self.async_client.get_json(url)
+        if data is None:
+            raise RuntimeError(f"Hết số lần retry cho API request: {url}")
+
+        try:
+            return self._parse_quotes(data)
+        except Exception as e:
+            raise RuntimeError(f"Lỗi khi parse response API: {str(e)}") from e
+
+    async def aclose(self):
+        """Đóng HTTP session async (gọi khi dừng event loop)."""
+        await self.async_client.close()
+
+    @Metrics.timed("fetch", source="realtime")
     def _fetch_batch(
         self, cmc_id: int, time_start: datetime, time_end: datetime
     ) -> List[Dict]:
@@ -277,20 +463,9 @@ class RealtimeExtract:
         Returns:
             List các bản ghi dạng dict
         """
-        # Chuyển datetime sang Unix timestamp
-        ts_start = int(time_start.timestamp())
-        ts_end = int(time_end.timestamp())
+        url = self._build_url(cmc_id, time_start, time_end)
 
-        # Format URL
-        url = self.url_template.format(
-            id=cmc_id,
-            convertId=self.convert_id,
-            timeStart=ts_start,
-            timeEnd=ts_end,
-            interval=self.interval,
-        )
-
-        self.logger.info(f"API URL: {url}")
+        self.logger.debug("API URL: %s", url)
 
         # Gọi API với retry và exponential backoff
         max_retries = 3
@@ -298,8 +473,8 @@ class RealtimeExtract:
 
         for attempt in range(max_retries):
             try:
-                response = requests.get(url, timeout=30)
-                self.logger.info(f"API Response Status: {response.status_code}")
+                response = self.api_client.get(url)
+                self.logger.debug("API Response Status: %s", response.status_code)
 
                 response.raise_for_status()
                 break  # Thành công, thoát khỏi vòng lặp retry
@@ -320,28 +495,7 @@ class RealtimeExtract:
                     return []
 
         try:
-
-            data = response.json()
-            self.logger.info(
-                f"API Response Keys: {list(data.keys()) if isinstance(data, dict) else 'Not dict'}"
-            )
-
-            # Parse response
-            if "data" not in data:
-                self.logger.warning(f"API response không có key 'data': {data}")
-                return []
-
-            quotes = data["data"].get("quotes", [])
-            self.logger.info(f"Số lượng records từ API: {len(quotes)}")
-
-            if quotes:
-                # Log sample record đầu tiên để debug
-                sample = quotes[0]
-                self.logger.info(
-                    f"Sample record: timeClose={sample.get('timeClose')}, quote={sample.get('quote', {}).get('close')}"
-                )
-
-            return quotes
+            return self._parse_quotes(response.json())
 
         except requests.exceptions.RequestException as e:
             self.logger.error(f"Lỗi HTTP khi gọi API: {str(e)}")
@@ -350,6 +504,7 @@ class RealtimeExtract:
             self.logger.error(f"Lỗi khi parse response API: {str(e)}")
             return []
 
+    @Metrics.timed("parse", source="realtime")
     def _convert_to_dataframe(self, records: List[Dict], symbol: str) -> pd.DataFrame:
         """Chuyển đổi list các bản ghi thành DataFrame.
 
@@ -358,50 +513,8 @@ class RealtimeExtract:
             symbol: Tên symbol
 
         Returns:
-            DataFrame đã được chuẩn hóa
+            DataFrame đã được chuẩn hóa (sắp xếp tăng dần, không trùng datetime)
         """
-        rows = []
-
-        for quote in records:
-            try:
-                # Lấy thông tin từ quote
-                time_open = quote.get("timeOpen")
-                time_close = quote.get("timeClose")
-                time_high = quote.get("timeHigh")
-                time_low = quote.get("timeLow")
-
-                # Lấy thông tin giá
-                quote_data = quote.get("quote", {})
-
-                row = {
-                    "symbol": symbol.upper(),
-                    "datetime": self.converter.iso_to_sql_datetime(time_close),
-                    "time_open": self.converter.iso_to_sql_datetime(time_open),
-                    "time_close": self.converter.iso_to_sql_datetime(time_close),
-                    "time_high": self.converter.iso_to_sql_datetime(time_high),
-                    "time_low": self.converter.iso_to_sql_datetime(time_low),
-                    "open": quote_data.get("open"),
-                    "high": quote_data.get("high"),
-                    "low": quote_data.get("low"),
-                    "close": quote_data.get("close"),
-                    "volume": quote_data.get("volume"),
-                    "market_cap": quote_data.get("marketCap"),
-                    "circulating_supply": quote_data.get("circulatingSupply"),
-                }
-                rows.append(row)
-
-            except Exception as e:
-                self.logger.warning(f"Lỗi khi parse quote: {str(e)}")
-                continue
-
-        df = pd.DataFrame(rows)
-
-        # Sắp xếp theo thời gian (tăng dần)
-        if not df.empty and "datetime" in df.columns:
-            df = df.sort_values("datetime").reset_index(drop=True)
-
-        # Loại bỏ duplicate nếu có
-        if not df.empty:
-            df = df.drop_duplicates(subset=["symbol", "datetime"], keep="first")
-
+        df = self.normalizer.to_dataframe(records, symbol)
+        Metrics().inc("cmc_records_total", len(df), stage="parse", source="realtime")
         return df
@@ -0,0 +1,225 @@
+"""
+Response Cache - Cache response API lịch sử của các window đã đóng trên đĩa.
+
+- Khóa nội dung: sha256(id, convertId, interval, timeStart, timeEnd) → file
+  <directory>/<2 ký tự đầu>/<hash>.json.gz (body JSON thô, nén gzip)
+- Chỉ window đã đóng (nến cuối đã đóng quá closed_after_seconds) được đọc/ghi;
+  window còn mở (chứa hiện tại) luôn gọi API
+- Giới hạn max_bytes, vượt thì xóa file ít dùng nhất (LRU theo mtime, được
+  chạm lại mỗi lần hit) tới khi còn ~90% giới hạn
+- Ghi file tạm rồi os.replace: nhiều thread / process backfill dùng chung thư mục
+- bypass (CMC_CACHE_BYPASS=1 hoặc --no-cache): không đọc cache nhưng vẫn ghi
+  response mới (làm mới cache)
+Sử dụng:
+    key, body = ResponseCache().lookup(id, convert_id, interval, start, end)
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from configs.logger_config import LoggerConfig
+from configs.variable_config import EXTRACT_DATA_CONFIG
+from util.interval_util import IntervalUtil
+from util.metrics import Metrics
+
+
+class ResponseCache:
+    """Singleton. Sử dụng: ResponseCache().lookup(...) rồi put(key, body) khi miss"""
+
+    _instance = None
+
+    def _init_cache(self):
+        self.logger = LoggerConfig.logger_config("Response Cache")
+        self.config = EXTRACT_DATA_CONFIG.get("response_cache", {})
+        self.enabled = bool(self.config.get("enabled", True))
+        root_dir = os.path.dirname(
+            os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        )
+        self.directory = os.path.join(
+            root_dir, self.config.get("directory", "cache/responses")
+        )
+        self.max_bytes = int(self.config.get("max_bytes", 512 * 1024 * 1024))
+        self.closed_after_seconds = float(self.config.get("closed_after_seconds", 3600))
+        self.cache_empty = bool(self.config.get("cache_empty", False))
+
+        self._lock = threading.Lock()
+        # path -> (size, mtime); nạp lười từ thư mục ở lần dùng đầu
+        self._index: Optional[Dict[str, Tuple[int, float]]] = None
+        self._total_bytes = 0
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ResponseCache, cls).__new__(cls)
+            cls._instance._init_cache()
+        return cls._instance
+
+    @property
+    def bypass(self) -> bool:
+        # Đọc mỗi lần: main.py --no-cache có thể bật sau khi cache đã tạo
+        return bool(self.config.get("bypass", False))
+
+    @staticmethod
+    def key(
+        cmc_id: int, convert_id: int, interval: str, time_start: int, time_end: int
+    ) -> str:
+        raw = f"{cmc_id}|{convert_id}|{interval}|{int(time_start)}|{int(time_end)}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def is_closed(self, interval: str, time_end: int) -> bool:
+        """Window đã đóng: mọi nến trong window đã đóng từ closed_after_seconds trước."""
+        step = IntervalUtil.to_seconds(interval)
+        last_close = -(-int(time_end) // step) * step
+        return last_close + self.closed_after_seconds <= time.time()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json.gz")
+
+    def _load_index(self):
+        """Quét thư mục cache 1 lần (gọi khi đang giữ _lock)."""
+        if self._index is not None:
+            return
+        self._index = {}
+        self._total_bytes = 0
+        if not os.path.isdir(self.directory):
+            return
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if not entry.name.endswith(".json.gz"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                self._index[entry.path] = (stat.st_size, stat.st_mtime)
+                self._total_bytes += stat.st_size
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Body JSON đã giải nén, None nếu chưa có (hoặc file hỏng)."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                body = gzip.decompress(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError) as e:
+            self.logger.warning(f"File cache hỏng, bỏ qua: {path} ({str(e)})")
+            self._remove(path)
+            return None
+
+        # Chạm mtime để LRU biết file vừa được dùng
+        now = time.time()
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+        with self._lock:
+            if self._index is not None and path in self._index:
+                self._index[path] = (self._index[path][0], now)
+        return body
+
+    def put(self, key: str, body: bytes):
+        path = self._path(key)
+        data = gzip.compress(body, compresslevel=6)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            self.logger.warning(f"Không ghi được cache response: {str(e)}")
+            return
+
+        with self._lock:
+            self._load_index()
+            previous = self._index.get(path)
+            if previous:
+                self._total_bytes -= previous[0]
+            self._index[path] = (len(data), time.time())
+            self._total_bytes += len(data)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.logger.warning(f"Không xóa được file cache {path}: {str(e)}")
+
+    def _evict(self):
+        """Xóa file dùng lâu nhất tới khi còn 90% max_bytes (gọi khi đang giữ _lock)."""
+        target = self.max_bytes * 0.9
+        removed = 0
+        for path, (size, _) in sorted(self._index.items(), key=lambda item: item[1][1]):
+            if self._total_bytes <= target:
+                break
+            self._remove(path)
+            del self._index[path]
+            self._total_bytes -= size
+            removed += 1
+        Metrics().inc("cmc_response_cache_total", removed, result="evicted")
+        self.logger.debug(
+            "Đã xóa %s file cache (LRU), còn %.1f MB", removed, self._total_bytes / 1e6
+        )
+
+    def lookup(
+        self,
+        cmc_id: int,
+        convert_id: int,
+        interval: str,
+        time_start: int,
+        time_end: int,
+        use_cache: bool = True,
+    ) -> Tuple[Optional[str], Optional[bytes]]:
+        """Tra cache cho 1 window.
+
+        Returns:
+            (key, body): key None = không được cache (tắt cache / window còn mở);
+            body None = cần gọi API rồi put(key, body) nếu key khác None
+        """
+        if not self.enabled:
+            return None, None
+        if not self.is_closed(interval, time_end):
+            Metrics().inc("cmc_response_cache_total", result="open")
+            return None, None
+
+        key = self.key(cmc_id, convert_id, interval, time_start, time_end)
+        if not use_cache or self.bypass:
+            Metrics().inc("cmc_response_cache_total", result="bypass")
+            return key, None
+        body = self.get(key)
+        Metrics().inc(
+            "cmc_response_cache_total", result="hit" if body is not None else "miss"
+        )
+        return key, body
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            self._load_index()
+            return {
+                "files": len(self._index),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def clear(self) -> int:
+        """Xóa toàn bộ cache. Returns: số file đã xóa."""
+        with self._lock:
+            self._load_index()
+            paths = list(self._index)
+            for path in paths:
+                self._remove(path)
+            self._index = {}
+            self._total_bytes = 0
+        return len(paths)
+
+
+__all__ = ["ResponseCache"]
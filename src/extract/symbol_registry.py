@@ -0,0 +1,263 @@
+"""
+Symbol Registry - Danh sách symbol theo dõi và CMC ID của chúng.
+
+- Tra CMC ID hàng loạt từ 1 request mapping (map_url) hoặc file JSON cục bộ
+  (mapping_file) thay vì sửa tay cmc_symbol_ids
+- Mapping được cache 3 tầng: RAM → file trên đĩa → MongoDB (TTL index), hết
+  ttl_seconds mới gọi lại API; API lỗi thì dùng bản cache cũ (TTL index chỉ xóa
+  bản trong MongoDB sau mongo_expire_seconds)
+- Nhiều coin trùng ticker: lấy coin có rank (market cap) cao nhất
+- universe.mode = "top": theo dõi top_n coin theo market cap (listing_url)
+  cộng các symbol trong EXTRACT_DATA_CONFIG["symbols"]
+- cmc_symbol_ids trong config vẫn được ưu tiên (ghim ID thủ công)
+"""
+
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from configs.logger_config import LoggerConfig
+from configs.mongo_config import MongoConfig
+from configs.variable_config import EXTRACT_DATA_CONFIG
+from extract.api_client import ApiClient
+
+# Mỗi entry: {"symbol": "eth", "id": 1027, "rank": 2}
+Entries = List[Dict]
+
+
+class SymbolRegistry:
+    """Singleton. Sử dụng: SymbolRegistry().resolve(["eth", "sol"])"""
+
+    _instance = None
+
+    def _init_registry(self):
+        self.logger = LoggerConfig.logger_config("Symbol Registry")
+        self.config = EXTRACT_DATA_CONFIG.get("symbol_registry", {})
+        self.map_url = self.config.get("map_url")
+        self.listing_url = self.config.get("listing_url")
+        self.mapping_file = self.config.get("mapping_file")
+        self.ttl = timedelta(seconds=float(self.config.get("ttl_seconds", 86400)))
+        self.collection_name = self.config.get("collection", "cmc_symbol_registry")
+        self.database = EXTRACT_DATA_CONFIG.get("database", "cmc_db")
+        root_dir = os.path.dirname(
+            os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        )
+        self.cache_file = os.path.join(
+            root_dir, self.config.get("cache_file", "cache/cmc_symbol_registry.json")
+        )
+        universe = self.config.get("universe", {})
+        self.mode = universe.get("mode", "config")
+        self.top_n = int(universe.get("top_n", 100))
+
+        self._lock = threading.Lock()
+        # kind ("map" / "top") -> (fetched_at, entries)
+        self._memory: Dict[str, tuple] = {}
+        self._missing_logged = set()
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(SymbolRegistry, cls).__new__(cls)
+            cls._instance._init_registry()
+        return cls._instance
+
+    def _fresh(self, fetched_at: Optional[datetime]) -> bool:
+        return fetched_at is not None and datetime.utcnow() - fetched_at < self.ttl
+
+    @property
+    def collection(self):
+        return (
+            MongoConfig()
+            .get_client()
+            .get_database(self.database)
+            .get_collection(self.collection_name)
+        )
+
+    def _read_disk(self, kind: str):
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                cached = json.load(f).get(kind)
+            if cached:
+                return datetime.fromisoformat(cached["fetched_at"]), cached["entries"]
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            self.logger.warning(f"Không đọc được cache symbol trên đĩa: {str(e)}")
+        return None, None
+
+    def _write_disk(self, kind: str, fetched_at: datetime, entries: Entries):
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            try:
+                with open(self.cache_file, "r", encoding="utf-8") as f:
+                    content = json.load(f)
+            except (FileNotFoundError, ValueError):
+                content = {}
+            content[kind] = {"fetched_at": fetched_at.isoformat(), "entries": entries}
+            tmp_file = f"{self.cache_file}.tmp"
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(content, f)
+            os.replace(tmp_file, self.cache_file)
+        except Exception as e:
+            self.logger.warning(f"Không ghi được cache symbol trên đĩa: {str(e)}")
+
+    def _read_mongo(self, kind: str):
+        try:
+            doc = self.collection.find_one({"_id": kind})
+            if doc:
+                return doc.get("fetched_at"), doc.get("entries")
+        except Exception as e:
+            self.logger.warning(f"Không đọc được cache symbol trong MongoDB: {str(e)}")
+        return None, None
+
+    def _write_mongo(self, kind: str, fetched_at: datetime, entries: Entries):
+        try:
+            self.collection.replace_one(
+                {"_id": kind},
+                {"_id": kind, "fetched_at": fetched_at, "entries": entries},
+                upsert=True,
+            )
+        except Exception as e:
+            self.logger.warning(f"Không ghi được cache symbol vào MongoDB: {str(e)}")
+
+    @staticmethod
+    def _parse_entries(payload) -> Entries:
+        """Đọc danh sách coin từ response CMC hoặc file cục bộ.
+
+        Chấp nhận {symbol: id}, list [{symbol, id, rank|cmcRank}] hoặc
+        {"data": {...: [..]}} như response data-api của CMC.
+        """
+        if isinstance(payload, dict) and "data" in payload:
+            payload = payload["data"]
+        if isinstance(payload, dict):
+            lists = [value for value in payload.values() if isinstance(value, list)]
+            if lists:
+                payload = lists[0]
+            else:
+                payload = [
+                    {"symbol": symbol, "id": cmc_id}
+                    for symbol, cmc_id in payload.items()
+                ]
+
+        entries = []
+        for item in payload or []:
+            if not isinstance(item, dict) or "id" not in item or "symbol" not in item:
+                continue
+            if item.get("is_active", item.get("isActive", 1)) in (0, False):
+                continue
+            rank = item.get("rank", item.get("cmcRank"))
+            entries.append(
+                {
+                    "symbol": str(item["symbol"]).lower(),
+                    "id": int(item["id"]),
+                    "rank": int(rank) if rank not in (None, "") else None,
+                }
+            )
+        # Coin có rank (market cap) cao nhất đứng trước
+        entries.sort(key=lambda entry: (entry["rank"] is None, entry["rank"] or 0))
+        return entries
+
+    def _fetch(self, kind: str) -> Entries:
+        """Lấy danh sách coin từ nguồn (file cục bộ hoặc API) trong 1 lần gọi."""
+        if self.mapping_file:
+            with open(self.mapping_file, "r", encoding="utf-8") as f:
+                entries = self._parse_entries(json.load(f))
+            return entries[: self.top_n] if kind == "top" else entries
+
+        url = self.listing_url if kind == "top" else self.map_url
+        if not url:
+            return []
+        response = ApiClient().get(url.format(limit=self.top_n))
+        response.raise_for_status()
+        return self._parse_entries(response.json())
+
+    def _load(self, kind: str, force: bool = False) -> Entries:
+        """RAM → đĩa → MongoDB → nguồn; nguồn lỗi thì dùng bản cache cũ nhất có được."""
+        with self._lock:
+            fetched_at, entries = self._memory.get(kind, (None, None))
+            if not force and self._fresh(fetched_at):
+                return entries
+
+            stale = entries
+            if not force:
+                for reader in (self._read_disk, self._read_mongo):
+                    fetched_at, entries = reader(kind)
+                    if entries and self._fresh(fetched_at):
+                        self._memory[kind] = (fetched_at, entries)
+                        return entries
+                    stale = stale or entries
+
+            try:
+                entries = self._fetch(kind)
+            except Exception as e:
+                self.logger.error(f"Không lấy được danh sách coin ({kind}): {str(e)}")
+                entries = []
+            if not entries:
+                if stale:
+                    self.logger.warning(f"Dùng danh sách coin ({kind}) đã cache cũ")
+                return stale or []
+
+            fetched_at = datetime.utcnow()
+            self._memory[kind] = (fetched_at, entries)
+            self._write_disk(kind, fetched_at, entries)
+            self._write_mongo(kind, fetched_at, entries)
+            self.logger.info(
+                f"Đã cập nhật danh sách coin ({kind}): {len(entries)} coin"
+            )
+            return entries
+
+    def refresh(self):
+        """Bỏ qua cache, lấy lại mapping (và top N nếu dùng) từ nguồn."""
+        self._load("map", force=True)
+        if self.mode == "top":
+            self._load("top", force=True)
+
+    def symbols(self) -> List[str]:
+        """Các symbol cần theo dõi theo universe.mode."""
+        configured = [s.lower() for s in EXTRACT_DATA_CONFIG.get("symbols", [])]
+        if self.mode != "top":
+            return configured
+        top = [entry["symbol"] for entry in self._load("top")[: self.top_n]]
+        if not top:
+            self.logger.warning(
+                "Không có danh sách top coin, dùng symbols trong config"
+            )
+        return list(dict.fromkeys(top + configured))
+
+    def resolve(self, symbols: Iterable[str]) -> Dict[str, int]:
+        """symbol → CMC ID cho nhiều symbol cùng lúc (không lookup từng symbol).
+
+        Symbol không tra được bị bỏ khỏi kết quả và được log 1 lần.
+        """
+        symbols = [symbol.lower() for symbol in symbols]
+        pinned = {
+            symbol.lower(): int(cmc_id)
+            for symbol, cmc_id in EXTRACT_DATA_CONFIG.get("cmc_symbol_ids", {}).items()
+        }
+        result = {symbol: pinned[symbol] for symbol in symbols if symbol in pinned}
+        if len(result) == len(symbols):
+            return result
+
+        mapping: Dict[str, int] = {}
+        kinds = ["top", "map"] if self.mode == "top" else ["map"]
+        for kind in kinds:
+            for entry in self._load(kind):
+                mapping.setdefault(entry["symbol"], entry["id"])
+
+        for symbol in symbols:
+            if symbol not in result and symbol in mapping:
+                result[symbol] = mapping[symbol]
+
+        missing = [
+            s for s in symbols if s not in result and s not in self._missing_logged
+        ]
+        if missing:
+            self._missing_logged.update(missing)
+            self.logger.error(
+                f"Không tìm thấy CMC ID cho {len(missing)} symbol: {missing}"
+            )
+        return result
+
+
+__all__ = ["SymbolRegistry"]
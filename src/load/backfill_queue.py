@@ -0,0 +1,362 @@
+"""
+Backfill Queue - Hàng đợi window backfill trong MongoDB cho nhiều worker process.
+
+Mỗi (symbol, interval) có 1 job:
+    {_id: "ETH:15m", symbol, interval, time_end, batch_seconds, next_index,
+     stop_index, done_index, completed}
+Mỗi window là 1 work item:
+    {_id: "ETH:15m:12", symbol, interval, index, start, end, status, owner,
+     lease_until, attempts, records, error}
+- Window được đánh số 0, 1, 2, ... từ mới đến cũ như Extract.iter_backfill
+- Chỉ giữ windows_ahead window chưa xong cho mỗi job; mỗi window có dữ liệu
+  hoàn thành thì job mở thêm 1 window cũ hơn (không tạo trước cả lịch sử)
+- Window rỗng = thời điểm niêm yết: các window cũ hơn bị bỏ (skipped);
+  riêng window 0 (đoạn lẻ từ mốc lưới batch_seconds tới time_end) thì không
+- Worker lease window bằng find_one_and_update (nguyên tử), gia hạn lease bằng
+  heartbeat; worker chết thì lease hết hạn và window được worker khác lấy lại
+- done_index = số window liên tục từ window 0 đã ghi xong; oldest_loaded của
+  BackfillCheckpoint lùi theo đó như HistoricalPipeline, nên dừng giữa chừng
+  (hoặc chuyển sang chạy historical) không fetch lại các window đã ghi
+"""
+
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from pymongo import ReturnDocument
+
+from configs.logger_config import LoggerConfig
+from configs.mongo_config import MongoConfig
+from configs.variable_config import EXTRACT_DATA_CONFIG
+from load.checkpoint import BackfillCheckpoint
+from util.interval_util import IntervalUtil
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+EMPTY = "empty"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+
+class BackfillQueue:
+    def __init__(self, interval: Optional[str] = None):
+        self.logger = LoggerConfig.logger_config("Backfill Queue")
+        self.config = EXTRACT_DATA_CONFIG.get("backfill_queue", {})
+        self.interval = interval or IntervalUtil.base_interval()
+        self.batch_seconds = IntervalUtil.batch_seconds(self.interval)
+        self.lease_seconds = float(self.config.get("lease_seconds", 120))
+        self.windows_ahead = max(1, int(self.config.get("windows_ahead", 16)))
+        self.max_attempts = max(1, int(self.config.get("max_attempts", 3)))
+        self.earliest_time = datetime.strptime(
+            EXTRACT_DATA_CONFIG.get("api", {}).get("backfill_earliest", "2013-04-01"),
+            "%Y-%m-%d",
+        )
+        self.database = EXTRACT_DATA_CONFIG.get("database", "cmc_db")
+        self.work_collection_name = self.config.get("collection", "cmc_backfill_work")
+        self.job_collection_name = self.config.get(
+            "job_collection", "cmc_backfill_jobs"
+        )
+        self.mongo_config = MongoConfig()
+        self.checkpoint = BackfillCheckpoint(self.interval)
+
+    @staticmethod
+    def default_owner() -> str:
+        """Tên worker mặc định: host:pid."""
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def _db(self):
+        return self.mongo_config.get_client().get_database(self.database)
+
+    @property
+    def work(self):
+        return self._db().get_collection(self.work_collection_name)
+
+    @property
+    def jobs(self):
+        return self._db().get_collection(self.job_collection_name)
+
+    def _job_id(self, symbol: str) -> str:
+        return f"{symbol.upper()}:{self.interval}"
+
+    def _window(self, job: Dict, index: int):
+        return IntervalUtil.backfill_window(
+            job["time_end"], job["batch_seconds"], index
+        )
+
+    def _add_window(self, job: Dict, index: int) -> bool:
+        """Tạo work item cho window index (idempotent). False nếu đã quá earliest."""
+        start, end = self._window(job, index)
+        if end <= self.earliest_time:
+            return False
+        self.work.update_one(
+            {"_id": f"{job['_id']}:{index}"},
+            {
+                "$setOnInsert": {
+                    "symbol": job["symbol"],
+                    "interval": self.interval,
+                    "index": index,
+                    "start": start,
+                    "end": end,
+                    "status": PENDING,
+                    "attempts": 0,
+                }
+            },
+            upsert=True,
+        )
+        return True
+
+    def plan(self, symbols: Optional[Iterable[str]] = None) -> int:
+        """Tạo job + các window đầu tiên cho symbol chưa backfill xong.
+
+        Gọi lặp lại (từ nhiều worker) an toàn: job / window đã có không bị ghi đè.
+
+        Returns:
+            Số job đang hoạt động
+        """
+        symbols = symbols or IntervalUtil.fetch_plan().get(self.interval, [])
+        active = 0
+        for symbol in symbols:
+            job = self.jobs.find_one({"_id": self._job_id(symbol)})
+            if job is None:
+                skip, time_end = self.checkpoint.resume_point(symbol)
+                if skip:
+                    continue
+                self.checkpoint.start(symbol, time_end)
+                job = self.jobs.find_one_and_update(
+                    {"_id": self._job_id(symbol)},
+                    {
+                        "$setOnInsert": {
+                            "symbol": symbol.upper(),
+                            "interval": self.interval,
+                            "time_end": time_end,
+                            "batch_seconds": self.batch_seconds,
+                            "next_index": self.windows_ahead,
+                            "stop_index": None,
+                            "done_index": 0,
+                            "completed": False,
+                            "created_at": datetime.utcnow(),
+                        }
+                    },
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER,
+                )
+                for index in range(self.windows_ahead):
+                    if not self._add_window(job, index):
+                        self._stop(job, index)
+                        break
+            if not job.get("completed"):
+                active += 1
+        self.logger.info(f"Backfill queue {self.interval}: {active} job đang chạy")
+        return active
+
+    def lease(self, owner: str) -> Optional[Dict]:
+        """Lấy nguyên tử 1 window chờ xử lý (hoặc có lease đã hết hạn).
+
+        Window mới nhất (index nhỏ) được ưu tiên cho mọi symbol.
+        """
+        now = datetime.utcnow()
+        # Lease hết hạn mà đã thử đủ số lần (worker chết liên tục) → failed
+        self.work.update_many(
+            {
+                "interval": self.interval,
+                "status": LEASED,
+                "lease_until": {"$lt": now},
+                "attempts": {"$gte": self.max_attempts},
+            },
+            {"$set": {"status": FAILED, "error": "lease hết hạn"}},
+        )
+        return self.work.find_one_and_update(
+            {
+                "interval": self.interval,
+                "attempts": {"$lt": self.max_attempts},
+                "$or": [
+                    {"status": PENDING},
+                    {"status": LEASED, "lease_until": {"$lt": now}},
+                ],
+            },
+            {
+                "$set": {
+                    "status": LEASED,
+                    "owner": owner,
+                    "lease_until": now + timedelta(seconds=self.lease_seconds),
+                    "leased_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("index", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def has_work(self) -> bool:
+        """Còn window đang chờ hoặc đang được worker khác xử lý."""
+        return bool(
+            self.work.count_documents(
+                {"interval": self.interval, "status": {"$in": [PENDING, LEASED]}},
+                limit=1,
+            )
+        )
+
+    def heartbeat(self, owner: str) -> int:
+        """Gia hạn lease mọi window worker đang giữ."""
+        result = self.work.update_many(
+            {"owner": owner, "status": LEASED},
+            {
+                "$set": {
+                    "lease_until": datetime.utcnow()
+                    + timedelta(seconds=self.lease_seconds)
+                }
+            },
+        )
+        return result.modified_count
+
+    def complete(self, item: Dict, records: int):
+        """Ghi nhận window đã ghi xong; window rỗng đánh dấu điểm niêm yết."""
+        status = DONE if records else EMPTY
+        self.work.update_one(
+            {"_id": item["_id"]},
+            {
+                "$set": {
+                    "status": status,
+                    "records": records,
+                    "finished_at": datetime.utcnow(),
+                },
+                "$unset": {"lease_until": "", "error": ""},
+            },
+        )
+        job = self.jobs.find_one({"_id": self._job_id(item["symbol"])})
+        if job is None:
+            return
+        # Window 0 có thể rất ngắn (tới mốc lưới): rỗng không phải điểm niêm yết
+        if records or item["index"] == 0:
+            self._extend(job)
+        else:
+            self._stop(job, item["index"])
+        self._advance_checkpoint(job)
+        self._maybe_complete(item["symbol"])
+
+    def fail(self, item: Dict, error: str):
+        """Trả window về hàng đợi, hoặc đánh dấu failed khi đã thử đủ max_attempts."""
+        status = FAILED if item.get("attempts", 0) >= self.max_attempts else PENDING
+        self.work.update_one(
+            {"_id": item["_id"]},
+            {
+                "$set": {"status": status, "error": error[:500]},
+                "$unset": {"lease_until": "", "owner": ""},
+            },
+        )
+
+    def _extend(self, job: Dict):
+        """Mở thêm 1 window cũ hơn để giữ windows_ahead window cho job."""
+        job = self.jobs.find_one_and_update(
+            {"_id": job["_id"], "stop_index": None},
+            {"$inc": {"next_index": 1}},
+            return_document=ReturnDocument.BEFORE,
+        )
+        if job is not None and not self._add_window(job, job["next_index"]):
+            self._stop(job, job["next_index"])
+
+    def _advance_checkpoint(self, job: Dict):
+        """Đẩy done_index qua các window liên tục đã xong, lùi oldest_loaded theo đó.
+
+        Window hoàn thành không theo thứ tự (nhiều worker): chỉ lùi tới window lỗi /
+        đang chạy đầu tiên, giống BackfillCheckpoint.mark_done.
+        """
+        done_index = job.get("done_index", 0)
+        oldest = None
+        for doc in self.work.find(
+            {
+                "symbol": job["symbol"],
+                "interval": self.interval,
+                "index": {"$gte": done_index},
+            },
+            projection={"index": 1, "status": 1, "start": 1},
+        ).sort("index", 1):
+            if doc["index"] != done_index or doc["status"] not in (DONE, EMPTY):
+                break
+            done_index += 1
+            oldest = doc["start"]
+        if oldest is None:
+            return
+        # Worker khác có thể đã đẩy xa hơn: chỉ tăng done_index
+        result = self.jobs.update_one(
+            {"_id": job["_id"], "done_index": {"$not": {"$gte": done_index}}},
+            {"$set": {"done_index": done_index}},
+        )
+        if result.modified_count:
+            self.checkpoint.advance(job["symbol"], oldest)
+
+    def _stop(self, job: Dict, index: int):
+        """Ghi nhận điểm dừng (niêm yết / earliest) và bỏ các window cũ hơn."""
+        self.jobs.update_one(
+            {
+                "_id": job["_id"],
+                "$or": [{"stop_index": None}, {"stop_index": {"$gt": index}}],
+            },
+            {"$set": {"stop_index": index}},
+        )
+        self.work.update_many(
+            {
+                "symbol": job["symbol"],
+                "interval": self.interval,
+                "index": {"$gt": index},
+                "status": {"$in": [PENDING, LEASED, FAILED]},
+            },
+            {"$set": {"status": SKIPPED}, "$unset": {"lease_until": ""}},
+        )
+
+    def _maybe_complete(self, symbol: str):
+        """Job xong khi đã biết điểm dừng và mọi window trước đó đã ghi xong."""
+        job = self.jobs.find_one({"_id": self._job_id(symbol)})
+        if job is None or job.get("completed") or job.get("stop_index") is None:
+            return
+        remaining = self.work.count_documents(
+            {
+                "symbol": symbol.upper(),
+                "interval": self.interval,
+                "index": {"$lt": job["stop_index"]},
+                "status": {"$nin": [DONE, EMPTY]},
+            }
+        )
+        if remaining:
+            return
+        result = self.jobs.update_one(
+            {"_id": job["_id"], "completed": False},
+            {"$set": {"completed": True, "completed_at": datetime.utcnow()}},
+        )
+        if result.modified_count:
+            self.checkpoint.mark_completed(symbol)
+
+    def retry_failed(self) -> int:
+        """Đưa các window failed về pending với số lần thử về 0."""
+        result = self.work.update_many(
+            {"interval": self.interval, "status": FAILED},
+            {"$set": {"status": PENDING, "attempts": 0}, "$unset": {"error": ""}},
+        )
+        return result.modified_count
+
+    def status(self) -> Dict[str, int]:
+        """Số window theo trạng thái (của interval này)."""
+        rows = self.work.aggregate(
+            [
+                {"$match": {"interval": self.interval}},
+                {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+            ]
+        )
+        counts = {row["_id"]: row["count"] for row in rows}
+        counts["jobs_active"] = self.jobs.count_documents(
+            {"interval": self.interval, "completed": False}
+        )
+        return counts
+
+    def failed(self, limit: int = 20) -> List[Dict]:
+        return list(
+            self.work.find(
+                {"interval": self.interval, "status": FAILED},
+                projection={"_id": 1, "start": 1, "end": 1, "error": 1},
+            ).limit(limit)
+        )
+
+
+__all__ = ["BackfillQueue"]
@@ -0,0 +1,81 @@
+"""
+Bulk Upsert - Ghi nến vào MongoDB bằng bulk_write không thứ tự, khóa (symbol, datetime).
+
+Mỗi batch là 1 round trip; kết quả được tổng hợp thành số bản ghi
+inserted / updated / unchanged thay vì đoán trùng lặp qua nội dung exception.
+"""
+
+from typing import Dict, Iterable, List
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+
+class BulkUpsert:
+    """Sử dụng: BulkUpsert.write(collection, records, batch_size=1000)"""
+
+    # Khóa định danh một cây nến
+    KEY_FIELDS = ("symbol", "datetime")
+
+    @staticmethod
+    def empty_stats() -> Dict[str, int]:
+        return {"inserted": 0, "updated": 0, "unchanged": 0, "errors": 0, "batches": 0}
+
+    @staticmethod
+    def merge_stats(total: Dict[str, int], stats: Dict[str, int]) -> Dict[str, int]:
+        for key, value in stats.items():
+            total[key] = total.get(key, 0) + value
+        return total
+
+    @classmethod
+    def build_operations(cls, records: Iterable[Dict]) -> List[UpdateOne]:
+        """Tạo danh sách UpdateOne upsert theo (symbol, datetime)."""
+        operations = []
+        for record in records:
+            record = {k: v for k, v in record.items() if k != "_id"}
+            key = {field: record.get(field) for field in cls.KEY_FIELDS}
+            operations.append(UpdateOne(key, {"$set": record}, upsert=True))
+        return operations
+
+    @classmethod
+    def write(
+        cls, collection, records: List[Dict], batch_size: int = 1000
+    ) -> Dict[str, int]:
+        """Upsert records theo batch (ordered=False).
+
+        Lỗi từng bản ghi (writeErrors) được đếm vào "errors", các bản ghi khác
+        trong batch vẫn được ghi. Lỗi kết nối được raise cho caller xử lý reconnect.
+
+        Returns:
+            Dict {inserted, updated, unchanged, errors, batches}
+        """
+        stats = cls.empty_stats()
+        batch_size = max(1, int(batch_size or 1000))
+
+        for i in range(0, len(records), batch_size):
+            operations = cls.build_operations(records[i : i + batch_size])
+            if not operations:
+                continue
+            try:
+                result = collection.bulk_write(operations, ordered=False)
+                details = {
+                    "nUpserted": result.upserted_count,
+                    "nModified": result.modified_count,
+                    "nMatched": result.matched_count,
+                    "writeErrors": [],
+                }
+            except BulkWriteError as e:
+                details = e.details
+
+            matched = details.get("nMatched", 0)
+            modified = details.get("nModified", 0)
+            stats["inserted"] += details.get("nUpserted", 0)
+            stats["updated"] += modified
+            stats["unchanged"] += max(0, matched - modified)
+            stats["errors"] += len(details.get("writeErrors", []))
+            stats["batches"] += 1
+
+        return stats
+
+
+__all__ = ["BulkUpsert"]
@@ -0,0 +1,177 @@
+"""
+Backfill Checkpoint - Lưu tiến độ backfill lịch sử theo từng symbol.
+
+Mỗi symbol có 1 document:
+    {symbol, oldest_loaded, started_from, completed, updated_at}
+- oldest_loaded: mọi window từ started_from lùi về mốc này đã được ghi vào DB
+- completed: đã lùi tới thời điểm niêm yết, không cần backfill nữa
+Khi restart sau crash, Extract tiếp tục lùi từ oldest_loaded thay vì từ hiện tại.
+"""
+
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from configs.logger_config import LoggerConfig
+from configs.mongo_config import MongoConfig
+from configs.variable_config import EXTRACT_DATA_CONFIG
+from load.storage_backend import StorageBackend
+from util.interval_util import IntervalUtil
+
+
+class BackfillCheckpoint:
+    def __init__(self, interval: Optional[str] = None):
+        self.logger = LoggerConfig.logger_config("Backfill Checkpoint")
+        self.mongo_config = MongoConfig()
+        self.database = EXTRACT_DATA_CONFIG.get("database", "cmc_db")
+        # Mỗi interval một collection checkpoint (interval gốc giữ tên cũ)
+        self.interval = interval or IntervalUtil.base_interval()
+        self.collection_name = IntervalUtil.collection_name(
+            EXTRACT_DATA_CONFIG.get(
+                "checkpoint_collection", "cmc_backfill_checkpoints"
+            ),
+            self.interval,
+        )
+        self.storage = StorageBackend.create(interval=self.interval)
+        # SYMBOL -> có dữ liệu hay không, lấy từ inventory lúc khởi động (nếu có)
+        self._known_data: Dict[str, bool] = {}
+
+        # Tiến độ trong process: symbol -> {"frontier": datetime, "done": {end: start}}
+        self._lock = threading.Lock()
+        self._progress: Dict[str, Dict] = {}
+
+    def _db(self):
+        return self.mongo_config.get_client().get_database(self.database)
+
+    @property
+    def collection(self):
+        return self._db().get_collection(self.collection_name)
+
+    def get(self, symbol: str) -> Optional[Dict]:
+        return self.collection.find_one({"symbol": symbol.upper()})
+
+    def seed_inventory(self, inventory: Dict[str, Dict], symbols: Iterable[str]):
+        """Dùng inventory đã có để resume_point không phải hỏi lại DB từng symbol."""
+        self._known_data = {
+            symbol.upper(): symbol.upper() in inventory for symbol in symbols
+        }
+
+    def resume_point(self, symbol: str) -> Tuple[bool, datetime]:
+        """Xác định điểm bắt đầu backfill cho symbol.
+
+        Returns:
+            (skip, time_end)
+            - skip: True nếu symbol đã backfill xong
+            - time_end: mốc bắt đầu lùi về quá khứ
+        """
+        now = datetime.now()
+        try:
+            checkpoint = self.get(symbol)
+        except Exception as e:
+            self.logger.error(f"Không đọc được checkpoint {symbol.upper()}: {str(e)}")
+            return False, now
+
+        if not checkpoint:
+            return False, now
+
+        # Checkpoint cũ nhưng collection nến đã bị xóa → backfill lại từ đầu
+        has_data = self._known_data.pop(symbol.upper(), None)
+        if has_data is None:
+            has_data = self.storage.has_data(self._db(), symbol)
+        if not has_data:
+            self.logger.warning(
+                f"[{symbol.upper()}] Có checkpoint nhưng không có dữ liệu, bỏ checkpoint"
+            )
+            self.collection.delete_one({"symbol": symbol.upper()})
+            return False, now
+
+        if checkpoint.get("completed"):
+            self.logger.info(f"[{symbol.upper()}] Đã backfill xong theo checkpoint")
+            return True, now
+
+        oldest = checkpoint.get("oldest_loaded") or now
+        self.logger.info(
+            f"[{symbol.upper()}] Tiếp tục backfill từ checkpoint: {oldest}"
+        )
+        return False, oldest
+
+    def start(self, symbol: str, time_end: datetime):
+        """Bắt đầu theo dõi tiến độ một symbol từ mốc time_end."""
+        with self._lock:
+            self._progress[symbol.upper()] = {"frontier": time_end, "done": {}}
+        self.collection.update_one(
+            {"symbol": symbol.upper()},
+            {
+                "$setOnInsert": {
+                    "symbol": symbol.upper(),
+                    "started_from": time_end,
+                    "oldest_loaded": time_end,
+                    "completed": False,
+                },
+                "$set": {"updated_at": datetime.utcnow()},
+            },
+            upsert=True,
+        )
+
+    def mark_done(self, symbol: str, windows: Iterable[Tuple[datetime, datetime]]):
+        """Đánh dấu các window đã ghi xong; đẩy oldest_loaded lùi theo phần liên tục.
+
+        Window có thể hoàn thành không theo thứ tự; checkpoint chỉ lùi qua một
+        window khi mọi window mới hơn nó đã xong.
+        """
+        key = symbol.upper()
+        with self._lock:
+            progress = self._progress.get(key)
+            if progress is None:
+                return
+            for start, end in windows:
+                progress["done"][end] = start
+            frontier = progress["frontier"]
+            advanced = False
+            while frontier in progress["done"]:
+                frontier = progress["done"].pop(frontier)
+                advanced = True
+            progress["frontier"] = frontier
+
+        if advanced:
+            self.collection.update_one(
+                {"symbol": key},
+                {"$set": {"oldest_loaded": frontier, "updated_at": datetime.utcnow()}},
+            )
+
+    def advance(self, symbol: str, oldest_loaded: datetime):
+        """Lùi oldest_loaded tới mốc này (không bao giờ tiến lại về hiện tại).
+
+        Dùng khi tiến độ được tính ở nơi khác (BackfillQueue, nhiều process).
+        """
+        self.collection.update_one(
+            {
+                "symbol": symbol.upper(),
+                "$or": [
+                    {"oldest_loaded": None},
+                    {"oldest_loaded": {"$gt": oldest_loaded}},
+                ],
+            },
+            {
+                "$set": {
+                    "oldest_loaded": oldest_loaded,
+                    "updated_at": datetime.utcnow(),
+                }
+            },
+        )
+
+    def is_caught_up(self, symbol: str) -> bool:
+        """True nếu không còn window nào đã xong nhưng chưa nối vào checkpoint."""
+        with self._lock:
+            progress = self._progress.get(symbol.upper())
+            return progress is not None and not progress["done"]
+
+    def mark_completed(self, symbol: str):
+        self.collection.update_one(
+            {"symbol": symbol.upper()},
+            {"$set": {"completed": True, "updated_at": datetime.utcnow()}},
+        )
+        self.logger.info(f"[{symbol.upper()}] Đã đánh dấu backfill hoàn thành")
+
+
+__all__ = ["BackfillCheckpoint"]
@@ -0,0 +1,190 @@
+"""
+Datetime Migration - Chuyển các cột thời gian của nến đã lưu sang datetime_mode mới.
+
+- Chạy theo batch (bulk_write không thứ tự), duyệt theo _id tăng dần
+- Resumable: _id cuối cùng đã xử lý được lưu vào collection migrations,
+  chạy lại sẽ tiếp tục từ đó
+- Nếu document sau khi chuyển trùng khóa (symbol, datetime) với document đã ở
+  dạng mới (ví dụ realtime đã ghi lại), document cũ bị xóa
+- Mỗi interval là 1 collection riêng (cmc, cmc_1h, ...): migrate từng interval,
+  mỗi collection có trạng thái resume riêng
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pymongo import ASCENDING, DeleteOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from configs.logger_config import LoggerConfig
+from configs.mongo_config import MongoConfig
+from configs.variable_config import EXTRACT_DATA_CONFIG
+from util.datetime_codec import DatetimeCodec
+from util.interval_util import IntervalUtil
+
+# BSON type của từng datetime_mode
+_MODE_TYPES = {
+    "string": ["string"],
+    "datetime": ["date"],
+    "epoch": ["int", "long"],
+}
+
+
+class DatetimeMigration:
+    def __init__(
+        self,
+        target_mode: Optional[str] = None,
+        batch_size: int = 5000,
+        interval: Optional[str] = None,
+    ):
+        self.logger = LoggerConfig.logger_config("Datetime Migration")
+        self.codec = DatetimeCodec(target_mode)
+        self.batch_size = batch_size
+        self.layout = EXTRACT_DATA_CONFIG.get("storage", {}).get("layout", "document")
+        self.mongo_config = MongoConfig()
+        self.database = EXTRACT_DATA_CONFIG.get("database", "cmc_db")
+        self.interval = interval or IntervalUtil.base_interval()
+        self.collection_name = IntervalUtil.collection_name(
+            EXTRACT_DATA_CONFIG.get("historical_collection", "cmc"), self.interval
+        )
+        self.state_collection_name = EXTRACT_DATA_CONFIG.get(
+            "migration_collection", "cmc_migrations"
+        )
+
+    def _state_id(self) -> str:
+        return f"datetime_mode:{self.collection_name}:{self.codec.mode}"
+
+    def _pending_filter(self) -> Dict:
+        """Document còn ít nhất một cột thời gian chưa ở dạng đích."""
+        other_types = [
+            bson_type
+            for mode, types in _MODE_TYPES.items()
+            if mode != self.codec.mode
+            for bson_type in types
+        ]
+        return {
+            "$or": [
+                {column: {"$type": bson_type}}
+                for column in DatetimeCodec.TIME_COLUMNS
+                for bson_type in other_types
+            ]
+        }
+
+    def run(self, reset: bool = False) -> Dict[str, int]:
+        """Chạy migration tới khi không còn document cần chuyển.
+
+        Args:
+            reset: True để bỏ qua vị trí đã lưu và duyệt lại từ đầu
+
+        Returns:
+            Dict {converted, removed_duplicates, batches}
+        """
+        stats = {"converted": 0, "removed_duplicates": 0, "batches": 0}
+        if self.layout != "document":
+            # timeseries luôn lưu BSON Date; bucket ghi lại cả bucket theo mode hiện tại
+            self.logger.error(
+                f"migrate-datetime chỉ hỗ trợ storage.layout='document' (đang là {self.layout})"
+            )
+            return stats
+
+        db = self.mongo_config.get_client().get_database(self.database)
+        collection = db.get_collection(self.collection_name)
+        state = db.get_collection(self.state_collection_name)
+
+        state_doc = None if reset else state.find_one({"_id": self._state_id()})
+        last_id = state_doc.get("last_id") if state_doc else None
+
+        self.logger.info(
+            f"Bắt đầu migrate {self.collection_name} sang datetime_mode="
+            f"{self.codec.mode}" + (f" (tiếp tục sau _id {last_id})" if last_id else "")
+        )
+
+        while True:
+            query = self._pending_filter()
+            if last_id is not None:
+                query = {"$and": [query, {"_id": {"$gt": last_id}}]}
+            projection = {column: 1 for column in DatetimeCodec.TIME_COLUMNS}
+            batch = list(
+                collection.find(query, projection=projection)
+                .sort("_id", ASCENDING)
+                .limit(self.batch_size)
+            )
+            if not batch:
+                break
+
+            operations = []
+            for doc in batch:
+                update = {
+                    column: self.codec.encode(DatetimeCodec.decode(doc[column]))
+                    for column in DatetimeCodec.TIME_COLUMNS
+                    if column in doc
+                }
+                operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": update}))
+
+            converted, duplicates = self._apply(collection, operations, batch)
+            stats["converted"] += converted
+            stats["removed_duplicates"] += duplicates
+            stats["batches"] += 1
+
+            last_id = batch[-1]["_id"]
+            state.update_one(
+                {"_id": self._state_id()},
+                {"$set": {"last_id": last_id, "updated_at": datetime.utcnow()}},
+                upsert=True,
+            )
+            self.logger.info(
+                f"Batch {stats['batches']}: đã chuyển {stats['converted']} document, "
+                f"xóa {stats['removed_duplicates']} bản trùng"
+            )
+
+        state.update_one(
+            {"_id": self._state_id()},
+            {"$set": {"completed_at": datetime.utcnow()}},
+            upsert=True,
+        )
+        self.logger.info(
+            f"Hoàn thành migrate: {stats['converted']} document, "
+            f"{stats['removed_duplicates']} bản trùng đã xóa"
+        )
+        return stats
+
+    @classmethod
+    def run_all(
+        cls,
+        target_mode: Optional[str] = None,
+        intervals: Optional[List[str]] = None,
+        reset: bool = False,
+    ) -> Dict[str, Dict[str, int]]:
+        """run cho collection của mọi interval (mặc định IntervalUtil.all_intervals).
+
+        Returns:
+            Dict interval -> {converted, removed_duplicates, batches}
+        """
+        return {
+            interval: cls(target_mode, interval=interval).run(reset=reset)
+            for interval in intervals or IntervalUtil.all_intervals()
+        }
+
+    def _apply(self, collection, operations, batch):
+        """Ghi batch; document bị trùng khóa unique sau khi chuyển sẽ bị xóa."""
+        try:
+            result = collection.bulk_write(operations, ordered=False)
+            return result.modified_count, 0
+        except BulkWriteError as e:
+            details = e.details
+            duplicate_ids = [
+                batch[error["index"]]["_id"]
+                for error in details.get("writeErrors", [])
+                if error.get("code") == 11000
+            ]
+            other_errors = len(details.get("writeErrors", [])) - len(duplicate_ids)
+            if other_errors:
+                self.logger.error(f"{other_errors} document không chuyển được")
+            if duplicate_ids:
+                collection.bulk_write(
+                    [DeleteOne({"_id": _id}) for _id in duplicate_ids], ordered=False
+                )
+            return details.get("nModified", 0), len(duplicate_ids)
+
+
+__all__ = ["DatetimeMigration"]
@@ -0,0 +1,145 @@
+"""
+Gap Scanner - Tìm các slot nến bị thiếu ở giữa chuỗi đã lưu.
+
+- Layout document/timeseries: 1 aggregation $setWindowFields ($shift) trên
+  server, chỉ trả về các cặp nến liền kề cách nhau hơn 1 interval
+- Fallback (MongoDB < 5.0, layout bucket): duyệt cursor chỉ lấy cột datetime,
+  bộ nhớ không phụ thuộc độ dài chuỗi - không nạp cả chuỗi vào pandas
+- plan_windows gộp các gap gần nhau thành ít window API nhất (≤ 399 bản ghi)
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from configs.logger_config import LoggerConfig
+from configs.mongo_config import MongoConfig
+from configs.variable_config import EXTRACT_DATA_CONFIG
+from load.storage_backend import StorageBackend
+from util.datetime_codec import DatetimeCodec
+from util.interval_util import IntervalUtil
+
+# (slot thiếu đầu tiên, slot thiếu cuối cùng, số slot thiếu)
+Gap = Tuple[datetime, datetime, int]
+
+
+class GapScanner:
+    def __init__(self, interval: Optional[str] = None):
+        self.logger = LoggerConfig.logger_config("Gap Scanner")
+        self.interval = interval or IntervalUtil.base_interval()
+        self.step = timedelta(seconds=IntervalUtil.to_seconds(self.interval))
+        # API giới hạn 399 bản ghi/request
+        self.max_records = IntervalUtil.max_records()
+        self.mongo_config = MongoConfig()
+        self.database = EXTRACT_DATA_CONFIG.get("database", "cmc_db")
+        self.storage = StorageBackend.create(interval=self.interval)
+
+    def _db(self):
+        return self.mongo_config.get_client().get_database(self.database)
+
+    def _time_expr(self):
+        """Biểu thức aggregation đưa cột datetime (theo datetime_mode) về BSON Date."""
+        if self.storage.codec.mode == "string":
+            return {
+                "$dateFromString": {
+                    "dateString": "$datetime",
+                    "format": "%Y-%m-%d %H:%M:%S",
+                }
+            }
+        if self.storage.codec.mode == "epoch":
+            return {"$toDate": {"$multiply": ["$datetime", 1000]}}
+        return "$datetime"
+
+    def gap_pipeline(
+        self, symbol: str, start: Optional[datetime], end: Optional[datetime]
+    ) -> List[Dict]:
+        match = {"symbol": symbol.upper()}
+        bounds = {}
+        if start is not None:
+            bounds["$gte"] = self.storage.codec.encode(start)
+        if end is not None:
+            bounds["$lte"] = self.storage.codec.encode(end)
+        if bounds:
+            match["datetime"] = bounds
+        step_ms = int(self.step.total_seconds() * 1000)
+        return [
+            {"$match": match},
+            {"$project": {"_id": 0, "datetime": 1, "t": self._time_expr()}},
+            {
+                "$setWindowFields": {
+                    "sortBy": {"datetime": 1},
+                    "output": {"prev": {"$shift": {"output": "$t", "by": -1}}},
+                }
+            },
+            {"$match": {"prev": {"$ne": None}}},
+            {"$project": {"prev": 1, "t": 1, "diff": {"$subtract": ["$t", "$prev"]}}},
+            # Lệch hơn 1.5 interval mới tính là thiếu nến (chịu được làm tròn phút)
+            {"$match": {"diff": {"$gte": step_ms * 1.5}}},
+        ]
+
+    def _gap_between(self, previous: datetime, current: datetime) -> Optional[Gap]:
+        missing = round((current - previous) / self.step) - 1
+        if missing < 1:
+            return None
+        return previous + self.step, current - self.step, missing
+
+    def scan(
+        self,
+        symbol: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> List[Gap]:
+        """Các khoảng thiếu nến nằm giữa nến cũ nhất và mới nhất trong [start, end]."""
+        db = self._db()
+        gaps: List[Gap] = []
+
+        if self.storage.layout != "bucket":
+            try:
+                collection = db.get_collection(self.storage.collection_name)
+                for row in collection.aggregate(
+                    self.gap_pipeline(symbol, start, end), allowDiskUse=True
+                ):
+                    gap = self._gap_between(
+                        DatetimeCodec.decode(row["prev"]),
+                        DatetimeCodec.decode(row["t"]),
+                    )
+                    if gap:
+                        gaps.append(gap)
+                return sorted(gaps)
+            except Exception as e:
+                self.logger.warning(
+                    f"[{symbol.upper()}] Không chạy được aggregation tìm gap "
+                    f"({str(e)}), chuyển sang duyệt cursor"
+                )
+                gaps = []
+
+        previous = None
+        for current in self.storage.iter_datetimes(db, symbol, start, end):
+            if previous is not None:
+                gap = self._gap_between(previous, current)
+                if gap:
+                    gaps.append(gap)
+            previous = current
+        return gaps
+
+    def plan_windows(self, gaps: List[Gap]) -> List[Tuple[datetime, datetime]]:
+        """Gộp gap thành các window (time_start, time_end) cho API.
+
+        Mỗi window chứa tối đa max_records - 1 slot (chừa 1 bản ghi ở biên),
+        gap dài bị chia nhỏ, gap gần nhau được gộp chung một request.
+        time_start = slot đầu - 1 interval (API trả nến có close trong (start, end]).
+        """
+        max_slots = max(1, self.max_records - 1)
+        windows: List[List[datetime]] = []
+        for first, last, _ in sorted(gaps):
+            slot = first
+            while slot <= last:
+                run_end = min(last, slot + (max_slots - 1) * self.step)
+                if windows and (run_end - windows[-1][0]) / self.step + 1 <= max_slots:
+                    windows[-1][1] = run_end
+                else:
+                    windows.append([slot, run_end])
+                slot = run_end + self.step
+        return [(first - self.step, last) for first, last in windows]
+
+
+__all__ = ["GapScanner", "Gap"]
@@ -0,0 +1,170 @@
+"""
+Index Manager - Tạo index một lần khi khởi động thay vì create_index trên mỗi chunk.
+
+- Đọc index hiện có (index_information) và chỉ tạo index còn thiếu
+- Báo cáo kích thước từng index (collStats)
+- Đường load nóng (HistoricalLoad / RealtimeLoad) không còn gửi lệnh DDL
+"""
+
+from typing import Dict, List, Tuple
+
+from configs.logger_config import LoggerConfig
+from configs.mongo_config import MongoConfig
+from configs.variable_config import EXTRACT_DATA_CONFIG
+from load.storage_backend import StorageBackend
+from util.interval_util import IntervalUtil
+
+
+class IndexManager:
+    def __init__(self):
+        self.logger = LoggerConfig.logger_config("Index Manager")
+        self.mongo_config = MongoConfig()
+        self.database = EXTRACT_DATA_CONFIG.get("database", "cmc_db")
+        # Collection nến và index của nó phụ thuộc storage.layout; mỗi interval
+        # có collection riêng
+        self.storages = [
+            StorageBackend.create(interval=interval)
+            for interval in IntervalUtil.all_intervals()
+        ]
+        self.storage = self.storages[0]
+
+    def index_specs(self) -> Dict[str, List[Tuple[str, List[Tuple[str, int]], Dict]]]:
+        """Khai báo index cần có: collection -> [(tên, keys, options)]."""
+        checkpoints = EXTRACT_DATA_CONFIG.get(
+            "checkpoint_collection", "cmc_backfill_checkpoints"
+        )
+        specs = {}
+        for storage in self.storages:
+            specs.update(storage.index_specs())
+        # Checkpoint backfill chỉ có cho các interval gọi API
+        for interval in IntervalUtil.fetch_plan() or [IntervalUtil.base_interval()]:
+            specs[IntervalUtil.collection_name(checkpoints, interval)] = [
+                ("symbol_1", [("symbol", 1)], {"unique": True}),
+            ]
+        queue_config = EXTRACT_DATA_CONFIG.get("backfill_queue", {})
+        specs[queue_config.get("collection", "cmc_backfill_work")] = [
+            # lease: window chờ xử lý, ưu tiên index nhỏ
+            (
+                "interval_1_status_1_index_1",
+                [("interval", 1), ("status", 1), ("index", 1)],
+                {},
+            ),
+            (
+                "symbol_1_interval_1_index_1",
+                [("symbol", 1), ("interval", 1), ("index", 1)],
+                {},
+            ),
+            ("owner_1_status_1", [("owner", 1), ("status", 1)], {}),
+        ]
+        registry_config = EXTRACT_DATA_CONFIG.get("symbol_registry", {})
+        specs[registry_config.get("collection", "cmc_symbol_registry")] = [
+            # MongoDB chỉ xóa mapping đã quá hạn từ lâu: mapping vừa hết ttl_seconds
+            # vẫn phải còn để SymbolRegistry dùng tạm khi API lỗi
+            (
+                "fetched_at_ttl",
+                [("fetched_at", 1)],
+                {
+                    "expireAfterSeconds": int(
+                        registry_config.get(
+                            "mongo_expire_seconds",
+                            7 * int(registry_config.get("ttl_seconds", 86400)),
+                        )
+                    )
+                },
+            ),
+        ]
+        gaps = EXTRACT_DATA_CONFIG.get("gap_collection", "cmc_gap_repairs")
+        specs[gaps] = [
+            ("symbol_1_start_1", [("symbol", 1), ("start", 1)], {"unique": True}),
+        ]
+        return specs
+
+    def ensure_indexes(self) -> Dict[str, Dict[str, int]]:
+        """Tạo các index còn thiếu và trả về kích thước index theo collection.
+
+        Returns:
+            Dict collection -> {tên index: kích thước bytes}
+        """
+        db = self.mongo_config.get_client().get_database(self.database)
+        sizes = {}
+
+        for storage in self.storages:
+            try:
+                # Time-series collection / view của layout bucket phải có trước index
+                storage.ensure(db)
+            except Exception as e:
+                self.logger.error(
+                    f"Không khởi tạo được storage layout {storage.layout} "
+                    f"({storage.collection_name}): {str(e)}"
+                )
+
+        for collection_name, specs in self.index_specs().items():
+            collection = db.get_collection(collection_name)
+            existing = collection.index_information()
+            existing_keys = {
+                tuple((k, int(v)) for k, v in info.get("key", [])): name
+                for name, info in existing.items()
+            }
+
+            for name, keys, options in specs:
+                if tuple(keys) in existing_keys:
+                    self._update_ttl(
+                        db,
+                        collection_name,
+                        existing[existing_keys[tuple(keys)]],
+                        existing_keys[tuple(keys)],
+                        options,
+                    )
+                    continue
+                try:
+                    self.logger.info(f"Tạo index {collection_name}.{name} ...")
+                    collection.create_index(keys, name=name, **options)
+                except Exception as e:
+                    # Ví dụ: dữ liệu cũ có bản ghi trùng nên không tạo được unique index
+                    self.logger.error(
+                        f"Không tạo được index {collection_name}.{name}: {str(e)}"
+                    )
+
+            sizes[collection_name] = self.index_sizes(db, collection_name)
+
+        for collection_name, index_sizes in sizes.items():
+            for name, size in index_sizes.items():
+                self.logger.info(
+                    f"Index {collection_name}.{name}: {size / 1024 / 1024:.2f} MB"
+                )
+        return sizes
+
+    def _update_ttl(
+        self, db, collection_name: str, info: Dict, name: str, options: Dict
+    ):
+        """TTL index đã có nhưng expireAfterSeconds khác cấu hình: sửa tại chỗ (collMod)."""
+        expire = options.get("expireAfterSeconds")
+        if expire is None or info.get("expireAfterSeconds") == expire:
+            return
+        try:
+            self.logger.info(
+                f"Đổi expireAfterSeconds {collection_name}.{name}: "
+                f"{info.get('expireAfterSeconds')} → {expire}"
+            )
+            db.command(
+                "collMod",
+                collection_name,
+                index={"name": name, "expireAfterSeconds": expire},
+            )
+        except Exception as e:
+            self.logger.error(
+                f"Không đổi được TTL index {collection_name}.{name}: {str(e)}"
+            )
+
+    def index_sizes(self, db, collection_name: str) -> Dict[str, int]:
+        try:
+            stats = db.command("collStats", collection_name)
+            return dict(stats.get("indexSizes", {}))
+        except Exception as e:
+            self.logger.warning(
+                f"Không lấy được kích thước index của {collection_name}: {str(e)}"
+            )
+            return {}
+
+
+__all__ = ["IndexManager"]
@@ -5,23 +5,31 @@ import pandas as pd
 from configs.logger_config import LoggerConfig
 from configs.mongo_config import MongoConfig
 from configs.variable_config import EXTRACT_DATA_CONFIG
+from load.bulk_upsert import BulkUpsert
+from load.rollup_engine import RollupEngine
+from load.storage_backend import StorageBackend
+from util.interval_util import IntervalUtil
+from util.metrics import Metrics
 
 
 class HistoricalLoad:
-    def __init__(self) -> None:
+    def __init__(self, interval: Optional[str] = None) -> None:
         try:
             self.logger = LoggerConfig.logger_config("Load dữ liệu lịch sử CMC")
             self.batch_size_extract = EXTRACT_DATA_CONFIG.get(
                 "batch_size_extract", 1000
             )
+            # Layout lưu nến (document / timeseries / bucket) theo storage.layout
+            self.interval = interval or IntervalUtil.base_interval()
+            self.storage = StorageBackend.create(interval=self.interval)
+            # Nến interval lớn tính từ nến gốc (derived_intervals)
+            self.rollup = RollupEngine()
             self.mongo_config = MongoConfig()
             self.mongo_client = self.mongo_config.get_client()
             self.db = self.mongo_client.get_database(
                 EXTRACT_DATA_CONFIG.get("database", "cmc_db")
             )
-            self.collection = self.db.get_collection(
-                EXTRACT_DATA_CONFIG.get("historical_collection", "cmc")
-            )
+            self.collection = self.db.get_collection(self.storage.collection_name)
             self.logger.info("Kết nối MongoDB cho thao tác load thành công")
         except Exception as e:
             # nếu logger chưa khởi tạo được
@@ -58,26 +66,48 @@ class HistoricalLoad:
 
         self.logger.warning("Không có dữ liệu được cung cấp cho historical_load")
 
-    def _load_dataframe(self, df: pd.DataFrame, symbol: Optional[str] = None):
-        self.logger.info(f"Bắt đầu load DataFrame cho {symbol or 'unknown symbol'} ...")
+    @Metrics.timed("load", source="historical")
+    def _load_dataframe(
+        self, df: pd.DataFrame, symbol: Optional[str] = None
+    ) -> Dict[str, int]:
+        """Ghi DataFrame theo khóa (symbol, datetime) - chạy lại không tạo trùng.
+
+        Index unique được IndexManager tạo một lần lúc khởi động.
+
+        Returns:
+            Dict {inserted, updated, unchanged, errors, batches}
+        """
+        self.logger.debug(
+            f"Bắt đầu load DataFrame cho {symbol or 'unknown symbol'} ..."
+        )
         chunk_size = int(self.batch_size_extract or 1000)
-        batch_count = 0
+        stats = BulkUpsert.empty_stats()
         for chunk in self.chunk_data_frame(df, chunk_size=chunk_size):
             try:
-                chunk_data = chunk.to_dict("records")
-                # tạo index trên trường datetime nếu cần
-                try:
-                    self.collection.create_index(
-                        [("datetime", 1)], unique=False, background=True
-                    )
-                except Exception:
-                    pass
-                if chunk_data:
-                    self.collection.insert_many(chunk_data, ordered=False)
-                batch_count += 1
-                self.logger.info(
-                    f"Batch {batch_count} đã xử lý: {len(chunk_data)} bản ghi"
+                chunk_stats = self.storage.write(self.db, chunk, batch_size=chunk_size)
+                BulkUpsert.merge_stats(stats, chunk_stats)
+                self.logger.debug(
+                    f"Batch {stats['batches']} đã xử lý: {len(chunk)} bản ghi"
                 )
             except Exception as e:
+                stats["errors"] += len(chunk)
                 self.logger.error(f"Lỗi khi load dữ liệu lịch sử: {str(e)}")
-        self.logger.info(f"Tổng số batch đã xử lý: {batch_count}")
+        Metrics().record_load(stats, source="historical")
+        self._update_rollups(df, symbol, stats)
+        self.logger.debug(
+            f"Tổng số batch đã xử lý: {stats['batches']} - Inserted: {stats['inserted']}, "
+            f"Updated: {stats['updated']}, Unchanged: {stats['unchanged']}, "
+            f"Errors: {stats['errors']}"
+        )
+        return stats
+
+    def _update_rollups(self, df: pd.DataFrame, symbol: Optional[str], stats: Dict):
+        """Tính lại nến derived sau khi ghi nến interval gốc (lỗi không ảnh hưởng load)."""
+        if not symbol or self.interval != IntervalUtil.base_interval():
+            return
+        if stats.get("inserted", 0) + stats.get("updated", 0) == 0:
+            return
+        try:
+            self.rollup.update(self.db, symbol, df)
+        except Exception as e:
+            self.logger.error(f"Lỗi khi tính nến derived cho {symbol}: {str(e)}")
@@ -0,0 +1,225 @@
+"""
+Parquet Export - Xuất nến từ MongoDB ra file Parquet theo symbol / tháng cho phân tích.
+
+- Mỗi (symbol, tháng) là 1 file <output_dir>/<interval>/<SYMBOL>/<YYYY-MM>.parquet,
+  đọc cả symbol bằng pd.read_parquet("<output_dir>/<interval>/<SYMBOL>")
+- _manifest.json lưu watermark (nến mới nhất đã xuất) và số nến từng tháng đã xuất;
+  lần chạy sau chỉ xuất lại tháng mới, tháng có số nến thay đổi (realtime ghi thêm,
+  repair-gaps bù nến) hoặc tháng mất file. Sửa giá trị tại chỗ mà không đổi số nến
+  thì cần --full
+- Đọc cursor MongoDB theo batch_size nến, mỗi batch ghi thành 1 row group: RAM
+  không tăng theo độ dài lịch sử
+- Ghi file tạm rồi os.replace: người đọc không bao giờ thấy file ghi dở
+- Cần pyarrow (phụ thuộc tùy chọn, chỉ lệnh export dùng)
+Sử dụng: ParquetExport().export_all(db, symbols=["ETH"])
+"""
+
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from configs.logger_config import LoggerConfig
+from configs.variable_config import EXTRACT_DATA_CONFIG
+from load.storage_backend import StorageBackend
+from util.interval_util import IntervalUtil
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+
+class ParquetExport:
+    def __init__(
+        self, interval: Optional[str] = None, output_dir: Optional[str] = None
+    ):
+        if pq is None:
+            raise RuntimeError("export cần thư viện pyarrow (pip install pyarrow)")
+        self.logger = LoggerConfig.logger_config("Parquet Export")
+        self.config = EXTRACT_DATA_CONFIG.get("export", {})
+        self.interval = interval or IntervalUtil.base_interval()
+        self.storage = StorageBackend.create(interval=self.interval)
+        self.batch_size = max(1, int(self.config.get("batch_size", 5000)))
+        self.compression = self.config.get("compression", "zstd")
+
+        root_dir = os.path.dirname(
+            os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        )
+        self.output_dir = os.path.join(
+            root_dir,
+            output_dir or self.config.get("output_dir", "exports/parquet"),
+            self.interval,
+        )
+        self.manifest_file = os.path.join(self.output_dir, "_manifest.json")
+        self.manifest = self._load_manifest()
+
+    # ------------------------------------------------------------------ manifest
+    def _load_manifest(self) -> Dict[str, Dict]:
+        """SYMBOL -> {watermark, months: {YYYY-MM: {count, last, exported_at}}}"""
+        try:
+            with open(self.manifest_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            self.logger.warning(
+                f"Manifest hỏng, xuất lại toàn bộ: {self.manifest_file} ({str(e)})"
+            )
+            return {}
+
+    def _save_manifest(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        tmp_file = f"{self.manifest_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_file, self.manifest_file)
+
+    # ------------------------------------------------------------------ tháng
+    @staticmethod
+    def months(
+        first: datetime, last: datetime
+    ) -> Iterator[Tuple[str, datetime, datetime]]:
+        """Các tháng phủ [first, last]: (YYYY-MM, đầu tháng, giây cuối tháng)."""
+        month = datetime(first.year, first.month, 1)
+        while month <= last:
+            next_month = (month + timedelta(days=32)).replace(day=1)
+            yield month.strftime("%Y-%m"), month, next_month - timedelta(seconds=1)
+            month = next_month
+
+    def path(self, symbol: str, month: str) -> str:
+        return os.path.join(self.output_dir, symbol.upper(), f"{month}.parquet")
+
+    def _is_current(self, symbol: str, month: str, count: int) -> bool:
+        """Tháng đã xuất với đúng số nến hiện có và file vẫn còn."""
+        exported = self.manifest.get(symbol, {}).get("months", {}).get(month)
+        return (
+            exported is not None
+            and exported.get("count") == count
+            and os.path.exists(self.path(symbol, month))
+        )
+
+    # ------------------------------------------------------------------ ghi
+    @staticmethod
+    def _to_table(df: pd.DataFrame, schema: Optional["pa.Schema"]) -> "pa.Table":
+        if schema is None:
+            return pa.Table.from_pandas(df, preserve_index=False)
+        # Batch sau theo đúng schema của batch đầu (thiếu cột → null)
+        return pa.Table.from_pandas(
+            df.reindex(columns=schema.names), schema=schema, preserve_index=False
+        )
+
+    def _write_month(
+        self, db, symbol: str, start: datetime, end: datetime, month: str
+    ) -> Tuple[int, Optional[datetime]]:
+        """Ghi 1 tháng từ cursor theo batch. Returns: (số nến, nến cuối)."""
+        path = self.path(symbol, month)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        writer = None
+        rows = 0
+        last = None
+        try:
+            for df in self.storage.iter_range(db, symbol, start, end, self.batch_size):
+                table = self._to_table(df, writer.schema if writer else None)
+                if writer is None:
+                    writer = pq.ParquetWriter(
+                        tmp_path, table.schema, compression=self.compression
+                    )
+                writer.write_table(table)
+                rows += table.num_rows
+                last = df["datetime"].max()
+        except Exception:
+            if writer is not None:
+                writer.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        if writer is None:
+            return 0, None
+        writer.close()
+        os.replace(tmp_path, path)
+        return rows, pd.Timestamp(last).to_pydatetime()
+
+    def export(self, db, symbol: str, full: bool = False) -> Dict[str, int]:
+        """Xuất các tháng mới / thay đổi của 1 symbol.
+
+        Args:
+            full: Xuất lại mọi tháng, bỏ qua manifest
+
+        Returns:
+            Dict {months, rows, skipped}
+        """
+        key = symbol.upper()
+        stats = {"months": 0, "rows": 0, "skipped": 0}
+        info = self.storage.inventory(db, [symbol]).get(key)
+        if not info:
+            self.logger.info(f"[{key}] Chưa có dữ liệu {self.interval}, bỏ qua")
+            return stats
+
+        if full:
+            self.manifest[key] = {"watermark": None, "months": {}}
+        entry = self.manifest.setdefault(key, {"watermark": None, "months": {}})
+        exported = sum(m.get("count", 0) for m in entry["months"].values())
+        if (
+            not full
+            and entry["watermark"] == info["last"].isoformat()
+            and exported == info["count"]
+            and all(os.path.exists(self.path(key, m)) for m in entry["months"])
+        ):
+            # Không có nến mới sau watermark và không tháng nào được bù thêm
+            stats["skipped"] = len(entry["months"])
+            self.logger.info(f"[{key}] Export {self.interval}: không có thay đổi")
+            return stats
+
+        for month, start, end in self.months(info["first"], info["last"]):
+            # Đếm trên index: rẻ hơn nhiều so với đọc lại cả tháng
+            count = self.storage.count_range(db, symbol, start, end)
+            if count == 0 or (not full and self._is_current(key, month, count)):
+                stats["skipped"] += 1
+                continue
+
+            rows, last = self._write_month(db, symbol, start, end, month)
+            if not rows:
+                continue
+            entry["months"][month] = {
+                "count": rows,
+                "last": last.isoformat(),
+                "exported_at": datetime.utcnow().isoformat(timespec="seconds"),
+            }
+            if entry["watermark"] is None or last.isoformat() > entry["watermark"]:
+                entry["watermark"] = last.isoformat()
+            # Lưu sau mỗi tháng: bị dừng giữa chừng thì chạy lại tiếp từ đó
+            self._save_manifest()
+            stats["months"] += 1
+            stats["rows"] += rows
+            self.logger.debug(
+                "[%s] %s: %s nến → %s", key, month, rows, self.path(key, month)
+            )
+
+        self.logger.info(
+            f"[{key}] Export {self.interval}: {stats['months']} tháng, "
+            f"{stats['rows']} nến (bỏ qua {stats['skipped']} tháng không đổi)"
+        )
+        return stats
+
+    def export_all(
+        self, db, symbols: Optional[List[str]] = None, full: bool = False
+    ) -> Dict[str, Dict[str, int]]:
+        """export cho nhiều symbol; lỗi của 1 symbol không dừng symbol khác."""
+        symbols = symbols or IntervalUtil.tracked_symbols()
+        results = {}
+        for symbol in symbols:
+            try:
+                results[symbol.upper()] = self.export(db, symbol, full)
+            except Exception as e:
+                self.logger.error(f"[{symbol.upper()}] Lỗi khi export: {str(e)}")
+        return results
+
+
+__all__ = ["ParquetExport"]
@@ -5,16 +5,30 @@ Realtime Load - Load dữ liệu realtime vào MongoDB.
 from typing import Dict, Optional
 
 import pandas as pd
+from pymongo.errors import ConnectionFailure, NetworkTimeout, PyMongoError
 
 from configs.logger_config import LoggerConfig
 from configs.mongo_config import MongoConfig
 from configs.variable_config import EXTRACT_DATA_CONFIG
+from load.bulk_upsert import BulkUpsert
+from load.rollup_engine import RollupEngine
+from load.storage_backend import StorageBackend
+from load.watermark_cache import WatermarkCache
+from util.interval_util import IntervalUtil
+from util.metrics import Metrics
 
 
 class RealtimeLoad:
-    def __init__(self) -> None:
+    def __init__(self, interval: Optional[str] = None) -> None:
         self.logger = LoggerConfig.logger_config("Realtime Load CMC")
         self.batch_size_extract = EXTRACT_DATA_CONFIG.get("batch_size_extract", 1000)
+        # Layout lưu nến (document / timeseries / bucket) theo storage.layout
+        self.interval = interval or IntervalUtil.base_interval()
+        self.storage = StorageBackend.create(interval=self.interval)
+        # Nến interval lớn tính từ nến gốc (derived_intervals)
+        self.rollup = RollupEngine()
+        # Cập nhật mốc mới nhất sau khi ghi để RealtimeExtract không phải đọc lại DB
+        self.watermarks = WatermarkCache(self.interval)
         self.mongo_config = MongoConfig()
         # Không tạo client ngay, dùng lazy connection
         self.mongo_client = None
@@ -31,9 +45,7 @@ class RealtimeLoad:
                 self.db = self.mongo_client.get_database(
                     EXTRACT_DATA_CONFIG.get("database", "cmc_db")
                 )
-                self.collection = self.db.get_collection(
-                    EXTRACT_DATA_CONFIG.get("historical_collection", "cmc")
-                )
+                self.collection = self.db.get_collection(self.storage.collection_name)
                 self.logger.info("Kết nối MongoDB thành công")
             return self.collection
         except Exception as e:
@@ -51,34 +63,56 @@ class RealtimeLoad:
         self,
         realtime_data_extract: Optional[pd.DataFrame] = None,
         data_map: Optional[Dict[str, pd.DataFrame]] = None,
-    ):
+    ) -> Dict[str, Dict[str, int]]:
         """Load dữ liệu realtime vào MongoDB theo batch.
 
         Args:
             realtime_data_extract: DataFrame đơn lẻ
             data_map: Dict mapping symbol -> DataFrame
+
+        Returns:
+            Dict symbol -> {inserted, updated, unchanged, errors, batches}
         """
+        results = {}
         if data_map is not None:
             for symbol, df in data_map.items():
                 if df is None or df.empty:
-                    self.logger.info(f"Không có dữ liệu để load cho {symbol}")
+                    self.logger.debug("Không có dữ liệu để load cho %s", symbol)
                     continue
-                self._load_dataframe(df, symbol)
-            return
+                results[symbol] = self._load_dataframe(df, symbol)
+            return results
 
         if realtime_data_extract is not None:
-            self._load_dataframe(realtime_data_extract)
-            return
+            results["unknown"] = self._load_dataframe(realtime_data_extract)
+            return results
 
         self.logger.warning("Không có dữ liệu được cung cấp cho realtime_load")
+        return results
+
+    def _reset_connection(self):
+        """Đặt client về None để reconnect lần sau."""
+        self.mongo_client = None
+        self.db = None
+        self.collection = None
+        self.mongo_config.reset_client()
+        self.logger.info("Đã đặt lại MongoDB client, sẽ reconnect lần tiếp theo")
+
+    @Metrics.timed("load", source="realtime")
+    def _load_dataframe(
+        self, df: pd.DataFrame, symbol: Optional[str] = None
+    ) -> Dict[str, int]:
+        """Ghi DataFrame theo (symbol, datetime) qua storage backend đã cấu hình.
+
+        Index unique được IndexManager tạo một lần lúc khởi động.
 
-    def _load_dataframe(self, df: pd.DataFrame, symbol: Optional[str] = None):
-        self.logger.info(f"Bắt đầu load DataFrame cho {symbol or 'unknown symbol'}")
+        Returns:
+            Dict {inserted, updated, unchanged, errors, batches}
+        """
+        self.logger.debug("Bắt đầu load DataFrame cho %s", symbol or "unknown symbol")
         chunk_size = int(self.batch_size_extract or 1000)
-        batch_count = 0
-        inserted_count = 0
-        duplicate_count = 0
+        stats = BulkUpsert.empty_stats()
         connection_errors = 0
+        skipped = 0
 
         for chunk in self.chunk_data_frame(df, chunk_size=chunk_size):
             try:
@@ -86,71 +120,55 @@ class RealtimeLoad:
                 collection = self._get_mongo_client()
                 if collection is None:
                     self.logger.error("Không thể kết nối MongoDB, bỏ qua batch này")
+                    skipped += len(chunk)
                     continue
 
-                chunk_data = chunk.to_dict("records")
-                # Tạo index trên trường datetime nếu cần
-                try:
-                    collection.create_index(
-                        [("symbol", 1), ("datetime", 1)],
-                        unique=True,
-                        background=True,
-                    )
-                except Exception:
-                    pass
-
-                if chunk_data:
-                    # Insert từng bản ghi, bỏ qua nếu trùng
-                    for record in chunk_data:
-                        try:
-                            collection.insert_one(record)
-                            inserted_count += 1
-                        except Exception as e:
-                            error_str = str(e).lower()
-                            # Kiểm tra lỗi duplicate
-                            if "duplicate" in error_str:
-                                duplicate_count += 1
-                            # Kiểm tra lỗi connection
-                            elif (
-                                "closed" in error_str
-                                or "connection" in error_str
-                                or "timeout" in error_str
-                            ):
-                                connection_errors += 1
-                                self.logger.warning(f"Lỗi kết nối MongoDB: {str(e)}")
-                                # Đặt client về None để reconnect lần sau
-                                self.mongo_client = None
-                                self.db = None
-                                self.collection = None
-                                self.mongo_config.reset_client()
-                                self.logger.info(
-                                    "Đã đặt lại MongoDB client, sẽ reconnect lần tiếp theo"
-                                )
-                                break  # Thoát khỏi vòng lặp record, thử batch tiếp theo
-                            else:
-                                self.logger.warning(f"Lỗi khi insert: {str(e)}")
-
-                batch_count += 1
-                self.logger.info(
-                    f"Batch {batch_count} đã xử lý: {len(chunk_data)} bản ghi"
+                chunk_stats = self.storage.write(self.db, chunk, batch_size=chunk_size)
+                BulkUpsert.merge_stats(stats, chunk_stats)
+                self.logger.debug(
+                    "Batch %s đã xử lý: %s bản ghi", stats["batches"], len(chunk)
                 )
-            except Exception as e:
-                error_str = str(e).lower()
-                if (
-                    "closed" in error_str
-                    or "connection" in error_str
-                    or "timeout" in error_str
-                ):
+            except PyMongoError as e:
+                if isinstance(e, (ConnectionFailure, NetworkTimeout)):
                     connection_errors += 1
                     self.logger.error(f"Lỗi kết nối MongoDB khi load batch: {str(e)}")
-                    # Đặt lại client để reconnect
-                    self.mongo_client = None
-                    self.db = None
-                    self.collection = None
-                    self.mongo_config.reset_client()
+                    self._reset_connection()
                 else:
+                    stats["errors"] += len(chunk)
                     self.logger.error(f"Lỗi khi load dữ liệu realtime: {str(e)}")
-
-        self.logger.info(
-            f"Hoàn thành load - Inserted: {inserted_count}, Duplicate: {duplicate_count}, Connection errors: {connection_errors}, Tổng batch: {batch_count}"
+            except Exception as e:
+                stats["errors"] += len(chunk)
+                self.logger.error(f"Lỗi khi load dữ liệu realtime: {str(e)}")
+
+        # Từng symbol chỉ log ở DEBUG; tổng của cả vòng nằm trong log tổng hợp của pipeline
+        self.logger.debug(
+            "Hoàn thành load %s - Inserted: %s, Updated: %s, Unchanged: %s, "
+            "Errors: %s, Connection errors: %s, Tổng batch: %s",
+            symbol,
+            stats["inserted"],
+            stats["updated"],
+            stats["unchanged"],
+            stats["errors"],
+            connection_errors,
+            stats["batches"],
         )
+        stats["connection_errors"] = connection_errors
+        Metrics().record_load(stats, source="realtime")
+
+        if symbol:
+            if stats["errors"] or connection_errors or skipped:
+                # Không chắc phần nào đã ghi → lần sau đọc lại mốc từ DB
+                self.watermarks.invalidate([symbol])
+            else:
+                self.watermarks.advance(symbol, df["datetime"].max().to_pydatetime())
+            if (
+                self.interval == IntervalUtil.base_interval()
+                and stats["inserted"] + stats["updated"] > 0
+            ):
+                try:
+                    self.rollup.update(self.db, symbol, df)
+                except Exception as e:
+                    self.logger.error(
+                        f"Lỗi khi tính nến derived cho {symbol}: {str(e)}"
+                    )
+        return stats
@@ -0,0 +1,176 @@
+"""
+Rollup Engine - Tính nến interval lớn (derived_intervals) từ nến interval gốc đã lưu.
+
+- update: sau mỗi lần ghi nến gốc của một symbol, chỉ các nến lớn bị ảnh hưởng
+  được tính lại từ nến gốc trong DB rồi ghi vào collection của interval đó -
+  không tốn thêm request API
+- rebuild: dựng nến lớn cho lịch sử đã có trước khi bật derived_intervals, theo
+  từng batch; bắt đầu từ nến lớn mới nhất đã lưu (watermark) nên chạy lại
+  không tính lại lịch sử
+"""
+
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from configs.logger_config import LoggerConfig
+from configs.variable_config import EXTRACT_DATA_CONFIG
+from load.storage_backend import StorageBackend
+from util.candle_resampler import CandleResampler
+from util.interval_util import IntervalUtil
+
+
+class RollupEngine:
+    def __init__(self):
+        self.logger = LoggerConfig.logger_config("Rollup Engine")
+        self.base_interval = IntervalUtil.base_interval()
+        self.base_step = IntervalUtil.to_seconds(self.base_interval)
+        self.base_storage = StorageBackend.create(interval=self.base_interval)
+        # Số ngày nến gốc đọc mỗi batch khi rebuild
+        self.batch_days = float(
+            EXTRACT_DATA_CONFIG.get("rollup", {}).get("batch_days", 30)
+        )
+        self._targets = {}
+
+    def target(self, interval: str):
+        if interval not in self._targets:
+            self._targets[interval] = StorageBackend.create(interval=interval)
+        return self._targets[interval]
+
+    def _base_start(self, label: pd.Timestamp, step: int) -> pd.Timestamp:
+        """Nến gốc đầu tiên thuộc nến lớn có nhãn label."""
+        return label - timedelta(seconds=step - self.base_step)
+
+    def _resample_write(
+        self, db, symbol: str, interval: str, base: pd.DataFrame
+    ) -> Optional[Dict[str, int]]:
+        derived = CandleResampler.resample(base, interval, self.base_interval)
+        if derived.empty:
+            return None
+        stats = self.target(interval).write(db, derived)
+        self.logger.debug(
+            f"[{symbol.upper()}] Rollup {interval}: {len(derived)} nến "
+            f"({derived['datetime'].iloc[0]} → {derived['datetime'].iloc[-1]})"
+        )
+        return stats
+
+    def update(self, db, symbol: str, df: pd.DataFrame) -> Dict[str, Dict[str, int]]:
+        """Tính lại các nến lớn chứa nến gốc trong df.
+
+        Nến gốc chỉ được đọc 1 lần cho khoảng rộng nhất, mỗi interval lấy phần của mình.
+
+        Returns:
+            Dict interval -> stats ghi
+        """
+        results = {}
+        intervals = IntervalUtil.derived_for(symbol)
+        if not intervals or df is None or df.empty:
+            return results
+
+        first, last = df["datetime"].min(), df["datetime"].max()
+        ranges = {}
+        for interval in intervals:
+            step = IntervalUtil.to_seconds(interval)
+            ranges[interval] = (
+                self._base_start(first.ceil(f"{step}s"), step),
+                last.ceil(f"{step}s"),
+            )
+
+        base = self.base_storage.read_range(
+            db,
+            symbol,
+            min(start for start, _ in ranges.values()).to_pydatetime(),
+            max(end for _, end in ranges.values()).to_pydatetime(),
+        )
+        if base.empty:
+            return results
+
+        for interval, (start, end) in ranges.items():
+            part = base[base["datetime"].between(start, end)]
+            stats = self._resample_write(db, symbol, interval, part)
+            if stats is not None:
+                results[interval] = stats
+        return results
+
+    def rebuild(
+        self,
+        db,
+        symbol: str,
+        intervals: Optional[List[str]] = None,
+        full: bool = False,
+    ) -> Dict[str, Dict[str, int]]:
+        """Dựng nến lớn cho toàn bộ lịch sử nến gốc của symbol.
+
+        Args:
+            intervals: Interval cần dựng (mặc định: derived_intervals của symbol)
+            full: Dựng lại từ nến gốc đầu tiên thay vì từ watermark
+
+        Returns:
+            Dict interval -> stats ghi cộng dồn
+        """
+        results = {}
+        intervals = [
+            interval
+            for interval in (intervals or IntervalUtil.derived_for(symbol))
+            if IntervalUtil.is_derived(interval)
+        ]
+        info = self.base_storage.inventory(db, [symbol]).get(symbol.upper())
+        if not intervals or not info:
+            return results
+
+        first_base = pd.Timestamp(info["first"])
+        last_base = pd.Timestamp(info["last"])
+        for interval in intervals:
+            step = IntervalUtil.to_seconds(interval)
+            freq = f"{step}s"
+            label = first_base.ceil(freq)
+            watermark = (
+                None if full else self.target(interval).latest_datetime(db, symbol)
+            )
+            if watermark is not None:
+                # Nến lớn mới nhất được tính lại (idempotent), phần trước đó bỏ qua
+                label = max(label, pd.Timestamp(watermark))
+            # Chỉ dựng tới nến lớn đã có đủ nến gốc
+            end_label = last_base.floor(freq)
+
+            batch = timedelta(
+                seconds=max(1, int(self.batch_days * 86400 // step)) * step
+            )
+            totals = {"inserted": 0, "updated": 0, "unchanged": 0, "errors": 0}
+            while label <= end_label:
+                batch_end = min(label + batch - timedelta(seconds=step), end_label)
+                base = self.base_storage.read_range(
+                    db,
+                    symbol,
+                    self._base_start(label, step).to_pydatetime(),
+                    batch_end.to_pydatetime(),
+                )
+                stats = self._resample_write(db, symbol, interval, base) or {}
+                for key in totals:
+                    totals[key] += stats.get(key, 0)
+                label = batch_end + timedelta(seconds=step)
+            results[interval] = totals
+        return results
+
+    def rebuild_all(
+        self,
+        db,
+        symbols: Optional[List[str]] = None,
+        intervals: Optional[List[str]] = None,
+        full: bool = False,
+    ) -> Dict[str, Dict[str, Dict[str, int]]]:
+        """rebuild cho nhiều symbol; lỗi của 1 symbol không dừng symbol khác."""
+        symbols = symbols or IntervalUtil.tracked_symbols()
+        results = {}
+        for symbol in symbols:
+            try:
+                results[symbol.upper()] = self.rebuild(db, symbol, intervals, full)
+            except Exception as e:
+                self.logger.error(
+                    f"[{symbol.upper()}] Lỗi khi dựng nến derived: {str(e)}"
+                )
+        return results
+
+
+__all__ = ["RollupEngine"]
@@ -0,0 +1,773 @@
+"""
+Storage Backend - Cách bố trí nến trong MongoDB (storage.layout).
+
+- "document":   mỗi nến 15m là 1 document trong historical_collection (mặc định)
+- "timeseries": historical_collection là time-series collection của MongoDB
+                (timeField=datetime, metaField=symbol) - MongoDB tự nén theo bucket
+- "bucket":     mỗi symbol mỗi ngày là 1 document chứa các mảng cột; một view
+                trải phẳng mang tên historical_collection để các truy vấn đọc cũ
+                vẫn chạy được
+
+Đường load gọi storage.write(db, df); đọc mốc mới nhất / kiểm tra có dữ liệu
+đi qua latest_datetime / has_data để không phải quét view.
+"""
+
+import threading
+import uuid
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+from pymongo import DESCENDING, ReplaceOne
+from pymongo.errors import BulkWriteError
+
+from configs.logger_config import LoggerConfig
+from configs.variable_config import EXTRACT_DATA_CONFIG
+from load.bulk_upsert import BulkUpsert
+from util.datetime_codec import DatetimeCodec
+from util.interval_util import IntervalUtil
+
+
+class DocumentStorage:
+    """Mỗi nến là 1 document, upsert theo (symbol, datetime)."""
+
+    layout = "document"
+
+    def __init__(
+        self, codec: Optional[DatetimeCodec] = None, interval: Optional[str] = None
+    ):
+        self.logger = LoggerConfig.logger_config("Storage Backend")
+        self.codec = codec or DatetimeCodec()
+        self.storage_config = EXTRACT_DATA_CONFIG.get("storage", {})
+        # Mỗi interval một collection; interval gốc giữ historical_collection
+        self.interval = interval or IntervalUtil.base_interval()
+        self.collection_name = IntervalUtil.collection_name(
+            EXTRACT_DATA_CONFIG.get("historical_collection", "cmc"), self.interval
+        )
+
+    def index_specs(self) -> Dict[str, List[Tuple[str, List[Tuple[str, int]], Dict]]]:
+        """Index của collection nến: collection -> [(tên, keys, options)]."""
+        return {
+            self.collection_name: [
+                # Khóa idempotent cho upsert, cũng phục vụ sort datetime theo symbol
+                (
+                    "symbol_1_datetime_1",
+                    [("symbol", 1), ("datetime", 1)],
+                    {"unique": True},
+                ),
+            ],
+        }
+
+    def ensure(self, db):
+        """Tạo collection/view cần thiết cho layout (document: không cần gì)."""
+
+    def write(self, db, df: pd.DataFrame, batch_size: int = 1000) -> Dict[str, int]:
+        """Ghi DataFrame nến.
+
+        Returns:
+            Dict {inserted, updated, unchanged, errors, batches}
+        """
+        return BulkUpsert.write(
+            db.get_collection(self.collection_name),
+            self.codec.to_records(df),
+            batch_size=batch_size,
+        )
+
+    def latest_datetime(self, db, symbol: str) -> Optional[datetime]:
+        """datetime của nến mới nhất (naive UTC), None nếu chưa có dữ liệu."""
+        latest_record = db.get_collection(self.collection_name).find_one(
+            {"symbol": symbol.upper()},
+            sort=[("datetime", DESCENDING)],
+            projection={"datetime": 1},
+        )
+        if latest_record and "datetime" in latest_record:
+            return DatetimeCodec.decode(latest_record["datetime"])
+        return None
+
+    def latest_by_symbol(self, db, symbols: List[str]) -> Dict[str, datetime]:
+        """Nến mới nhất của nhiều symbol trong 1 aggregation (dùng index symbol, datetime).
+
+        Returns:
+            Dict SYMBOL -> datetime; symbol chưa có dữ liệu không có trong dict
+        """
+        pipeline = [
+            {"$match": {"symbol": {"$in": [symbol.upper() for symbol in symbols]}}},
+            # Đảo chiều cả 2 khóa = quét ngược index (symbol 1, datetime 1); $sort
+            # trộn chiều (1, -1) thì không dùng được index, phải sort chặn cả collection
+            {"$sort": {"symbol": -1, "datetime": -1}},
+            {"$group": {"_id": "$symbol", "latest": {"$first": "$datetime"}}},
+        ]
+        return {
+            row["_id"]: DatetimeCodec.decode(row["latest"])
+            for row in db.get_collection(self.collection_name).aggregate(pipeline)
+            if row.get("latest") is not None
+        }
+
+    def inventory(self, db, symbols: List[str]) -> Dict[str, Dict]:
+        """Số nến, nến cũ nhất, mới nhất của mọi symbol trong 1 lần group.
+
+        Returns:
+            Dict SYMBOL -> {count, first, last}; symbol chưa có dữ liệu không có trong dict
+        """
+        pipeline = [
+            {"$match": {"symbol": {"$in": [symbol.upper() for symbol in symbols]}}},
+            {
+                "$group": {
+                    "_id": "$symbol",
+                    "count": {"$sum": 1},
+                    "first": {"$min": "$datetime"},
+                    "last": {"$max": "$datetime"},
+                }
+            },
+        ]
+        return self._inventory_rows(
+            db.get_collection(self.collection_name).aggregate(pipeline)
+        )
+
+    @staticmethod
+    def _inventory_rows(rows) -> Dict[str, Dict]:
+        return {
+            row["_id"]: {
+                "count": int(row.get("count", 0)),
+                "first": DatetimeCodec.decode(row.get("first")),
+                "last": DatetimeCodec.decode(row.get("last")),
+            }
+            for row in rows
+            if row.get("count")
+        }
+
+    @staticmethod
+    def _decode_frame(df: pd.DataFrame) -> pd.DataFrame:
+        """Đưa các cột thời gian đã lưu (chuỗi / Date / epoch) về datetime64."""
+        for column in DatetimeCodec.TIME_COLUMNS:
+            if column in df.columns:
+                df[column] = pd.to_datetime(
+                    df[column].map(DatetimeCodec.decode), errors="coerce"
+                )
+        return df
+
+    def read_range(
+        self, db, symbol: str, start: datetime, end: datetime
+    ) -> pd.DataFrame:
+        """Đọc nến của symbol trong [start, end] thành DataFrame (datetime64, tăng dần)."""
+        cursor = (
+            db.get_collection(self.collection_name)
+            .find(
+                {
+                    "symbol": symbol.upper(),
+                    "datetime": {
+                        "$gte": self.codec.encode(start),
+                        "$lte": self.codec.encode(end),
+                    },
+                },
+                projection={"_id": 0},
+            )
+            .sort("datetime", 1)
+        )
+        df = pd.DataFrame(list(cursor))
+        if df.empty:
+            return df
+        return self._decode_frame(df)
+
+    def _range_query(
+        self, symbol: str, start: Optional[datetime], end: Optional[datetime]
+    ) -> Dict:
+        query = {"symbol": symbol.upper()}
+        bounds = {}
+        if start is not None:
+            bounds["$gte"] = self.codec.encode(start)
+        if end is not None:
+            bounds["$lte"] = self.codec.encode(end)
+        if bounds:
+            query["datetime"] = bounds
+        return query
+
+    def iter_range(
+        self,
+        db,
+        symbol: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        batch_size: int = 5000,
+    ) -> Iterator[pd.DataFrame]:
+        """Như read_range nhưng trả từng DataFrame ≤ batch_size nến, đọc dần từ cursor.
+
+        RAM chỉ giữ 1 batch nên dùng được cho khoảng dài (export, quét lịch sử).
+        """
+        batch_size = max(1, int(batch_size))
+        cursor = (
+            db.get_collection(self.collection_name)
+            .find(self._range_query(symbol, start, end), projection={"_id": 0})
+            .sort("datetime", 1)
+            .batch_size(batch_size)
+        )
+        rows = []
+        for doc in cursor:
+            rows.append(doc)
+            if len(rows) >= batch_size:
+                yield self._decode_frame(pd.DataFrame(rows))
+                rows = []
+        if rows:
+            yield self._decode_frame(pd.DataFrame(rows))
+
+    def count_range(
+        self,
+        db,
+        symbol: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> int:
+        """Số nến của symbol trong [start, end] (đếm trên index symbol, datetime)."""
+        return db.get_collection(self.collection_name).count_documents(
+            self._range_query(symbol, start, end)
+        )
+
+    def iter_datetimes(
+        self,
+        db,
+        symbol: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Iterator[datetime]:
+        """Duyệt datetime các nến của symbol theo thứ tự tăng dần (chỉ đọc cột datetime)."""
+        query = self._range_query(symbol, start, end)
+        cursor = (
+            db.get_collection(self.collection_name)
+            .find(query, projection={"_id": 0, "datetime": 1})
+            .sort("datetime", 1)
+            .batch_size(5000)
+        )
+        for doc in cursor:
+            value = DatetimeCodec.decode(doc.get("datetime"))
+            if value is not None:
+                yield value
+
+    def has_data(self, db, symbol: str) -> bool:
+        return (
+            db.get_collection(self.collection_name).find_one(
+                {"symbol": symbol.upper()}, projection={"_id": 1}
+            )
+            is not None
+        )
+
+
+class TimeSeriesStorage(DocumentStorage):
+    """Time-series collection: MongoDB gom nến theo (symbol, khoảng thời gian) và nén cột.
+
+    Time-series collection không có unique index và không hỗ trợ upsert, nên
+    mỗi lần ghi đọc trước các datetime đã có trong khoảng của chunk rồi chỉ
+    insert nến mới (chạy lại vẫn idempotent). Đọc + insert của cùng một symbol
+    được tuần tự hóa trong process (các writer thread của backfill và realtime)
+    để nến ở biên 2 window không bị insert 2 lần. Nhiều process cùng ghi một
+    symbol (backfill-worker --processes) thì không được khóa: dùng layout
+    document hoặc bucket.
+    """
+
+    layout = "timeseries"
+    # (collection, symbol) -> lock, dùng chung cho mọi instance trong process
+    _write_locks: Dict[Tuple[str, str], threading.Lock] = {}
+    _write_locks_guard = threading.Lock()
+
+    def __init__(
+        self, codec: Optional[DatetimeCodec] = None, interval: Optional[str] = None
+    ):
+        super().__init__(codec, interval)
+        if self.codec.mode != "datetime":
+            # timeField bắt buộc là BSON Date
+            raise ValueError(
+                "storage.layout='timeseries' cần storage.datetime_mode='datetime'"
+            )
+
+    def index_specs(self):
+        return {
+            self.collection_name: [
+                ("symbol_1_datetime_1", [("symbol", 1), ("datetime", 1)], {}),
+            ],
+        }
+
+    def ensure(self, db):
+        if self.collection_name in db.list_collection_names():
+            return
+        self.logger.info(f"Tạo time-series collection {self.collection_name} ...")
+        db.create_collection(
+            self.collection_name,
+            timeseries={
+                "timeField": "datetime",
+                "metaField": "symbol",
+                "granularity": self.storage_config.get(
+                    "timeseries_granularity", "minutes"
+                ),
+            },
+        )
+
+    def write(self, db, df: pd.DataFrame, batch_size: int = 1000) -> Dict[str, int]:
+        stats = BulkUpsert.empty_stats()
+        if df.empty:
+            return stats
+        collection = db.get_collection(self.collection_name)
+
+        for symbol, group in df.groupby("symbol", sort=False):
+            with self._write_lock(symbol):
+                self._insert_new(collection, symbol, group, batch_size, stats)
+        return stats
+
+    def _write_lock(self, symbol: str) -> threading.Lock:
+        key = (self.collection_name, symbol)
+        with self._write_locks_guard:
+            if key not in self._write_locks:
+                self._write_locks[key] = threading.Lock()
+            return self._write_locks[key]
+
+    def _insert_new(
+        self, collection, symbol: str, group: pd.DataFrame, batch_size: int, stats
+    ):
+        """Insert các nến của group chưa có trong collection (gọi khi giữ lock)."""
+        # Chunk có thể chứa cùng 1 nến 2 lần (window chồng nhau ở biên)
+        unique = group.drop_duplicates(subset=["datetime"], keep="last")
+        stats["unchanged"] += len(group) - len(unique)
+        group = unique
+        existing = {
+            DatetimeCodec.decode(doc["datetime"])
+            for doc in collection.find(
+                {
+                    "symbol": symbol,
+                    "datetime": {
+                        "$gte": self.codec.encode(group["datetime"].min()),
+                        "$lte": self.codec.encode(group["datetime"].max()),
+                    },
+                },
+                projection={"_id": 0, "datetime": 1},
+            )
+        }
+        new_rows = group[~group["datetime"].isin(list(existing))]
+        stats["unchanged"] += len(group) - len(new_rows)
+
+        records = self.codec.to_records(new_rows)
+        for i in range(0, len(records), max(1, int(batch_size))):
+            batch = records[i : i + batch_size]
+            try:
+                result = collection.insert_many(batch, ordered=False)
+                stats["inserted"] += len(result.inserted_ids)
+            except BulkWriteError as e:
+                details = e.details
+                stats["inserted"] += details.get("nInserted", 0)
+                stats["errors"] += len(details.get("writeErrors", []))
+            stats["batches"] += 1
+
+
+class BucketStorage(DocumentStorage):
+    """Mỗi symbol mỗi ngày (UTC) là 1 document chứa các mảng cột.
+
+        {symbol, day, count, first, last, columns: {datetime: [...], open: [...], ...}}
+
+    Tên trường chỉ lưu 1 lần cho cả ngày (96 nến 15m), index chỉ có 1 entry/ngày.
+    Ghi: đọc các bucket bị ảnh hưởng trong 1 truy vấn, gộp nến mới bằng pandas
+    rồi ReplaceOne upsert cả bucket với điều kiện rev chưa đổi (optimistic lock).
+    """
+
+    layout = "bucket"
+    # Số lần đọc lại + gộp lại bucket bị writer khác ghi cùng lúc
+    MAX_CONFLICT_RETRIES = 5
+
+    def __init__(
+        self, codec: Optional[DatetimeCodec] = None, interval: Optional[str] = None
+    ):
+        super().__init__(codec, interval)
+        self.bucket_collection_name = IntervalUtil.collection_name(
+            self.storage_config.get(
+                "bucket_collection",
+                f"{EXTRACT_DATA_CONFIG.get('historical_collection', 'cmc')}_buckets",
+            ),
+            self.interval,
+        )
+        # View trải phẳng giữ tên collection cũ cho các truy vấn đọc hiện có
+        self.view_name = IntervalUtil.collection_name(
+            self.storage_config.get(
+                "bucket_view", EXTRACT_DATA_CONFIG.get("historical_collection", "cmc")
+            ),
+            self.interval,
+        )
+
+    def index_specs(self):
+        return {
+            self.bucket_collection_name: [
+                ("symbol_1_day_1", [("symbol", 1), ("day", 1)], {"unique": True}),
+            ],
+        }
+
+    def view_pipeline(self, columns: List[str]) -> List[Dict]:
+        """Pipeline trải mảng cột thành 1 document/nến (giống layout document)."""
+        return [
+            {
+                "$project": {
+                    "symbol": 1,
+                    "rows": {
+                        "$map": {
+                            "input": {"$range": [0, "$count"]},
+                            "as": "i",
+                            "in": {
+                                column: {"$arrayElemAt": [f"$columns.{column}", "$$i"]}
+                                for column in columns
+                            },
+                        }
+                    },
+                }
+            },
+            {"$unwind": "$rows"},
+            {
+                "$replaceRoot": {
+                    "newRoot": {"$mergeObjects": [{"symbol": "$symbol"}, "$rows"]}
+                }
+            },
+        ]
+
+    def ensure(self, db):
+        from util.quote_normalizer import QuoteNormalizer
+
+        existing = db.list_collection_names()
+        if self.view_name in existing:
+            info = next(iter(db.list_collections(filter={"name": self.view_name})), {})
+            if info.get("type") != "view":
+                self.logger.warning(
+                    f"{self.view_name} đang là collection thường, không tạo view đọc "
+                    f"cho layout bucket (đổi storage.bucket_view hoặc chuyển dữ liệu trước)"
+                )
+            return
+        columns = [c for c in QuoteNormalizer.COLUMNS if c != "symbol"]
+        self.logger.info(
+            f"Tạo view {self.view_name} trên {self.bucket_collection_name} ..."
+        )
+        db.create_collection(
+            self.view_name,
+            viewOn=self.bucket_collection_name,
+            pipeline=self.view_pipeline(columns),
+        )
+
+    @classmethod
+    def _bucket_to_frame(cls, doc: Dict) -> pd.DataFrame:
+        df = cls._decode_frame(pd.DataFrame(doc.get("columns", {})))
+        df.insert(0, "symbol", doc["symbol"])
+        return df
+
+    def read_range(self, db, symbol, start, end):
+        cursor = (
+            db.get_collection(self.bucket_collection_name)
+            .find(
+                {
+                    "symbol": symbol.upper(),
+                    "day": {
+                        "$gte": self.codec.encode(
+                            pd.Timestamp(start).floor("D").to_pydatetime()
+                        ),
+                        "$lte": self.codec.encode(end),
+                    },
+                }
+            )
+            .sort("day", 1)
+        )
+        frames = [self._bucket_to_frame(doc) for doc in cursor]
+        if not frames:
+            return pd.DataFrame()
+        df = pd.concat(frames, ignore_index=True)
+        df = df[(df["datetime"] >= start) & (df["datetime"] <= end)]
+        return df.reset_index(drop=True)
+
+    @staticmethod
+    def _count_changed(old: pd.DataFrame, new: pd.DataFrame) -> int:
+        """Số nến trong new đã có trong old nhưng khác giá trị."""
+        if new.empty:
+            return 0
+        columns = [c for c in new.columns if c in old.columns and c != "datetime"]
+        before = old.set_index("datetime").loc[new["datetime"], columns]
+        after = new.set_index("datetime")[columns]
+        same = (before == after) | (before.isna() & after.isna())
+        return int((~same.all(axis=1)).sum())
+
+    def write(self, db, df: pd.DataFrame, batch_size: int = 1000) -> Dict[str, int]:
+        """Gộp nến vào bucket ngày, an toàn khi nhiều writer ghi cùng bucket.
+
+        Mỗi bucket mang rev ngẫu nhiên; ReplaceOne chỉ khớp khi rev còn đúng giá
+        trị đã đọc. Bucket bị writer khác ghi trước (rev đổi, hoặc 2 writer cùng
+        tạo bucket mới → trùng unique index) được đọc lại và gộp lại.
+        """
+        stats = BulkUpsert.empty_stats()
+        if df.empty:
+            return stats
+        collection = db.get_collection(self.bucket_collection_name)
+
+        df = df.assign(_day=df["datetime"].dt.floor("D"))
+        pending = {
+            (symbol, day.to_pydatetime()): group.drop(columns=["_day"])
+            for (symbol, day), group in df.groupby(["symbol", "_day"], sort=False)
+        }
+        # (symbol, day) -> stats của lần gộp cuối cùng (lần retry ghi đè lần trước)
+        bucket_stats: Dict[Tuple[str, datetime], Dict[str, int]] = {}
+        for attempt in range(self.MAX_CONFLICT_RETRIES + 1):
+            conflicts = self._write_buckets(
+                collection, pending, bucket_stats, batch_size, stats
+            )
+            if not conflicts:
+                break
+            self.logger.debug(
+                "%s bucket bị writer khác ghi cùng lúc, gộp lại (lần %s)",
+                len(conflicts),
+                attempt + 1,
+            )
+            pending = {key: pending[key] for key in conflicts}
+        else:
+            for key in conflicts:
+                self.logger.error(
+                    f"Không ghi được bucket {key[0]} {key[1]:%Y-%m-%d} "
+                    f"sau {self.MAX_CONFLICT_RETRIES} lần gộp lại"
+                )
+                bucket_stats[key] = {"errors": len(pending[key])}
+
+        for key_stats in bucket_stats.values():
+            BulkUpsert.merge_stats(stats, key_stats)
+        return stats
+
+    def _write_buckets(
+        self,
+        collection,
+        groups: Dict[Tuple[str, datetime], pd.DataFrame],
+        bucket_stats: Dict[Tuple[str, datetime], Dict[str, int]],
+        batch_size: int,
+        stats: Dict[str, int],
+    ) -> List[Tuple[str, datetime]]:
+        """1 lượt đọc → gộp → ghi có điều kiện. Returns: các bucket bị xung đột."""
+        key_filters = {
+            key: {"symbol": key[0], "day": self.codec.encode(key[1])} for key in groups
+        }
+        existing = {
+            (doc["symbol"], DatetimeCodec.decode(doc["day"])): doc
+            for doc in collection.find({"$or": list(key_filters.values())})
+        }
+
+        rev = uuid.uuid4().hex
+        operations = []
+        for key, group in groups.items():
+            symbol, day = key
+            group = group.drop_duplicates(subset=["datetime"], keep="last")
+            old_doc = existing.get(key)
+            if old_doc is not None:
+                old = self._bucket_to_frame(old_doc)
+                overlap = group["datetime"].isin(old["datetime"])
+                changed = self._count_changed(old, group[overlap])
+                bucket_stats[key] = {
+                    "inserted": int((~overlap).sum()),
+                    "updated": changed,
+                    "unchanged": int(overlap.sum()) - changed,
+                }
+                merged = pd.concat([old, group], ignore_index=True)
+                merged = merged.drop_duplicates(subset=["datetime"], keep="last")
+            else:
+                merged = group
+                bucket_stats[key] = {"inserted": len(group)}
+
+            merged = merged.sort_values("datetime").reset_index(drop=True)
+            records = self.codec.to_records(merged.drop(columns=["symbol"]))
+            columns = {
+                column: [record[column] for record in records]
+                for column in merged.columns
+                if column != "symbol"
+            }
+            day_value = key_filters[key]["day"]
+            operations.append(
+                ReplaceOne(
+                    # rev None khớp cả bucket chưa có rev (ghi trước khi có cơ chế này)
+                    dict(
+                        key_filters[key],
+                        rev=old_doc.get("rev") if old_doc is not None else None,
+                    ),
+                    {
+                        "symbol": symbol,
+                        "day": day_value,
+                        "rev": rev,
+                        "count": len(merged),
+                        "first": columns["datetime"][0],
+                        "last": columns["datetime"][-1],
+                        "columns": columns,
+                    },
+                    upsert=True,
+                )
+            )
+
+        for i in range(0, len(operations), max(1, int(batch_size))):
+            try:
+                collection.bulk_write(operations[i : i + batch_size], ordered=False)
+            except BulkWriteError:
+                # Trùng khóa (symbol, day) khi 2 writer cùng tạo bucket: kiểm tra bên dưới
+                pass
+            stats["batches"] += 1
+
+        written = {
+            (doc["symbol"], DatetimeCodec.decode(doc["day"]))
+            for doc in collection.find(
+                {"$or": list(key_filters.values()), "rev": rev},
+                projection={"symbol": 1, "day": 1},
+            )
+        }
+        return [key for key in groups if key not in written]
+
+    def latest_datetime(self, db, symbol: str) -> Optional[datetime]:
+        latest_bucket = db.get_collection(self.bucket_collection_name).find_one(
+            {"symbol": symbol.upper()},
+            sort=[("day", DESCENDING)],
+            projection={"last": 1},
+        )
+        if latest_bucket and latest_bucket.get("last") is not None:
+            return DatetimeCodec.decode(latest_bucket["last"])
+        return None
+
+    def latest_by_symbol(self, db, symbols: List[str]) -> Dict[str, datetime]:
+        pipeline = [
+            {"$match": {"symbol": {"$in": [symbol.upper() for symbol in symbols]}}},
+            {"$sort": {"symbol": -1, "day": -1}},
+            {"$group": {"_id": "$symbol", "latest": {"$first": "$last"}}},
+        ]
+        return {
+            row["_id"]: DatetimeCodec.decode(row["latest"])
+            for row in db.get_collection(self.bucket_collection_name).aggregate(
+                pipeline
+            )
+            if row.get("latest") is not None
+        }
+
+    def inventory(self, db, symbols: List[str]) -> Dict[str, Dict]:
+        # Mỗi bucket đã có sẵn count/first/last → chỉ group trên số ngày, không trên số nến
+        pipeline = [
+            {"$match": {"symbol": {"$in": [symbol.upper() for symbol in symbols]}}},
+            {
+                "$group": {
+                    "_id": "$symbol",
+                    "count": {"$sum": "$count"},
+                    "first": {"$min": "$first"},
+                    "last": {"$max": "$last"},
+                }
+            },
+        ]
+        return self._inventory_rows(
+            db.get_collection(self.bucket_collection_name).aggregate(pipeline)
+        )
+
+    def _range_query(self, symbol, start, end):
+        # Bucket theo ngày: lấy cả bucket chứa start, lọc từng nến sau khi đọc
+        query = {"symbol": symbol.upper()}
+        bounds = {}
+        if start is not None:
+            bounds["$gte"] = self.codec.encode(
+                pd.Timestamp(start).floor("D").to_pydatetime()
+            )
+        if end is not None:
+            bounds["$lte"] = self.codec.encode(end)
+        if bounds:
+            query["day"] = bounds
+        return query
+
+    def iter_range(self, db, symbol, start=None, end=None, batch_size=5000):
+        batch_size = max(1, int(batch_size))
+        cursor = (
+            db.get_collection(self.bucket_collection_name)
+            .find(self._range_query(symbol, start, end))
+            .sort("day", 1)
+        )
+        frames, rows = [], 0
+        for doc in cursor:
+            df = self._bucket_to_frame(doc)
+            if start is not None:
+                df = df[df["datetime"] >= start]
+            if end is not None:
+                df = df[df["datetime"] <= end]
+            if df.empty:
+                continue
+            frames.append(df)
+            rows += len(df)
+            if rows >= batch_size:
+                yield pd.concat(frames, ignore_index=True)
+                frames, rows = [], 0
+        if frames:
+            yield pd.concat(frames, ignore_index=True)
+
+    def count_range(self, db, symbol, start=None, end=None):
+        # Đếm trên server: lọc mảng columns.datetime của từng bucket, không tải nến về
+        conditions = []
+        if start is not None:
+            conditions.append({"$gte": ["$$d", self.codec.encode(start)]})
+        if end is not None:
+            conditions.append({"$lte": ["$$d", self.codec.encode(end)]})
+        count = (
+            {
+                "$size": {
+                    "$filter": {
+                        "input": "$columns.datetime",
+                        "as": "d",
+                        "cond": {"$and": conditions},
+                    }
+                }
+            }
+            if conditions
+            else "$count"
+        )
+        pipeline = [
+            {"$match": self._range_query(symbol, start, end)},
+            {"$group": {"_id": None, "count": {"$sum": count}}},
+        ]
+        rows = list(db.get_collection(self.bucket_collection_name).aggregate(pipeline))
+        return int(rows[0]["count"]) if rows else 0
+
+    def iter_datetimes(self, db, symbol, start=None, end=None):
+        query = self._range_query(symbol, start, end)
+        cursor = (
+            db.get_collection(self.bucket_collection_name)
+            .find(query, projection={"_id": 0, "columns.datetime": 1})
+            .sort("day", 1)
+        )
+        for doc in cursor:
+            for raw in doc.get("columns", {}).get("datetime", []):
+                value = DatetimeCodec.decode(raw)
+                if value is None:
+                    continue
+                if (start is None or value >= start) and (end is None or value <= end):
+                    yield value
+
+    def has_data(self, db, symbol: str) -> bool:
+        return (
+            db.get_collection(self.bucket_collection_name).find_one(
+                {"symbol": symbol.upper()}, projection={"_id": 1}
+            )
+            is not None
+        )
+
+
+class StorageBackend:
+    """Chọn backend theo storage.layout. Sử dụng: StorageBackend.create()"""
+
+    LAYOUTS = {
+        DocumentStorage.layout: DocumentStorage,
+        TimeSeriesStorage.layout: TimeSeriesStorage,
+        BucketStorage.layout: BucketStorage,
+    }
+
+    @classmethod
+    def create(
+        cls,
+        layout: Optional[str] = None,
+        codec: Optional[DatetimeCodec] = None,
+        interval: Optional[str] = None,
+    ) -> DocumentStorage:
+        layout = layout or EXTRACT_DATA_CONFIG.get("storage", {}).get(
+            "layout", "document"
+        )
+        if layout not in cls.LAYOUTS:
+            raise ValueError(
+                f"storage.layout không hợp lệ: {layout} (hỗ trợ: {', '.join(cls.LAYOUTS)})"
+            )
+        return cls.LAYOUTS[layout](codec, interval)
+
+
+__all__ = [
+    "StorageBackend",
+    "DocumentStorage",
+    "TimeSeriesStorage",
+    "BucketStorage",
+]
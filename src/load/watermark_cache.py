@@ -0,0 +1,112 @@
+"""
+Watermark Cache - Mốc nến mới nhất của từng symbol giữ trong RAM.
+
+- Nạp cho tất cả symbol bằng 1 aggregation khi khởi động (và định kỳ theo
+  watermark.refresh_seconds để đối chiếu với DB)
+- RealtimeLoad cập nhật mốc sau mỗi lần ghi thành công → vòng realtime ổn định
+  không cần truy vấn đọc nào
+- Ghi lỗi thì symbol bị invalidate, lần sau đọc lại từ DB cho riêng symbol đó
+"""
+
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from configs.logger_config import LoggerConfig
+from configs.variable_config import EXTRACT_DATA_CONFIG
+from util.interval_util import IntervalUtil
+
+
+class WatermarkCache:
+    # Một cache cho mỗi interval
+    _instances: Dict[str, "WatermarkCache"] = {}
+
+    def __new__(cls, interval: Optional[str] = None):
+        interval = interval or IntervalUtil.base_interval()
+        if interval not in cls._instances:
+            instance = super(WatermarkCache, cls).__new__(cls)
+            instance._init_cache()
+            instance.interval = interval
+            cls._instances[interval] = instance
+        return cls._instances[interval]
+
+    def _init_cache(self):
+        self.logger = LoggerConfig.logger_config("Watermark Cache")
+        watermark_config = EXTRACT_DATA_CONFIG.get("watermark", {})
+        self.refresh_seconds = float(watermark_config.get("refresh_seconds", 3600))
+        self._lock = threading.Lock()
+        # SYMBOL -> datetime (None = đã biết là chưa có dữ liệu)
+        self._latest: Dict[str, Optional[datetime]] = {}
+        # Symbol cần đọc lại từ DB (sau lỗi ghi)
+        self._stale = set()
+        self._loaded_at: Optional[float] = None
+
+    def refresh_due(self) -> bool:
+        with self._lock:
+            return (
+                self._loaded_at is None
+                or time.monotonic() - self._loaded_at >= self.refresh_seconds
+            )
+
+    def load(self, storage, db, symbols: Iterable[str]) -> Dict[str, datetime]:
+        """Nạp mốc mới nhất của mọi symbol bằng 1 aggregation, thay toàn bộ cache."""
+        symbols = [symbol.upper() for symbol in symbols]
+        latest = storage.latest_by_symbol(db, symbols)
+        self.seed(latest, symbols)
+        return latest
+
+    def seed(self, latest: Dict[str, datetime], symbols: Iterable[str]):
+        """Nạp cache từ kết quả đã có sẵn (ví dụ inventory lúc khởi động)."""
+        symbols = [symbol.upper() for symbol in symbols]
+        with self._lock:
+            self._latest = {symbol: latest.get(symbol) for symbol in symbols}
+            self._stale.clear()
+            self._loaded_at = time.monotonic()
+        self.logger.info(
+            f"Đã nạp watermark cho {len(symbols)} symbols "
+            f"({len(latest)} symbol có dữ liệu)"
+        )
+
+    def refresh_if_due(self, storage, db, symbols: Iterable[str]) -> bool:
+        """Nạp lại nếu chưa nạp lần nào hoặc đã quá refresh_seconds."""
+        if not self.refresh_due():
+            return False
+        self.load(storage, db, symbols)
+        return True
+
+    def get(self, symbol: str) -> Tuple[bool, Optional[datetime]]:
+        """Returns: (hit, datetime) - hit=False nghĩa là cần đọc từ DB."""
+        key = symbol.upper()
+        with self._lock:
+            if self._loaded_at is None or key in self._stale or key not in self._latest:
+                return False, None
+            return True, self._latest[key]
+
+    def set(self, symbol: str, latest: Optional[datetime]):
+        """Ghi giá trị vừa đọc từ DB (bỏ trạng thái stale)."""
+        key = symbol.upper()
+        with self._lock:
+            self._latest[key] = latest
+            self._stale.discard(key)
+
+    def advance(self, symbol: str, latest: Optional[datetime]):
+        """Đẩy mốc lên sau khi ghi thành công (không bao giờ lùi)."""
+        if latest is None:
+            return
+        key = symbol.upper()
+        with self._lock:
+            current = self._latest.get(key)
+            if current is None or latest > current:
+                self._latest[key] = latest
+
+    def invalidate(self, symbols: Optional[List[str]] = None):
+        """Đánh dấu symbol (hoặc tất cả) cần đọc lại từ DB."""
+        with self._lock:
+            if symbols is None:
+                self._stale.update(self._latest.keys())
+            else:
+                self._stale.update(symbol.upper() for symbol in symbols)
+
+
+__all__ = ["WatermarkCache"]
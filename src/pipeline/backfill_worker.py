@@ -0,0 +1,215 @@
+"""
+Backfill Worker - Worker process lấy window từ BackfillQueue, fetch và ghi MongoDB.
+
+Chạy nhiều worker (nhiều process, nhiều host) trỏ cùng MongoDB để backfill song
+song vượt giới hạn GIL của 1 process:
+    python main.py backfill-worker [--processes=N] [--workers=N]
+- Mỗi process có workers thread, mỗi thread lease 1 window tại một thời điểm
+- Thread heartbeat gia hạn lease của các window đang xử lý
+- Process bị kill: lease hết hạn, window được worker khác lấy lại
+- rate_limit là tổng cho mọi worker: mỗi process chỉ dùng
+  requests_per_second / (processes * backfill_queue.hosts), nên thêm process
+  không làm tăng tổng tốc độ gọi API
+"""
+
+import multiprocessing
+import threading
+import time
+from typing import Dict, List, Optional
+
+from configs.logger_config import LoggerConfig
+from configs.variable_config import EXTRACT_DATA_CONFIG
+from extract.extract import Extract
+from load.backfill_queue import BackfillQueue
+from load.load import HistoricalLoad
+from util.interval_util import IntervalUtil
+from util.rate_limiter import RateLimiter
+
+
+class BackfillWorker:
+    def __init__(
+        self,
+        interval: Optional[str] = None,
+        owner: Optional[str] = None,
+        workers: Optional[int] = None,
+        rate_share: int = 1,
+    ):
+        self.logger = LoggerConfig.logger_config("Backfill Worker")
+        self.config = EXTRACT_DATA_CONFIG.get("backfill_queue", {})
+        self.interval = interval or IntervalUtil.base_interval()
+        self.queue = BackfillQueue(self.interval)
+        self.owner = owner or BackfillQueue.default_owner()
+        self.extract = Extract(self.interval)
+        self.loader = HistoricalLoad(self.interval)
+        self.workers = max(1, int(workers or self.extract.backfill_workers or 1))
+        # Phần rate_limit của process này (rate_share process cùng gọi API)
+        RateLimiter().share(rate_share)
+        self.heartbeat_seconds = float(self.config.get("heartbeat_seconds", 30))
+        self.poll_seconds = float(self.config.get("poll_seconds", 5))
+        # Không lease được window nào trong khoảng này thì thoát
+        self.idle_exit_seconds = float(self.config.get("idle_exit_seconds", 300))
+        self._stop = threading.Event()
+        self._stats_lock = threading.Lock()
+        self.stats = {"windows": 0, "records": 0, "empty": 0, "errors": 0}
+
+    def _count(self, **values):
+        with self._stats_lock:
+            for key, value in values.items():
+                self.stats[key] += value
+
+    def process(self, item: Dict) -> int:
+        """Fetch + ghi một window. Returns: số bản ghi API trả về."""
+        symbol = item["symbol"].lower()
+        cmc_id = self.extract.cmc_symbol_ids.get(symbol)
+        if not cmc_id:
+            raise ValueError(f"Không tìm thấy CMC ID cho symbol: {symbol}")
+
+        records = self.extract._fetch_batch(cmc_id, item["start"], item["end"])
+        if not records:
+            return 0
+        df = self.extract._convert_to_dataframe(records, symbol)
+        if not df.empty:
+            stats = self.loader._load_dataframe(df, symbol)
+            if stats.get("errors"):
+                raise RuntimeError(f"{stats['errors']} bản ghi ghi lỗi")
+        return len(records)
+
+    def _slot(self, slot: int):
+        """Vòng lặp của 1 thread: lease → xử lý → complete/fail."""
+        idle_since = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                item = self.queue.lease(self.owner)
+            except Exception as e:
+                self.logger.error(f"[slot {slot}] Lỗi khi lease window: {str(e)}")
+                item = None
+
+            if item is None:
+                # Hết window chờ / đang chạy, hoặc chờ quá lâu (window bị kẹt)
+                if not self.queue.has_work() or (
+                    time.monotonic() - idle_since >= self.idle_exit_seconds
+                ):
+                    return
+                self._stop.wait(self.poll_seconds)
+                continue
+
+            idle_since = time.monotonic()
+            window = (
+                f"{item['symbol']} #{item['index']} ({item['start']} → {item['end']})"
+            )
+            try:
+                records = self.process(item)
+                self.queue.complete(item, records)
+                self._count(windows=1, records=records, empty=0 if records else 1)
+                self.logger.info(f"✓ {window}: {records} bản ghi")
+            except Exception as e:
+                self._count(errors=1)
+                self.logger.error(f"✗ {window}: {str(e)}")
+                try:
+                    self.queue.fail(item, str(e))
+                except Exception as fail_error:
+                    # Không trả được về queue: lease hết hạn sẽ tự trả lại
+                    self.logger.error(f"Không trả window về queue: {str(fail_error)}")
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.heartbeat_seconds):
+            try:
+                self.queue.heartbeat(self.owner)
+            except Exception as e:
+                self.logger.warning(f"Heartbeat lỗi: {str(e)}")
+
+    def run(self, symbols: Optional[List[str]] = None) -> Dict[str, int]:
+        """Tạo job còn thiếu rồi xử lý window tới khi hết việc."""
+        self.logger.info(
+            f"Backfill worker {self.owner} ({self.interval}, {self.workers} thread)"
+        )
+        self.queue.plan(symbols)
+
+        heartbeat = threading.Thread(
+            target=self._heartbeat, name="backfill-heartbeat", daemon=True
+        )
+        heartbeat.start()
+        slots = [
+            threading.Thread(
+                target=self._slot, args=(i,), name=f"backfill-slot-{i}", daemon=True
+            )
+            for i in range(self.workers)
+        ]
+        for slot in slots:
+            slot.start()
+        try:
+            for slot in slots:
+                while slot.is_alive():
+                    slot.join(timeout=1)
+        except KeyboardInterrupt:
+            self.logger.info("Nhận tín hiệu dừng, chờ các window đang xử lý")
+        finally:
+            self._stop.set()
+            for slot in slots:
+                slot.join()
+            heartbeat.join(timeout=1)
+
+        self.logger.info(f"Worker {self.owner} dừng: {self.stats}")
+        self.logger.info(f"Trạng thái queue: {self.queue.status()}")
+        return self.stats
+
+    @classmethod
+    def run_processes(
+        cls,
+        processes: int,
+        interval: Optional[str] = None,
+        workers: Optional[int] = None,
+        symbols: Optional[List[str]] = None,
+        hosts: Optional[int] = None,
+    ):
+        """Chạy nhiều worker process trên máy này (spawn, không chia sẻ client Mongo).
+
+        Args:
+            hosts: Số host chạy backfill-worker cùng lúc (mặc định backfill_queue.hosts),
+                rate_limit được chia đều cho processes * hosts process
+        """
+        processes = max(1, processes)
+        hosts = max(
+            1,
+            int(hosts or EXTRACT_DATA_CONFIG.get("backfill_queue", {}).get("hosts", 1)),
+        )
+        rate_share = processes * hosts
+        if processes == 1:
+            return cls(interval=interval, workers=workers, rate_share=rate_share).run(
+                symbols
+            )
+
+        context = multiprocessing.get_context("spawn")
+        children = [
+            context.Process(
+                target=_run_worker,
+                args=(interval, workers, symbols, rate_share),
+                name=f"backfill-worker-{i}",
+            )
+            for i in range(processes)
+        ]
+        for child in children:
+            child.start()
+        try:
+            for child in children:
+                child.join()
+        except KeyboardInterrupt:
+            for child in children:
+                child.terminate()
+            for child in children:
+                child.join()
+        return {"processes": processes}
+
+
+def _run_worker(
+    interval: Optional[str],
+    workers: Optional[int],
+    symbols: Optional[List[str]],
+    rate_share: int,
+):
+    BackfillWorker(interval=interval, workers=workers, rate_share=rate_share).run(
+        symbols
+    )
+
+
+__all__ = ["BackfillWorker"]
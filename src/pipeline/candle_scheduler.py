@@ -0,0 +1,94 @@
+"""
+Candle Scheduler - Lịch poll realtime bám theo thời điểm đóng nến.
+
+Nến 15m chỉ đóng mỗi 15 phút, poll cố định 60 giây thì 14/15 lần là thừa.
+Scheduler:
+- Tính mốc đóng nến kế tiếp của từng symbol theo interval (căn theo epoch UTC)
+- Thức dậy ngay sau mốc đó + close_delay_seconds
+- Chỉ poll các symbol mà watermark chưa tới nến vừa đóng
+- Nến dự kiến bị trễ thì poll lại sau late_poll_seconds, quá late_give_up_seconds
+  thì chờ mốc kế tiếp
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+from configs.variable_config import EXTRACT_DATA_CONFIG
+from load.watermark_cache import WatermarkCache
+from util.interval_util import IntervalUtil
+
+
+class CandleScheduler:
+    def __init__(
+        self,
+        symbols: Iterable[str],
+        intervals: Optional[Dict[str, str]] = None,
+        interval: Optional[str] = None,
+    ):
+        scheduler_config = EXTRACT_DATA_CONFIG.get("scheduler", {})
+        self.close_delay = float(scheduler_config.get("close_delay_seconds", 20))
+        self.late_poll = float(scheduler_config.get("late_poll_seconds", 30))
+        self.late_give_up = float(scheduler_config.get("late_give_up_seconds", 600))
+
+        default_interval = interval or IntervalUtil.base_interval()
+        intervals = intervals or {}
+        self.symbols = [symbol.lower() for symbol in symbols]
+        # symbol -> số giây của interval
+        self.steps = {
+            symbol: IntervalUtil.to_seconds(intervals.get(symbol, default_interval))
+            for symbol in self.symbols
+        }
+        self.watermarks = WatermarkCache(default_interval)
+
+    @staticmethod
+    def _floor(moment: datetime, step: int) -> datetime:
+        seconds = IntervalUtil.utc_timestamp(moment)
+        return datetime.fromtimestamp(seconds - seconds % step, timezone.utc).replace(
+            tzinfo=None
+        )
+
+    def expected_close(self, symbol: str, now: datetime) -> datetime:
+        """Nến mới nhất lẽ ra đã có (đã đóng trước now - close_delay)."""
+        return self._floor(
+            now - timedelta(seconds=self.close_delay), self.steps[symbol]
+        )
+
+    def next_close(self, symbol: str, now: datetime) -> datetime:
+        """Mốc đóng nến kế tiếp sau now (chưa cộng close_delay)."""
+        step = self.steps[symbol]
+        return self._floor(now, step) + timedelta(seconds=step)
+
+    def due_symbols(self, now: Optional[datetime] = None) -> List[str]:
+        """Symbol mà watermark còn thiếu nến đã đóng (chưa biết watermark cũng tính)."""
+        now = now or datetime.utcnow()
+        due = []
+        for symbol in self.symbols:
+            hit, latest = self.watermarks.get(symbol)
+            if not hit or latest is None or latest < self.expected_close(symbol, now):
+                due.append(symbol)
+        return due
+
+    def seconds_until_next(
+        self, late_symbols: Iterable[str], now: Optional[datetime] = None
+    ) -> float:
+        """Số giây cần ngủ trước lần poll kế tiếp.
+
+        - Có symbol trễ nến và chưa quá late_give_up: poll lại sau late_poll
+        - Ngược lại: mốc đóng nến sớm nhất của mọi symbol + close_delay
+        """
+        now = now or datetime.utcnow()
+        for symbol in late_symbols:
+            overdue = (now - self.expected_close(symbol, now)).total_seconds()
+            if overdue - self.close_delay < self.late_give_up:
+                return self.late_poll
+
+        if not self.symbols:
+            return self.late_poll
+        wake = min(
+            self.next_close(symbol, now - timedelta(seconds=self.close_delay))
+            for symbol in self.symbols
+        ) + timedelta(seconds=self.close_delay)
+        return max(1.0, (wake - now).total_seconds())
+
+
+__all__ = ["CandleScheduler"]
@@ -0,0 +1,227 @@
+"""
+Gap Repair - Bù các nến bị thiếu ở giữa chuỗi (batch lỗi bị bỏ qua khi backfill).
+
+Quy trình cho mỗi symbol:
+1. GapScanner tìm các slot thiếu (không nạp cả chuỗi vào pandas)
+2. Gộp gap thành ít window API nhất, chỉ fetch các window đó
+3. Ghi qua HistoricalLoad (upsert idempotent)
+Gap đã thử max_attempts lần mà CMC vẫn không có dữ liệu được ghi nhận trong
+gap_collection và bỏ qua ở các lần quét sau.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+from configs.logger_config import LoggerConfig
+from configs.mongo_config import MongoConfig
+from configs.variable_config import EXTRACT_DATA_CONFIG
+from extract.extract import Extract
+from load.gap_scanner import GapScanner
+from load.load import HistoricalLoad
+
+
+class GapRepair:
+    def __init__(self):
+        self.logger = LoggerConfig.logger_config("Gap Repair")
+        self.config = EXTRACT_DATA_CONFIG.get("gap_repair", {})
+        self.max_attempts = int(self.config.get("max_attempts", 3))
+        self.gap_collection_name = EXTRACT_DATA_CONFIG.get(
+            "gap_collection", "cmc_gap_repairs"
+        )
+        self.database = EXTRACT_DATA_CONFIG.get("database", "cmc_db")
+        self.mongo_config = MongoConfig()
+        self.scanner = GapScanner()
+        self.extract = Extract()
+        self.loader = HistoricalLoad()
+
+    @property
+    def gap_collection(self):
+        return (
+            self.mongo_config.get_client()
+            .get_database(self.database)
+            .get_collection(self.gap_collection_name)
+        )
+
+    def _unfillable(self, symbol: str) -> set:
+        """Slot đầu của các gap đã thử đủ max_attempts lần."""
+        return {
+            doc["start"]
+            for doc in self.gap_collection.find(
+                {"symbol": symbol.upper(), "attempts": {"$gte": self.max_attempts}},
+                projection={"_id": 0, "start": 1},
+            )
+        }
+
+    def _record_attempt(self, symbol: str, gaps, fetched):
+        """Gap không nhận được nến nào bị tính thêm 1 lần thử, gap đã bù thì xóa bản ghi."""
+        now = datetime.utcnow()
+        for first, last, missing in gaps:
+            if any(first <= value <= last for value in fetched):
+                self.gap_collection.delete_one(
+                    {"symbol": symbol.upper(), "start": first}
+                )
+                continue
+            self.gap_collection.update_one(
+                {"symbol": symbol.upper(), "start": first},
+                {
+                    "$set": {"end": last, "missing": missing, "last_attempt": now},
+                    "$inc": {"attempts": 1},
+                },
+                upsert=True,
+            )
+
+    def run(
+        self,
+        symbols: Optional[List[str]] = None,
+        lookback_days: Optional[float] = None,
+        dry_run: bool = False,
+    ) -> Dict[str, int]:
+        """Quét và bù gap cho các symbol.
+
+        Args:
+            symbols: Danh sách symbol (mặc định: EXTRACT_DATA_CONFIG["symbols"])
+            lookback_days: Chỉ quét N ngày gần nhất (None = toàn bộ lịch sử)
+            dry_run: Chỉ quét và lập kế hoạch, không gọi API
+
+        Returns:
+            Dict {gaps, missing, skipped, windows, fetched, inserted, errors}
+        """
+        symbols = [s.lower() for s in (symbols or self.extract.symbols)]
+        start = (
+            datetime.utcnow() - timedelta(days=lookback_days) if lookback_days else None
+        )
+        stats = {
+            "gaps": 0,
+            "missing": 0,
+            "skipped": 0,
+            "windows": 0,
+            "fetched": 0,
+            "inserted": 0,
+            "errors": 0,
+        }
+
+        plans = {}
+        for symbol in symbols:
+            try:
+                gaps = self.scanner.scan(symbol, start=start)
+                unfillable = self._unfillable(symbol) if gaps else set()
+            except Exception as e:
+                self.logger.error(f"[{symbol.upper()}] Lỗi khi quét gap: {str(e)}")
+                stats["errors"] += 1
+                continue
+
+            pending = [gap for gap in gaps if gap[0] not in unfillable]
+            stats["gaps"] += len(pending)
+            stats["missing"] += sum(gap[2] for gap in pending)
+            stats["skipped"] += len(gaps) - len(pending)
+            if not pending:
+                continue
+
+            windows = self.scanner.plan_windows(pending)
+            stats["windows"] += len(windows)
+            plans[symbol] = (pending, windows)
+            self.logger.info(
+                f"[{symbol.upper()}] {len(pending)} gap ({sum(g[2] for g in pending)} nến thiếu)"
+                f" → {len(windows)} window API"
+            )
+
+        if dry_run or not plans:
+            self.logger.info(f"Kết quả quét gap: {stats}")
+            return stats
+
+        with ThreadPoolExecutor(
+            max_workers=self.extract.backfill_workers, thread_name_prefix="gap-repair"
+        ) as pool:
+            futures = {}
+            for symbol, (_, windows) in plans.items():
+                cmc_id = self.extract.cmc_symbol_ids.get(symbol)
+                if not cmc_id:
+                    self.logger.error(f"Không tìm thấy CMC ID cho symbol: {symbol}")
+                    continue
+                for window in windows:
+                    futures[pool.submit(self._fetch_window, cmc_id, *window)] = symbol
+
+            frames: Dict[str, List] = {}
+            failed = set()
+            for future in as_completed(futures):
+                symbol = futures[future]
+                try:
+                    records = future.result()
+                except Exception as e:
+                    self.logger.error(f"[{symbol.upper()}] Lỗi khi fetch gap: {str(e)}")
+                    stats["errors"] += 1
+                    failed.add(symbol)
+                    continue
+                stats["fetched"] += len(records)
+                frames.setdefault(symbol, []).extend(records)
+
+        for symbol, (pending, _) in plans.items():
+            records = frames.get(symbol, [])
+            fetched = []
+            if records:
+                df = self.extract._convert_to_dataframe(records, symbol)
+                if not df.empty:
+                    load_stats = self.loader._load_dataframe(df, symbol)
+                    stats["inserted"] += load_stats.get("inserted", 0)
+                    fetched = list(df["datetime"].dt.to_pydatetime())
+            if symbol not in failed:
+                # Lỗi mạng/API không tính là CMC thiếu dữ liệu
+                self._record_attempt(symbol, pending, fetched)
+
+        self.logger.info(f"Hoàn thành bù gap: {stats}")
+        return stats
+
+    def _fetch_window(self, cmc_id: int, time_start: datetime, time_end: datetime):
+        """Fetch một window (naive UTC) với số lần thử lại như backfill."""
+        # Nến lưu theo UTC; gắn tz để Extract._fetch_batch đổi sang timestamp đúng
+        time_start = time_start.replace(tzinfo=timezone.utc)
+        time_end = time_end.replace(tzinfo=timezone.utc)
+        for attempt in range(self.extract.window_retries + 1):
+            try:
+                # Không đọc response cache: bản đã cache chính là bản đang thiếu nến
+                return self.extract._fetch_batch(
+                    cmc_id, time_start, time_end, use_cache=False
+                )
+            except Exception as e:
+                if attempt >= self.extract.window_retries:
+                    raise
+                self.logger.warning(
+                    f"Fetch gap {time_start} → {time_end} lỗi (lần {attempt + 1}): {str(e)}"
+                )
+        return []
+
+    async def run_forever(
+        self,
+        stop_event: Optional[asyncio.Event] = None,
+        symbols_provider: Optional[Callable[[], Optional[List[str]]]] = None,
+    ):
+        """Task nền: định kỳ quét lookback_days gần nhất và bù gap.
+
+        Args:
+            symbols_provider: Trả về các symbol cần quét mỗi lượt (None = tất cả),
+                vd: symbol mà instance realtime đang phụ trách
+        """
+        interval = float(self.config.get("interval_seconds", 6 * 3600))
+        lookback_days = self.config.get("lookback_days", 7)
+        self.logger.info(
+            f"Bật bù gap định kỳ mỗi {interval / 3600:.1f} giờ (lookback {lookback_days} ngày)"
+        )
+        while stop_event is None or not stop_event.is_set():
+            try:
+                symbols = symbols_provider() if symbols_provider else None
+                if symbols is None or symbols:
+                    await asyncio.to_thread(self.run, symbols, lookback_days)
+            except Exception as e:
+                self.logger.error(f"Lỗi trong task bù gap: {str(e)}")
+            try:
+                if stop_event is None:
+                    await asyncio.sleep(interval)
+                else:
+                    await asyncio.wait_for(stop_event.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+__all__ = ["GapRepair"]
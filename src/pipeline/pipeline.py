@@ -1,30 +1,205 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from configs.logger_config import LoggerConfig
+from configs.variable_config import EXTRACT_DATA_CONFIG
 from extract.extract import Extract as HistoricalExtract
 from load.load import HistoricalLoad
+from util.interval_util import IntervalUtil
+
+# Đánh dấu kết thúc cho writer thread
+_STOP = object()
 
 
 class HistoricalPipeline:
-    def __init__(self):
-        self.historical_extract = HistoricalExtract()
-        self.historical_load = HistoricalLoad()
+    def __init__(
+        self,
+        inventory: Optional[Dict[str, Dict]] = None,
+        interval: Optional[str] = None,
+    ):
+        self.logger = LoggerConfig.logger_config("Historical Pipeline")
+        self.interval = interval or IntervalUtil.base_interval()
+        self.historical_extract = HistoricalExtract(self.interval)
+        self.historical_load = HistoricalLoad(self.interval)
+        # Checkpoint dùng chung với Extract để resume sau crash
+        self.checkpoint = self.historical_extract.checkpoint
+        if inventory is not None:
+            # Inventory lúc khởi động đã cho biết symbol nào có dữ liệu
+            self.checkpoint.seed_inventory(inventory, self.historical_extract.symbols)
+
+        stream_config = EXTRACT_DATA_CONFIG.get("stream", {})
+        # Số DataFrame tối đa nằm chờ ghi giữa stage fetch và stage load
+        self.queue_size = int(stream_config.get("queue_size", 8))
+        # Số thread ghi MongoDB
+        self.load_workers = max(1, int(stream_config.get("load_workers", 2)))
+        # Gộp các window nhỏ tới khi đủ số bản ghi này rồi mới đẩy sang stage load
+        self.flush_rows = int(
+            stream_config.get(
+                "flush_rows", EXTRACT_DATA_CONFIG.get("batch_size_extract", 1000)
+            )
+        )
+
+    @classmethod
+    def run_all_intervals(cls, inventory: Optional[Dict[str, Dict]] = None):
+        """Backfill lần lượt mọi interval cần gọi API (interval derive được tính khi load).
+
+        inventory (của interval gốc) chỉ dùng cho pipeline interval gốc.
+        """
+        for interval in IntervalUtil.fetch_plan():
+            pipeline = cls(
+                inventory=(
+                    inventory if interval == IntervalUtil.base_interval() else None
+                ),
+                interval=interval,
+            )
+            pipeline.logger.info(f"BACKFILL INTERVAL {interval}")
+            pipeline.run()
 
     def run(self):
-        """Chạy pipeline với streaming - extract và load theo batch để tránh tràn RAM"""
-        # Extract và load theo từng symbol để tránh tràn RAM
-        symbols = self.historical_extract.symbols
-
-        for symbol in symbols:
-            print(f"\n{'='*60}")
-            print(f"Xử lý symbol: {symbol.upper()}")
-            print(f"{'='*60}")
-
-            # Extract từng symbol
-            df = self.historical_extract.extract_symbol(symbol.lower())
-
-            # Load ngay sau khi extract xong symbol này
-            if not df.empty:
-                self.historical_load._load_dataframe(df, symbol)
-            else:
-                print(f"Không có dữ liệu cho {symbol.upper()}")
+        """Chạy pipeline backfill dạng stream: fetch → queue giới hạn → load.
+
+        - Các symbol được fetch đồng thời (tối đa max_workers symbol), mọi window của
+          mọi symbol dùng chung một pool backfill_workers thread
+        - Mỗi window được chuẩn hóa rồi đẩy vào queue có kích thước cố định; các
+          writer thread lấy ra và ghi MongoDB ngay
+        - Sau khi ghi xong, checkpoint của symbol lùi theo phần liên tục đã ghi;
+          chạy lại sau crash chỉ fetch phần còn thiếu
+        - Queue đầy thì producer bị chặn và ngừng submit window mới (backpressure),
+          nên RAM tối đa ~ queue_size * flush_rows bản ghi, không phụ thuộc độ dài
+          lịch sử hay số symbol
+        """
+        symbols = [symbol.lower() for symbol in self.historical_extract.symbols]
+        if not symbols:
+            return
+        symbol_workers = max(1, min(self.historical_extract.max_workers, len(symbols)))
+
+        self.logger.info(
+            f"Backfill {len(symbols)} symbols ({symbol_workers} symbol song song, "
+            f"{self.historical_extract.backfill_workers} window đồng thời, "
+            f"queue={self.queue_size}, writers={self.load_workers})"
+        )
+
+        load_queue: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        writers = [
+            threading.Thread(
+                target=self._writer,
+                args=(load_queue,),
+                name=f"backfill-writer-{i}",
+                daemon=True,
+            )
+            for i in range(self.load_workers)
+        ]
+        for writer in writers:
+            writer.start()
+
+        finished = []
+        try:
+            with ThreadPoolExecutor(
+                max_workers=self.historical_extract.backfill_workers,
+                thread_name_prefix="backfill-window",
+            ) as window_pool, ThreadPoolExecutor(
+                max_workers=symbol_workers, thread_name_prefix="backfill-symbol"
+            ) as symbol_pool:
+                future_to_symbol = {
+                    symbol_pool.submit(
+                        self._produce_symbol, symbol, window_pool, load_queue
+                    ): symbol
+                    for symbol in symbols
+                }
+                for future in as_completed(future_to_symbol):
+                    symbol = future_to_symbol[future]
+                    try:
+                        total, failed = future.result()
+                        if not failed:
+                            finished.append(symbol)
+                        else:
+                            self.logger.warning(
+                                f"{symbol.upper()}: {failed} window lỗi, "
+                                f"checkpoint dừng trước window lỗi đầu tiên"
+                            )
+                        if total:
+                            self.logger.info(
+                                f"✓ Đã fetch xong {symbol.upper()}: {total} bản ghi"
+                            )
+                        else:
+                            self.logger.warning(
+                                f"Không có dữ liệu cho {symbol.upper()}"
+                            )
+                    except Exception as e:
+                        self.logger.error(
+                            f"✗ Lỗi khi backfill {symbol.upper()}: {str(e)}"
+                        )
+        finally:
+            for _ in writers:
+                load_queue.put(_STOP)
+            for writer in writers:
+                writer.join()
+
+        # Symbol đã lùi tới điểm niêm yết và mọi window đã ghi xong → hoàn thành
+        for symbol in finished:
+            if self.checkpoint.is_caught_up(symbol):
+                self.checkpoint.mark_completed(symbol)
+
+    def _produce_symbol(
+        self, symbol: str, window_pool: ThreadPoolExecutor, load_queue: "queue.Queue"
+    ) -> Tuple[int, int]:
+        """Stream các window của một symbol vào queue, gộp tới flush_rows bản ghi.
+
+        Returns:
+            (tổng số bản ghi, số window lỗi)
+        """
+        skip, time_end = self.checkpoint.resume_point(symbol)
+        if skip:
+            return 0, 0
+        self.checkpoint.start(symbol, time_end)
+
+        buffer, windows = [], []
+        buffered_rows = 0
+        total = 0
+        failed = 0
+
+        for window, df in self.historical_extract.iter_backfill(
+            symbol, executor=window_pool, time_end=time_end
+        ):
+            if df is None:
+                # Window lỗi: không đánh dấu xong, checkpoint sẽ dừng trước nó
+                failed += 1
+                continue
+            if df.empty:
+                self.checkpoint.mark_done(symbol, [window])
+                continue
+            buffer.append(df)
+            windows.append(window)
+            buffered_rows += len(df)
+            total += len(df)
+            if buffered_rows >= self.flush_rows:
+                # put() chặn khi queue đầy → backpressure lên stage fetch
+                load_queue.put((symbol, pd.concat(buffer, ignore_index=True), windows))
+                buffer, windows, buffered_rows = [], [], 0
+
+        if buffer:
+            load_queue.put((symbol, pd.concat(buffer, ignore_index=True), windows))
+        return total, failed
+
+    def _writer(self, load_queue: "queue.Queue"):
+        """Lấy DataFrame từ queue, ghi MongoDB rồi cập nhật checkpoint, tới khi gặp _STOP."""
+        while True:
+            item = load_queue.get()
+            try:
+                if item is _STOP:
+                    return
+                symbol, df, windows = item
+                stats = self.historical_load._load_dataframe(df, symbol)
+                if not stats.get("errors"):
+                    self.checkpoint.mark_done(symbol, windows)
+            except Exception as e:
+                self.logger.error(f"Lỗi khi ghi dữ liệu backfill: {str(e)}")
+            finally:
+                load_queue.task_done()
 
 
 if __name__ == "__main__":
@@ -1,37 +1,80 @@
 """
 Realtime Pipeline - Quản lý việc extract và load dữ liệu realtime liên tục.
 
-Chạy liên tục mỗi 1 phút, không có sleep phức tạp.
+Chạy liên tục; CandleScheduler quyết định khi nào poll và poll symbol nào.
+Mỗi interval cần gọi API có một luồng riêng (extract + load + scheduler).
+Khi bật realtime_shards, nhiều instance chạy song song chia nhau các symbol
+(ShardCoordinator), mỗi symbol chỉ được 1 instance poll.
 """
 
 import asyncio
+import logging
+import time
 from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 
 from configs.logger_config import LoggerConfig
+from configs.variable_config import EXTRACT_DATA_CONFIG
 from extract.realtime_extract import RealtimeExtract
 from load.realtime_load import RealtimeLoad
+from pipeline.candle_scheduler import CandleScheduler
+from pipeline.shard_coordinator import ShardCoordinator
+from util.interval_util import IntervalUtil
+from util.metrics import Metrics
 
 
 class RealtimePipeline:
-    """Pipeline để chạy realtime extract + load liên tục mỗi 1 phút."""
+    """Pipeline để chạy realtime extract + load liên tục theo mốc đóng nến."""
 
     def __init__(self):
-        self.extractor = RealtimeExtract()
-        self.loader = RealtimeLoad()
         self.logger = LoggerConfig.logger_config("Realtime Pipeline")
         self.is_running = False
+        # interval -> (extractor, loader, scheduler); interval derive không cần luồng
+        # riêng vì được tính lại khi load nến gốc
+        self.streams: Dict[
+            str, Tuple[RealtimeExtract, RealtimeLoad, CandleScheduler]
+        ] = {}
+        for interval in IntervalUtil.fetch_plan() or [IntervalUtil.base_interval()]:
+            extractor = RealtimeExtract(interval)
+            # Lịch poll theo mốc đóng nến thay cho sleep cố định 60 giây
+            scheduler = CandleScheduler(extractor.symbols, interval=interval)
+            self.streams[interval] = (extractor, RealtimeLoad(interval), scheduler)
 
-    async def run_once(self):
-        """Chạy pipeline 1 lần (extract + load). Không raise exception để crash."""
-        self.logger.info(f"\nVÒNG LẶP - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        base = self.streams.get(IntervalUtil.base_interval()) or next(
+            iter(self.streams.values())
+        )
+        self.extractor, self.loader, self.scheduler = base
+
+        # Chia symbol giữa các instance (tắt: instance này phụ trách tất cả)
+        self.shards = ShardCoordinator()
+        self.owned: Dict[str, set] = {
+            interval: set(extractor.symbols)
+            for interval, (extractor, _, _) in self.streams.items()
+        }
+
+    @Metrics.timed("cycle", source="realtime")
+    async def run_once(
+        self, symbols: Optional[List[str]] = None, interval: Optional[str] = None
+    ):
+        """Chạy pipeline 1 lần (extract + load). Không raise exception để crash.
+
+        Args:
+            symbols: Chỉ chạy các symbol này (mặc định: tất cả)
+            interval: Luồng interval cần chạy (mặc định: interval gốc)
+        """
+        self.logger.debug("VÒNG LẶP - %s", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        extractor, loader, scheduler = self.streams.get(
+            interval, (self.extractor, self.loader, self.scheduler)
+        )
+        started = time.perf_counter()
 
         try:
             # Extract dữ liệu (sẽ tự động bù khoảng trống)
-            data_map = await self.extractor.extract()
+            data_map = await extractor.extract(symbols)
 
             # Load vào MongoDB
             try:
-                self.loader.realtime_load(data_map=data_map)
+                load_results = loader.realtime_load(data_map=data_map)
             except Exception as e:
                 self.logger.error(f"Lỗi khi load dữ liệu: {str(e)}")
                 # Không raise, tiếp tục chạy vòng lặp tiếp theo
@@ -39,7 +82,14 @@ class RealtimePipeline:
 
             # Thống kê
             total_records = sum(len(df) for df in data_map.values() if not df.empty)
-            self.logger.info(f"HOÀN THÀNH - Tổng cộng: {total_records} bản ghi mới")
+            elapsed = time.perf_counter() - started
+            self._log_cycle(extractor, load_results, elapsed)
+            Metrics().set(
+                "cmc_cycle_records_per_second",
+                total_records / elapsed if elapsed > 0 else 0,
+                interval=extractor.interval,
+            )
+            self._update_lag(extractor.interval, scheduler)
 
             return True
 
@@ -49,29 +99,64 @@ class RealtimePipeline:
             return False
 
     async def run(self):
-        """Chạy pipeline realtime liên tục mỗi 1 phút."""
+        """Chạy pipeline realtime liên tục theo mốc đóng nến."""
         self.is_running = True
-        self.logger.info("\nREALTIME PIPELINE - CHẠY LIÊN TỤC MỖI 1 PHÚT")
+        self.logger.info("\nREALTIME PIPELINE - CHẠY LIÊN TỤC THEO MỐC ĐÓNG NẾN")
         self.logger.info("Nhấn Ctrl+C để dừng\n")
 
         run_count = 0
+        gap_task = self._start_gap_repair()
 
         try:
             while self.is_running:
                 run_count += 1
 
-                # Chạy pipeline, không để lỗi crash vòng lặp
-                try:
-                    success = await self.run_once()
-                    if not success:
-                        self.logger.warning("Vòng lặp gặp lỗi, sẽ thử lại sau 60 giây")
-                except Exception as e:
-                    self.logger.error(f"Lỗi không mong đợi trong run_once: {str(e)}")
-                    # Không raise, tiếp tục vòng lặp
+                if self.shards.enabled and (
+                    self.shards.heartbeat_due() or not self.shards.has_lease()
+                ):
+                    self._rebalance()
+
+                delays = []
+                late = []
+                for interval, (_, _, scheduler) in self.streams.items():
+                    # Chỉ poll các symbol (thuộc instance này) còn thiếu nến đã đóng
+                    owned = self.owned[interval]
+                    due = [s for s in scheduler.due_symbols() if s in owned]
+                    if due:
+                        # Chạy pipeline, không để lỗi crash vòng lặp
+                        try:
+                            success = await self.run_once(due, interval)
+                            if not success:
+                                self.logger.warning("Vòng lặp gặp lỗi, sẽ thử lại")
+                        except Exception as e:
+                            self.logger.error(
+                                f"Lỗi không mong đợi trong run_once: {str(e)}"
+                            )
+                            # Không raise, tiếp tục vòng lặp
 
-                # Chờ 60 giây trước khi chạy tiếp
-                self.logger.info("Chờ 60 giây...\n")
-                await asyncio.sleep(60)
+                    # Ngủ tới mốc đóng nến kế tiếp (hoặc poll lại sớm nếu nến bị trễ)
+                    stream_late = (
+                        [s for s in scheduler.due_symbols() if s in owned]
+                        if due
+                        else []
+                    )
+                    delays.append(scheduler.seconds_until_next(stream_late))
+                    late.extend(stream_late)
+
+                delay = min(delays)
+                if self.shards.enabled:
+                    # Thức dậy kịp gia hạn lease membership, và đúng lúc lease hết
+                    # hạn (heartbeat lỗi) để trả symbol cho instance khác
+                    delay = min(delay, self.shards.heartbeat_seconds)
+                    if self.shards.has_lease():
+                        delay = min(delay, self.shards.lease_remaining())
+                if late:
+                    self.logger.info(
+                        f"{len(late)} symbol chưa có nến mới, thử lại sau {delay:.0f} giây"
+                    )
+                else:
+                    self.logger.info(f"Chờ {delay:.0f} giây tới mốc đóng nến kế tiếp\n")
+                await asyncio.sleep(delay)
 
         except KeyboardInterrupt:
             self.logger.info("\n\nNhận tín hiệu dừng (Ctrl+C)")
@@ -82,6 +167,95 @@ class RealtimePipeline:
             self.logger.error(f"\nLỗi nghiêm trọng vòng lặp chính: {str(e)}")
             self.logger.info("Pipeline sẽ tiếp tục chạy vòng lặp tiếp theo...")
             # Không raise, để pipeline tiếp tục nếu có thể
+        finally:
+            if gap_task is not None:
+                gap_task.cancel()
+            self.shards.leave()
+            # Đóng connection pool HTTP async trước khi event loop kết thúc
+            for extractor, _, _ in self.streams.values():
+                await extractor.aclose()
+
+    def _start_gap_repair(self):
+        """Chạy task bù gap định kỳ song song với vòng realtime (nếu bật)."""
+        if not EXTRACT_DATA_CONFIG.get("gap_repair", {}).get("enabled", False):
+            return None
+        try:
+            from pipeline.gap_repair import GapRepair
+
+            return asyncio.create_task(
+                GapRepair().run_forever(symbols_provider=self._gap_symbols)
+            )
+        except Exception as e:
+            self.logger.error(f"Không khởi động được task bù gap: {str(e)}")
+            return None
+
+    def _rebalance(self):
+        """Heartbeat membership rồi tính lại symbol instance này phụ trách."""
+        self.shards.heartbeat()
+        for interval, (extractor, _, scheduler) in self.streams.items():
+            owned = set(self.shards.owned(extractor.symbols))
+            acquired = owned - self.owned[interval]
+            released = self.owned[interval] - owned
+            if acquired:
+                # Instance khác đã ghi các symbol này: watermark phải đọc lại từ DB
+                scheduler.watermarks.invalidate(list(acquired))
+            if acquired or released:
+                self.logger.info(
+                    f"Shard {interval}: phụ trách {len(owned)}/{len(extractor.symbols)} "
+                    f"symbol (+{sorted(acquired)} -{sorted(released)})"
+                )
+            self.owned[interval] = owned
+
+    def _log_cycle(
+        self,
+        extractor: RealtimeExtract,
+        load_results: Dict[str, Dict[str, int]],
+        elapsed: float,
+    ):
+        """1 bản ghi tổng hợp cho cả vòng (chi tiết từng symbol/request ở DEBUG)."""
+        summary = dict(extractor.last_summary, interval=extractor.interval)
+        for key in ("inserted", "updated", "unchanged", "errors"):
+            summary[f"load_{key}"] = sum(
+                stats.get(key, 0) for stats in load_results.values()
+            )
+        summary["seconds"] = round(elapsed, 3)
+
+        problems = summary.get("no_data", 0) + summary.get("errors", 0)
+        message = (
+            f"Vòng {summary['interval']}: {summary.get('symbols', 0)} symbol, "
+            f"{summary.get('records', 0)} bản ghi mới "
+            f"(inserted {summary['load_inserted']}, updated {summary['load_updated']}), "
+            f"đã cập nhật {summary.get('up_to_date', 0)}, "
+            f"không có dữ liệu {summary.get('no_data', 0)}, "
+            f"lỗi {summary.get('errors', 0) + summary['load_errors']} "
+            f"- {elapsed:.2f}s"
+        )
+        if problems:
+            message += f" - symbol lỗi: {summary.get('failed_symbols')}"
+        self.logger.log(
+            logging.WARNING if problems or summary["load_errors"] else logging.INFO,
+            message,
+            extra={"fields": {"event": "realtime_cycle", **summary}},
+        )
+
+    def _update_lag(self, interval: str, scheduler: CandleScheduler):
+        """Gauge độ trễ nến mới nhất (theo watermark) của các symbol instance phụ trách."""
+        now = datetime.utcnow()
+        for symbol in self.owned.get(interval, scheduler.symbols):
+            _, latest = scheduler.watermarks.get(symbol)
+            if latest is not None:
+                Metrics().set(
+                    "cmc_candle_lag_seconds",
+                    (now - latest).total_seconds(),
+                    symbol=symbol.upper(),
+                    interval=interval,
+                )
+
+    def _gap_symbols(self) -> Optional[List[str]]:
+        """Symbol interval gốc để bù gap: chỉ symbol thuộc instance này khi bật shard."""
+        if not self.shards.enabled:
+            return None
+        return sorted(self.owned.get(self.extractor.interval, set()))
 
     def stop(self):
         """Dừng pipeline."""
@@ -0,0 +1,149 @@
+"""
+Shard Coordinator - Chia symbol realtime giữa nhiều instance qua MongoDB.
+
+- Mỗi instance ghi 1 document {_id: owner, lease_until} vào members_collection
+  và gia hạn định kỳ (heartbeat)
+- Member còn sống = lease_until > hiện tại; mỗi symbol thuộc về member có điểm
+  rendezvous hash sha1(member:symbol) lớn nhất → các instance tự tính ra cùng
+  một phân chia, không cần khóa, và khi 1 member chết chỉ symbol của nó được
+  chia lại cho các member còn lại
+- Instance dừng bình thường xóa document của mình để chuyển symbol ngay
+- Không heartbeat được (mất MongoDB): giữ symbol tới lease_until của lần heartbeat
+  thành công cuối, hết lease thì không phụ trách symbol nào cho tới khi heartbeat
+  lại được (instance khác đã coi instance này là chết và nhận symbol)
+"""
+
+import hashlib
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from configs.logger_config import LoggerConfig
+from configs.mongo_config import MongoConfig
+from configs.variable_config import EXTRACT_DATA_CONFIG
+
+
+class ShardCoordinator:
+    def __init__(self, owner: Optional[str] = None):
+        self.logger = LoggerConfig.logger_config("Shard Coordinator")
+        self.config = EXTRACT_DATA_CONFIG.get("realtime_shards", {})
+        self.enabled = bool(self.config.get("enabled", False))
+        self.lease_seconds = float(self.config.get("lease_seconds", 90))
+        self.heartbeat_seconds = float(self.config.get("heartbeat_seconds", 30))
+        self.collection_name = self.config.get("collection", "cmc_realtime_members")
+        self.database = EXTRACT_DATA_CONFIG.get("database", "cmc_db")
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        self.mongo_config = MongoConfig()
+        self.members: List[str] = [self.owner]
+        self._last_heartbeat: Optional[datetime] = None
+        # lease_until đã ghi thành công lần cuối (lease instance này thực sự giữ)
+        self._lease_until: Optional[datetime] = None
+
+    @property
+    def collection(self):
+        return (
+            self.mongo_config.get_client()
+            .get_database(self.database)
+            .get_collection(self.collection_name)
+        )
+
+    def heartbeat_due(self, now: Optional[datetime] = None) -> bool:
+        now = now or datetime.utcnow()
+        return (
+            self._last_heartbeat is None
+            or (now - self._last_heartbeat).total_seconds() >= self.heartbeat_seconds
+        )
+
+    def heartbeat(self, now: Optional[datetime] = None) -> List[str]:
+        """Gia hạn lease của instance này và đọc danh sách member còn sống.
+
+        Lỗi MongoDB: giữ danh sách member cũ (không tự nhận thêm symbol) và lease
+        cũ không được gia hạn (xem has_lease).
+        """
+        now = now or datetime.utcnow()
+        lease_until = now + timedelta(seconds=self.lease_seconds)
+        try:
+            self.collection.update_one(
+                {"_id": self.owner},
+                {
+                    "$set": {
+                        "lease_until": lease_until,
+                        "heartbeat_at": now,
+                    },
+                    "$setOnInsert": {"joined_at": now},
+                },
+                upsert=True,
+            )
+            members = sorted(
+                doc["_id"]
+                for doc in self.collection.find(
+                    {"lease_until": {"$gt": now}}, projection={"_id": 1}
+                )
+            )
+            self._last_heartbeat = now
+            self._lease_until = lease_until
+        except Exception as e:
+            self.logger.error(f"Không heartbeat được shard membership: {str(e)}")
+            return self.members
+
+        if self.owner not in members:
+            members = sorted(members + [self.owner])
+        if members != self.members:
+            self.logger.info(f"Thành viên realtime thay đổi: {members}")
+        self.members = members
+        return members
+
+    def has_lease(self, now: Optional[datetime] = None) -> bool:
+        """Lease ghi ở lần heartbeat thành công cuối vẫn còn hạn."""
+        now = now or datetime.utcnow()
+        return self._lease_until is not None and now < self._lease_until
+
+    def lease_remaining(self, now: Optional[datetime] = None) -> float:
+        """Số giây lease hiện tại còn hiệu lực (0 nếu đã hết / chưa có)."""
+        if self._lease_until is None:
+            return 0.0
+        now = now or datetime.utcnow()
+        return max(0.0, (self._lease_until - now).total_seconds())
+
+    @staticmethod
+    def _score(member: str, symbol: str) -> int:
+        digest = hashlib.sha1(f"{member}:{symbol.lower()}".encode()).digest()
+        return int.from_bytes(digest[:8], "big")
+
+    def assign(
+        self, symbols: Iterable[str], members: Optional[List[str]] = None
+    ) -> Dict[str, str]:
+        """symbol -> member sở hữu (rendezvous hashing)."""
+        members = members or self.members
+        return {
+            symbol: max(members, key=lambda member: self._score(member, symbol))
+            for symbol in symbols
+        }
+
+    def owned(
+        self, symbols: Iterable[str], now: Optional[datetime] = None
+    ) -> List[str]:
+        """Các symbol instance này phụ trách (tất cả nếu không bật shard).
+
+        Lease đã hết (heartbeat lỗi quá lâu): không phụ trách symbol nào.
+        """
+        symbols = list(symbols)
+        if not self.enabled:
+            return symbols
+        if not self.has_lease(now):
+            return []
+        assignment = self.assign(symbols)
+        return [symbol for symbol in symbols if assignment[symbol] == self.owner]
+
+    def leave(self):
+        """Rời nhóm để symbol được chia lại ngay (không chờ lease hết hạn)."""
+        if not self.enabled:
+            return
+        try:
+            self.collection.delete_one({"_id": self.owner})
+        except Exception as e:
+            self.logger.warning(f"Không xóa được membership: {str(e)}")
+
+
+__all__ = ["ShardCoordinator"]
@@ -0,0 +1,69 @@
+import pandas as pd
+
+from util.interval_util import IntervalUtil
+from util.quote_normalizer import QuoteNormalizer
+
+
+class CandleResampler:
+    """Gộp nến interval nhỏ thành nến interval lớn (OHLCV) bằng pandas.
+
+    Nến được gán vào nến lớn theo thời điểm đóng (datetime làm tròn lên theo
+    interval lớn, căn theo epoch UTC): open đầu tiên, high lớn nhất, low nhỏ nhất,
+    close cuối cùng, volume cộng dồn, market_cap / circulating_supply lấy giá trị cuối.
+    Sử dụng: CandleResampler.resample(df_15m, "1h", "15m")
+    """
+
+    @staticmethod
+    def resample(
+        df: pd.DataFrame,
+        interval: str,
+        base_interval: str,
+        complete_only: bool = True,
+    ) -> pd.DataFrame:
+        """Args:
+            df: Nến interval gốc của 1 symbol (cột datetime64)
+            interval: Interval đích (bội số của base_interval)
+            base_interval: Interval của df
+            complete_only: Chỉ giữ nến lớn có đủ số nến con
+
+        Returns:
+            DataFrame cùng cột với QuoteNormalizer.COLUMNS
+        """
+        if df is None or df.empty:
+            return pd.DataFrame()
+
+        step = IntervalUtil.to_seconds(interval)
+        expected = step // IntervalUtil.to_seconds(base_interval)
+
+        df = df.sort_values("datetime", kind="stable")
+        df = df.assign(_label=df["datetime"].dt.ceil(f"{step}s"))
+        groups = df.groupby("_label", sort=True)
+
+        result = groups.agg(
+            symbol=("symbol", "first"),
+            time_open=("time_open", "first"),
+            time_close=("time_close", "last"),
+            open=("open", "first"),
+            high=("high", "max"),
+            low=("low", "min"),
+            close=("close", "last"),
+            volume=("volume", "sum"),
+            market_cap=("market_cap", "last"),
+            circulating_supply=("circulating_supply", "last"),
+            count=("datetime", "size"),
+        )
+
+        # Thời điểm đạt high/low của nến lớn = của nến con đạt high/low đó
+        is_high = df["high"].eq(groups["high"].transform("max"))
+        is_low = df["low"].eq(groups["low"].transform("min"))
+        result["time_high"] = df[is_high].groupby("_label")["time_high"].first()
+        result["time_low"] = df[is_low].groupby("_label")["time_low"].first()
+
+        if complete_only:
+            result = result[result["count"] >= expected]
+
+        result = result.rename_axis("datetime").reset_index()
+        return result[QuoteNormalizer.COLUMNS].reset_index(drop=True)
+
+
+__all__ = ["CandleResampler"]
@@ -0,0 +1,80 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from configs.variable_config import EXTRACT_DATA_CONFIG
+
+
+class DatetimeCodec:
+    """Chuyển đổi các cột thời gian của nến giữa pandas và dạng lưu trong MongoDB.
+
+    Pipeline extract/load làm việc với datetime64 từ đầu đến cuối; chỉ khi ghi
+    mới chuyển sang dạng lưu theo storage.datetime_mode:
+    - "string":   'YYYY-MM-DD HH:MM:SS' (dạng cũ)
+    - "datetime": BSON Date (UTC, độ chính xác mili giây)
+    - "epoch":    số nguyên giây Unix (UTC)
+    Sử dụng: DatetimeCodec().to_records(df)
+    """
+
+    TIME_COLUMNS = ["datetime", "time_open", "time_close", "time_high", "time_low"]
+    MODES = ("string", "datetime", "epoch")
+    SQL_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+    def __init__(self, mode: Optional[str] = None):
+        storage_config = EXTRACT_DATA_CONFIG.get("storage", {})
+        self.mode = mode or storage_config.get("datetime_mode", "string")
+        if self.mode not in self.MODES:
+            raise ValueError(
+                f"datetime_mode không hợp lệ: {self.mode} (hỗ trợ: {', '.join(self.MODES)})"
+            )
+
+    def encode_series(self, series: pd.Series) -> pd.Series:
+        """Chuyển cột datetime64 sang dạng lưu trữ (NaT -> None)."""
+        series = pd.to_datetime(series, errors="coerce")
+        if self.mode == "string":
+            encoded = series.dt.strftime(self.SQL_FORMAT).astype("object")
+        elif self.mode == "epoch":
+            encoded = (series.astype("datetime64[s]").astype("int64")).astype("object")
+        else:
+            # list(): pandas mới trả Series từ to_pydatetime, truyền thẳng sẽ bị
+            # căn theo index (index không liên tục sau khi lọc → NaN)
+            encoded = pd.Series(
+                list(series.dt.to_pydatetime()), index=series.index, dtype="object"
+            )
+        return encoded.where(series.notna(), None)
+
+    def to_records(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
+        """DataFrame nến → list document sẵn sàng ghi MongoDB."""
+        df = df.copy()
+        for column in self.TIME_COLUMNS:
+            if column in df.columns:
+                df[column] = self.encode_series(df[column])
+        return df.to_dict("records")
+
+    def encode(self, value: Optional[datetime]):
+        """Chuyển một datetime (naive UTC) sang dạng lưu trữ, dùng cho điều kiện truy vấn."""
+        if value is None:
+            return None
+        if self.mode == "string":
+            return value.strftime(self.SQL_FORMAT)
+        if self.mode == "epoch":
+            return int(pd.Timestamp(value).timestamp())
+        return pd.Timestamp(value).to_pydatetime()
+
+    @classmethod
+    def decode(cls, value) -> Optional[datetime]:
+        """Đọc giá trị thời gian đã lưu (chuỗi, Date hoặc epoch) về datetime naive UTC."""
+        if value is None:
+            return None
+        if isinstance(value, datetime):
+            return value.replace(tzinfo=None) if value.tzinfo else value
+        if isinstance(value, (int, float)):
+            return pd.Timestamp(int(value), unit="s").to_pydatetime()
+        try:
+            return datetime.strptime(str(value), cls.SQL_FORMAT)
+        except ValueError:
+            return pd.Timestamp(str(value)).to_pydatetime()
+
+
+__all__ = ["DatetimeCodec"]
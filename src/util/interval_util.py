@@ -0,0 +1,150 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from configs.variable_config import EXTRACT_DATA_CONFIG
+
+
+class IntervalUtil:
+    """Tiện ích cho interval nến dạng chuỗi của CMC ('1m', '5m', '15m', '1h', '4h', '1d').
+
+    - Đổi interval sang số giây, tính độ dài window theo giới hạn bản ghi của API
+    - Đọc cấu hình interval theo symbol: interval nào gọi API, interval nào
+      được tính lại (derive) từ interval gốc
+    - Mỗi interval ghi vào collection riêng (interval gốc giữ tên collection cũ)
+    Sử dụng: IntervalUtil.to_seconds("15m") → 900
+    """
+
+    UNITS: Dict[str, int] = {"m": 60, "h": 3600, "d": 86400}
+
+    @classmethod
+    def to_seconds(cls, interval: str) -> int:
+        """'15m' → 900, '1h' → 3600, '1d' → 86400."""
+        value = str(interval).strip().lower()
+        unit = value[-1:]
+        if unit not in cls.UNITS or not value[:-1].isdigit():
+            raise ValueError(f"Interval không hợp lệ: {interval}")
+        return int(value[:-1]) * cls.UNITS[unit]
+
+    @staticmethod
+    def utc_timestamp(value: datetime) -> int:
+        """Unix timestamp của datetime naive UTC (cách nến được lưu trong DB)."""
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+
+    @staticmethod
+    def base_interval() -> str:
+        """Interval gốc (api.interval) - interval được lưu trong historical_collection."""
+        return EXTRACT_DATA_CONFIG.get("api", {}).get("interval", "15m")
+
+    @staticmethod
+    def max_records() -> int:
+        return int(
+            EXTRACT_DATA_CONFIG.get("api", {}).get("max_records_per_request", 399)
+        )
+
+    @classmethod
+    def batch_seconds(cls, interval: str, max_records: Optional[int] = None) -> int:
+        """Độ dài window cho 1 request: (max_records - 1) nến, chừa 1 bản ghi ở biên.
+
+        15m → 398 * 900 giây ≈ 4.1 ngày, 1h → 16.6 ngày, 1d → 398 ngày.
+        """
+        max_records = max_records or cls.max_records()
+        return max(1, max_records - 1) * cls.to_seconds(interval)
+
+    @staticmethod
+    def backfill_window(
+        time_end: datetime, batch_seconds: int, index: int
+    ) -> Tuple[datetime, datetime]:
+        """Window thứ index (0 = mới nhất) khi backfill lùi dần từ time_end.
+
+        Window 0 chạy từ mốc lưới batch_seconds (tính từ epoch) gần nhất tới
+        time_end; các window cũ hơn nằm đúng trên lưới nên giữ nguyên mốc giữa các
+        lần chạy (khóa ResponseCache không đổi). Cả 2 mốc đều tính trên Unix
+        timestamp rồi mới đổi ra datetime: trừ timedelta trên giờ địa phương naive
+        lệch 1 giờ khi window cắt qua mốc đổi giờ DST (start window i khác end
+        window i+1 → hở / chồng 1 giờ).
+        """
+        end_ts = time_end.timestamp()
+        grid_ts = end_ts // batch_seconds * batch_seconds
+        if grid_ts == end_ts:
+            # time_end đã nằm trên lưới: không có window lẻ ở đầu
+            grid_ts, index = end_ts, index + 1
+        if index == 0:
+            return datetime.fromtimestamp(grid_ts, tz=time_end.tzinfo), time_end
+        window_end_ts = grid_ts - batch_seconds * (index - 1)
+        return (
+            datetime.fromtimestamp(window_end_ts - batch_seconds, tz=time_end.tzinfo),
+            datetime.fromtimestamp(window_end_ts, tz=time_end.tzinfo),
+        )
+
+    @classmethod
+    def collection_name(cls, base_name: str, interval: Optional[str] = None) -> str:
+        """Collection của interval: interval gốc dùng base_name, còn lại thêm hậu tố."""
+        interval = interval or cls.base_interval()
+        if interval == cls.base_interval():
+            return base_name
+        return f"{base_name}_{interval}"
+
+    @classmethod
+    def intervals_for(cls, symbol: str) -> List[str]:
+        """Các interval cần lưu cho symbol, sắp xếp từ nhỏ đến lớn."""
+        configured = (
+            EXTRACT_DATA_CONFIG.get("symbol_intervals", {}).get(symbol.lower())
+            or EXTRACT_DATA_CONFIG.get("intervals")
+            or [cls.base_interval()]
+        )
+        return sorted(set(configured), key=cls.to_seconds)
+
+    @classmethod
+    def is_derived(cls, interval: str) -> bool:
+        """Interval được tính từ interval gốc thay vì gọi API.
+
+        Chỉ derive được khi interval là bội số của interval gốc.
+        """
+        base = cls.base_interval()
+        if interval == base or interval not in EXTRACT_DATA_CONFIG.get(
+            "derived_intervals", []
+        ):
+            return False
+        return cls.to_seconds(interval) % cls.to_seconds(base) == 0
+
+    @staticmethod
+    def tracked_symbols() -> List[str]:
+        """Các symbol đang theo dõi (config hoặc top N theo SymbolRegistry)."""
+        from extract.symbol_registry import SymbolRegistry
+
+        return SymbolRegistry().symbols()
+
+    @classmethod
+    def fetch_plan(cls, symbols: Optional[List[str]] = None) -> Dict[str, List[str]]:
+        """interval → các symbol cần gọi API cho interval đó.
+
+        Symbol có interval derive luôn cần interval gốc.
+        """
+        symbols = symbols or cls.tracked_symbols()
+        plan: Dict[str, List[str]] = {}
+        for symbol in symbols:
+            for interval in cls.intervals_for(symbol):
+                if cls.is_derived(interval):
+                    interval = cls.base_interval()
+                plan.setdefault(interval, [])
+                if symbol.lower() not in plan[interval]:
+                    plan[interval].append(symbol.lower())
+        return dict(sorted(plan.items(), key=lambda item: cls.to_seconds(item[0])))
+
+    @classmethod
+    def derived_for(cls, symbol: str) -> List[str]:
+        """Các interval của symbol được derive từ interval gốc."""
+        return [i for i in cls.intervals_for(symbol) if cls.is_derived(i)]
+
+    @classmethod
+    def all_intervals(cls, symbols: Optional[List[str]] = None) -> List[str]:
+        symbols = symbols or cls.tracked_symbols()
+        intervals = {cls.base_interval()}
+        for symbol in symbols:
+            intervals.update(cls.intervals_for(symbol))
+        return sorted(intervals, key=cls.to_seconds)
+
+
+__all__ = ["IntervalUtil"]
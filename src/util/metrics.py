@@ -0,0 +1,240 @@
+"""
+Metrics - Đo đạc pipeline và xuất theo định dạng text của Prometheus.
+
+- Counter / gauge / histogram có label, an toàn giữa các thread
+- Metrics.timed("fetch", source="realtime"): decorator đo thời gian một stage
+  (hàm thường hoặc async), đếm luôn số lần stage ném exception
+- Metrics().serve(host, port): HTTP server nền trả /metrics
+Sử dụng: Metrics().inc("cmc_api_requests_total", host="api.coinmarketcap.com")
+"""
+
+import asyncio
+import functools
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from configs.logger_config import LoggerConfig
+from configs.variable_config import EXTRACT_DATA_CONFIG
+
+# Giây: từ vài ms (parse) tới cả phút (backfill window bị retry)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# tên -> (kiểu, mô tả)
+DESCRIPTIONS: Dict[str, Tuple[str, str]] = {
+    "cmc_stage_duration_seconds": (
+        "histogram",
+        "Thời gian mỗi stage (fetch / parse / load / cycle)",
+    ),
+    "cmc_stage_errors_total": ("counter", "Số lần stage ném exception"),
+    "cmc_api_requests_total": ("counter", "Số request tới CMC theo host / status"),
+    "cmc_records_total": ("counter", "Số bản ghi theo stage / kết quả ghi"),
+    "cmc_cycle_records_per_second": (
+        "gauge",
+        "Số bản ghi mới / giây của vòng realtime gần nhất",
+    ),
+    "cmc_candle_lag_seconds": (
+        "gauge",
+        "Độ trễ nến mới nhất trong DB so với hiện tại, theo symbol",
+    ),
+    "cmc_response_cache_total": (
+        "counter",
+        "Tra cache response lịch sử: hit / miss / bypass / open / evicted",
+    ),
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Metrics:
+    """Singleton registry. Sử dụng: Metrics().observe(name, seconds, stage="load")"""
+
+    _instance = None
+
+    def _init_metrics(self):
+        self.logger = LoggerConfig.logger_config("Metrics")
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+        # name -> labels -> [bucket counts..., sum, count]
+        self._histograms: Dict[str, Dict[LabelKey, List[float]]] = {}
+        self.buckets = DEFAULT_BUCKETS
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(Metrics, cls).__new__(cls)
+            cls._instance._init_metrics()
+        return cls._instance
+
+    @staticmethod
+    def _key(labels: Dict[str, object]) -> LabelKey:
+        return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges.setdefault(name, {})[self._key(labels)] = float(value)
+
+    def observe(self, name: str, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            values = series.get(key)
+            if values is None:
+                values = series[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    values[i] += 1
+            values[-2] += value
+            values[-1] += 1
+
+    def record_load(self, stats: Dict[str, int], source: str):
+        """Cộng kết quả ghi MongoDB (inserted / updated / unchanged / errors)."""
+        for result in ("inserted", "updated", "unchanged", "errors"):
+            if stats.get(result):
+                self.inc(
+                    "cmc_records_total",
+                    stats[result],
+                    stage="load",
+                    source=source,
+                    result=result,
+                )
+
+    @classmethod
+    def timed(cls, stage: str, **labels):
+        """Decorator đo thời gian stage cho hàm thường hoặc coroutine."""
+
+        def decorator(func):
+            if asyncio.iscoroutinefunction(func):
+
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    started = time.perf_counter()
+                    try:
+                        return await func(*args, **kwargs)
+                    except BaseException:
+                        cls().inc("cmc_stage_errors_total", stage=stage, **labels)
+                        raise
+                    finally:
+                        cls().observe(
+                            "cmc_stage_duration_seconds",
+                            time.perf_counter() - started,
+                            stage=stage,
+                            **labels,
+                        )
+
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                except BaseException:
+                    cls().inc("cmc_stage_errors_total", stage=stage, **labels)
+                    raise
+                finally:
+                    cls().observe(
+                        "cmc_stage_duration_seconds",
+                        time.perf_counter() - started,
+                        stage=stage,
+                        **labels,
+                    )
+
+            return wrapper
+
+        return decorator
+
+    @staticmethod
+    def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(key) + ([extra] if extra else [])
+        if not pairs:
+            return ""
+        escaped = (
+            (k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+            for k, v in pairs
+        )
+        return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+    def render(self) -> str:
+        """Toàn bộ metric theo định dạng text exposition của Prometheus."""
+        lines = []
+        with self._lock:
+            tables = [
+                ("counter", self._counters),
+                ("gauge", self._gauges),
+            ]
+            for kind, table in tables:
+                for name in sorted(table):
+                    lines.append(
+                        f"# HELP {name} {DESCRIPTIONS.get(name, ('', name))[1]}"
+                    )
+                    lines.append(f"# TYPE {name} {kind}")
+                    for key, value in sorted(table[name].items()):
+                        lines.append(f"{name}{self._format_labels(key)} {value:g}")
+
+            for name in sorted(self._histograms):
+                lines.append(f"# HELP {name} {DESCRIPTIONS.get(name, ('', name))[1]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, values in sorted(self._histograms[name].items()):
+                    for bound, count in zip(self.buckets, values):
+                        le = self._format_labels(key, ("le", f"{bound:g}"))
+                        lines.append(f"{name}_bucket{le} {count:g}")
+                    le = self._format_labels(key, ("le", "+Inf"))
+                    lines.append(f"{name}_bucket{le} {values[-1]:g}")
+                    labels = self._format_labels(key)
+                    lines.append(f"{name}_sum{labels} {values[-2]:.6f}")
+                    lines.append(f"{name}_count{labels} {values[-1]:g}")
+        return "\n".join(lines) + "\n"
+
+    def serve(
+        self, host: Optional[str] = None, port: Optional[int] = None
+    ) -> Optional[ThreadingHTTPServer]:
+        """Chạy HTTP server nền trả /metrics (1 lần mỗi process)."""
+        config = EXTRACT_DATA_CONFIG.get("metrics", {})
+        if not config.get("enabled", True):
+            return None
+        if self._server is not None:
+            return self._server
+
+        host = host or config.get("host", "127.0.0.1")
+        port = int(port if port is not None else config.get("port", 9108))
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer((host, port), Handler)
+        except OSError as e:
+            self.logger.error(f"Không mở được metrics endpoint {host}:{port}: {str(e)}")
+            return None
+        threading.Thread(
+            target=self._server.serve_forever, name="metrics-http", daemon=True
+        ).start()
+        self.logger.info(f"Metrics endpoint: http://{host}:{port}/metrics")
+        return self._server
+
+
+__all__ = ["Metrics"]
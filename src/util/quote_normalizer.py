@@ -0,0 +1,93 @@
+from typing import Dict, List
+
+import pandas as pd
+
+
+class QuoteNormalizer:
+    """Chuyển list quote từ API CMC thành DataFrame chuẩn theo dạng cột (vectorized).
+
+    Thay cho vòng lặp từng dòng: mỗi cột thời gian được parse ISO một lần cho cả cột,
+    làm tròn lên phút (ceil) giống ConvertDatetime, các trường OHLCV được lấy thẳng
+    thành cột float.
+    Sử dụng: QuoteNormalizer().to_dataframe(quotes, "eth")
+    """
+
+    # Cột thời gian: tên cột DataFrame -> key trong quote
+    TIME_FIELDS = {
+        "time_open": "timeOpen",
+        "time_close": "timeClose",
+        "time_high": "timeHigh",
+        "time_low": "timeLow",
+    }
+
+    # Cột giá: tên cột DataFrame -> key trong quote["quote"]
+    PRICE_FIELDS = {
+        "open": "open",
+        "high": "high",
+        "low": "low",
+        "close": "close",
+        "volume": "volume",
+        "market_cap": "marketCap",
+        "circulating_supply": "circulatingSupply",
+    }
+
+    COLUMNS = ["symbol", "datetime", *TIME_FIELDS.keys(), *PRICE_FIELDS.keys()]
+
+    def to_dataframe(self, records: List[Dict], symbol: str) -> pd.DataFrame:
+        """Chuyển đổi list các quote thành DataFrame đã sắp xếp và loại trùng.
+
+        Args:
+            records: List các quote từ API
+            symbol: Tên symbol
+
+        Returns:
+            DataFrame với datetime = time_close làm tròn lên phút. Các cột thời gian
+            là datetime64 (naive UTC); DatetimeCodec chuyển sang dạng lưu khi ghi DB.
+        """
+        if not records:
+            return pd.DataFrame()
+
+        records = [quote for quote in records if isinstance(quote, dict)]
+        prices = [quote.get("quote") or {} for quote in records]
+
+        columns = {}
+        for column, key in self.TIME_FIELDS.items():
+            columns[column] = self.parse_iso_column(
+                [quote.get(key) for quote in records]
+            )
+        for column, key in self.PRICE_FIELDS.items():
+            columns[column] = pd.to_numeric(
+                pd.Series([price.get(key) for price in prices], dtype="object"),
+                errors="coerce",
+            ).astype("float64")
+
+        df = pd.DataFrame(columns)
+        df["datetime"] = df["time_close"]
+
+        # Bỏ các quote không parse được thời điểm đóng nến
+        df = df[df["datetime"].notna()]
+
+        # Sắp xếp theo thời gian (tăng dần) và loại bỏ duplicate trên cột datetime64
+        df = df.sort_values("datetime", kind="stable")
+        df = df.drop_duplicates(subset=["datetime"], keep="first")
+
+        df.insert(0, "symbol", symbol.upper())
+
+        return df[self.COLUMNS].reset_index(drop=True)
+
+    @staticmethod
+    def parse_iso_column(values) -> pd.Series:
+        """Parse cả cột chuỗi ISO ('...Z', có/không mili giây) và làm tròn lên phút.
+
+        Giá trị không hợp lệ trở thành NaT.
+        """
+        parsed = pd.to_datetime(
+            pd.Series(values, dtype="object"),
+            format="ISO8601",
+            utc=True,
+            errors="coerce",
+        )
+        return parsed.dt.tz_localize(None).dt.ceil("min")
+
+
+__all__ = ["QuoteNormalizer"]
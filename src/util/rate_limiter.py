@@ -0,0 +1,150 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+from configs.variable_config import EXTRACT_DATA_CONFIG
+
+
+class RateLimiter:
+    """Token bucket dùng chung cho toàn bộ process (thread pool + asyncio).
+
+    - Nạp token với tốc độ requests_per_second, tối đa burst token
+    - acquire() cho thread, acquire_async() cho coroutine - cùng một bucket
+    - Khi API trả 429/Retry-After: chặn toàn bộ caller tới hết thời gian chờ
+      và giảm tốc độ (multiplicative decrease), sau đó tăng dần lại khi request
+      thành công (additive increase) cho tới tốc độ cấu hình
+    Sử dụng: RateLimiter().acquire()
+    """
+
+    _instance = None
+
+    def _init_config(self):
+        config = EXTRACT_DATA_CONFIG.get("api", {}).get("rate_limit", {})
+        self.base_rate = float(config.get("requests_per_second", 2.0))
+        self.burst = max(1.0, float(config.get("burst", 5)))
+        self.min_rate = float(config.get("min_requests_per_second", 0.2))
+        self.backoff_factor = float(config.get("backoff_factor", 0.5))
+        self.recovery_step = float(config.get("recovery_step", 0.05))
+        self.default_retry_after = float(config.get("default_retry_after", 30))
+
+        self._lock = threading.Lock()
+        self.rate = self.base_rate
+        self._tokens = self.burst
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+
+        # Bộ đếm
+        self._acquired = 0
+        self._waited = 0
+        self._wait_seconds = 0.0
+        self._rate_limited = 0
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(RateLimiter, cls).__new__(cls)
+            cls._instance._init_config()
+        return cls._instance
+
+    def share(self, parts: int):
+        """Chỉ dùng 1/parts tốc độ cấu hình: parts process cùng gọi API, mỗi
+        process 1 bucket, tổng không vượt requests_per_second / burst.
+        """
+        parts = max(1, int(parts))
+        config = EXTRACT_DATA_CONFIG.get("api", {}).get("rate_limit", {})
+        with self._lock:
+            self.base_rate = float(config.get("requests_per_second", 2.0)) / parts
+            self.min_rate = float(config.get("min_requests_per_second", 0.2)) / parts
+            self.rate = min(self.rate, self.base_rate)
+            self.burst = max(1.0, float(config.get("burst", 5)) / parts)
+            self._tokens = min(self._tokens, self.burst)
+
+    def _refill(self, now: float):
+        elapsed = now - self._last_refill
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._last_refill = now
+
+    def _reserve(self) -> float:
+        """Đặt trước 1 token, trả về số giây caller phải chờ trước khi gửi request.
+
+        Token có thể âm: các caller xếp hàng theo thứ tự đặt chỗ thay vì tranh nhau.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+            wait = max(wait, self._blocked_until - now)
+            self._acquired += 1
+            if wait > 0:
+                self._waited += 1
+                self._wait_seconds += wait
+            return wait
+
+    def acquire(self):
+        """Chờ (blocking) cho tới khi được phép gửi 1 request."""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Chờ (không block event loop) cho tới khi được phép gửi 1 request."""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def on_rate_limited(self, retry_after: Optional[float] = None):
+        """Gọi khi API trả 429: chặn mọi caller và giảm tốc độ."""
+        delay = retry_after if retry_after is not None else self.default_retry_after
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._blocked_until = max(self._blocked_until, now + max(0.0, delay))
+            self.rate = max(self.min_rate, self.rate * self.backoff_factor)
+            # Không cho phép burst ngay sau khi bị chặn
+            self._tokens = min(self._tokens, 0.0)
+            self._rate_limited += 1
+
+    def on_success(self):
+        """Gọi khi request thành công: tăng dần tốc độ về mức cấu hình."""
+        if self.rate >= self.base_rate:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = min(self.base_rate, self.rate + self.recovery_step)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "base_rate": self.base_rate,
+                "burst": self.burst,
+                "acquired": self._acquired,
+                "waited": self._waited,
+                "wait_seconds": round(self._wait_seconds, 3),
+                "rate_limited": self._rate_limited,
+            }
+
+    @staticmethod
+    def parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """Parse header Retry-After (số giây hoặc HTTP-date). Trả về None nếu không hợp lệ."""
+        if not value:
+            return None
+        value = str(value).strip()
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+            if retry_at.tzinfo is None:
+                retry_at = retry_at.replace(tzinfo=timezone.utc)
+            return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+        except Exception:
+            return None
+
+
+__all__ = ["RateLimiter"]
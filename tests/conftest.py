@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Giống main.py: import theo gốc project (configs) và src/ (extract, load, ...)
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT_DIR, os.path.join(ROOT_DIR, "src")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,44 @@
+"""
+BackfillQueue đẩy checkpoint theo dãy window liên tục đã ghi xong.
+"""
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+from configs.mongo_config import MongoConfig
+from load.backfill_queue import BackfillQueue
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    monkeypatch.setattr(MongoConfig(), "_client", mongomock.MongoClient())
+    queue = BackfillQueue()
+    queue.plan(["eth"])
+    return queue
+
+
+def _lease_all(queue, count):
+    items = {}
+    for _ in range(count):
+        item = queue.lease("worker-1")
+        items[item["index"]] = item
+    return items
+
+
+def test_checkpoint_follows_contiguous_finished_windows(queue):
+    items = _lease_all(queue, 3)
+    started_from = queue.checkpoint.get("eth")["oldest_loaded"]
+
+    # Window 1 xong trước window 0: chưa lùi được
+    queue.complete(items[1], 100)
+    assert queue.checkpoint.get("eth")["oldest_loaded"] == started_from
+
+    queue.complete(items[0], 10)
+    assert queue.checkpoint.get("eth")["oldest_loaded"] == items[1]["start"]
+
+    # Window 2 lỗi: dừng trước nó, lần chạy sau (historical) tiếp tục từ đó
+    queue.fail(items[2], "timeout")
+    assert queue.checkpoint.get("eth")["oldest_loaded"] == items[1]["start"]
+    queue.checkpoint._known_data["ETH"] = True
+    assert queue.checkpoint.resume_point("eth") == (False, items[1]["start"])
@@ -0,0 +1,19 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from util.datetime_codec import DatetimeCodec
+
+
+@pytest.mark.parametrize("mode", DatetimeCodec.MODES)
+def test_to_records_keeps_rows_aligned_after_filtering(mode):
+    df = pd.DataFrame(
+        {"datetime": pd.date_range("2026-01-01", periods=4, freq="15min")}
+    ).iloc[[1, 3]]
+
+    values = [
+        DatetimeCodec.decode(r["datetime"]) for r in DatetimeCodec(mode).to_records(df)
+    ]
+
+    assert values == [datetime(2026, 1, 1, 0, 15), datetime(2026, 1, 1, 0, 45)]
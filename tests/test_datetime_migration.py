@@ -0,0 +1,33 @@
+"""
+migrate-datetime chuyển collection của mọi interval, không chỉ interval gốc.
+"""
+
+from datetime import datetime
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+from configs.mongo_config import MongoConfig
+from configs.variable_config import EXTRACT_DATA_CONFIG
+from load.datetime_migration import DatetimeMigration
+from util.interval_util import IntervalUtil
+
+
+def test_migration_converts_every_interval_collection(monkeypatch):
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(MongoConfig(), "_client", client)
+    db = client.get_database(EXTRACT_DATA_CONFIG["database"])
+    base = EXTRACT_DATA_CONFIG["historical_collection"]
+    intervals = IntervalUtil.all_intervals(["eth"])
+    for interval in intervals:
+        db[IntervalUtil.collection_name(base, interval)].insert_one(
+            {"symbol": "ETH", "datetime": "2024-01-01 00:00:00"}
+        )
+
+    results = DatetimeMigration.run_all("datetime", intervals=intervals)
+
+    assert set(results) == set(intervals)
+    for interval in intervals:
+        doc = db[IntervalUtil.collection_name(base, interval)].find_one()
+        assert doc["datetime"] == datetime(2024, 1, 1)
@@ -0,0 +1,47 @@
+"""
+TTL index của symbol_registry không được xóa mapping ngay khi vừa quá hạn.
+"""
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+from configs.mongo_config import MongoConfig
+from configs.variable_config import EXTRACT_DATA_CONFIG
+from load.index_manager import IndexManager
+
+
+def _ttl_spec():
+    registry = EXTRACT_DATA_CONFIG["symbol_registry"]
+    specs = IndexManager().index_specs()[registry["collection"]]
+    return next(options for name, _, options in specs if name == "fetched_at_ttl")
+
+
+def test_registry_ttl_outlives_cache_ttl():
+    ttl_seconds = EXTRACT_DATA_CONFIG["symbol_registry"]["ttl_seconds"]
+    assert _ttl_spec()["expireAfterSeconds"] > ttl_seconds
+
+
+def test_existing_ttl_index_is_updated(monkeypatch):
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(MongoConfig(), "_client", client)
+    manager = IndexManager()
+    db = client.get_database(manager.database)
+    collection = EXTRACT_DATA_CONFIG["symbol_registry"]["collection"]
+    db[collection].create_index(
+        [("fetched_at", 1)], name="fetched_at_ttl", expireAfterSeconds=60
+    )
+
+    commands = []
+    monkeypatch.setattr(
+        type(db),
+        "command",
+        lambda self, *args, **kwargs: commands.append(args + (kwargs,)),
+    )
+    manager.ensure_indexes()
+
+    assert (
+        "collMod",
+        collection,
+        {"index": {"name": "fetched_at_ttl", **_ttl_spec()}},
+    ) in commands
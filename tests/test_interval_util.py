@@ -0,0 +1,48 @@
+"""
+Window backfill trên máy chạy giờ địa phương có DST.
+"""
+
+import os
+import time
+from datetime import datetime
+
+import pytest
+
+from util.interval_util import IntervalUtil
+
+
+@pytest.fixture
+def dst_timezone():
+    if not hasattr(time, "tzset"):
+        pytest.skip("time.tzset chỉ có trên Unix")
+    previous = os.environ.get("TZ")
+    os.environ["TZ"] = "America/New_York"
+    time.tzset()
+    yield
+    if previous is None:
+        os.environ.pop("TZ", None)
+    else:
+        os.environ["TZ"] = previous
+    time.tzset()
+
+
+@pytest.mark.parametrize(
+    "time_end",
+    [
+        datetime(2024, 3, 20, 9, 7),  # lùi qua mốc 10/03 (bắt đầu DST)
+        datetime(2024, 11, 12, 9, 7),  # lùi qua mốc 03/11 (kết thúc DST)
+    ],
+)
+def test_backfill_windows_are_contiguous_across_dst(dst_timezone, time_end):
+    batch_seconds = IntervalUtil.batch_seconds("15m", 399)
+    windows = [
+        IntervalUtil.backfill_window(time_end, batch_seconds, index)
+        for index in range(8)
+    ]
+
+    assert windows[0][1] == time_end
+    for newer, older in zip(windows, windows[1:]):
+        assert older[1] == newer[0]
+    for start, end in windows[1:]:
+        assert end.timestamp() - start.timestamp() == batch_seconds
+        assert end.timestamp() % batch_seconds == 0
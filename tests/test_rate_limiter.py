@@ -0,0 +1,28 @@
+"""
+Chia rate_limit cho nhiều process backfill-worker.
+"""
+
+import pytest
+
+from configs.variable_config import EXTRACT_DATA_CONFIG
+from util.rate_limiter import RateLimiter
+
+
+@pytest.fixture
+def limiter():
+    # Bucket riêng cho test, không đụng singleton của process
+    limiter = object.__new__(RateLimiter)
+    limiter._init_config()
+    return limiter
+
+
+def test_share_splits_configured_rate_between_processes(limiter):
+    config = EXTRACT_DATA_CONFIG["api"]["rate_limit"]
+    limiter.share(4)
+    assert limiter.base_rate * 4 == pytest.approx(config["requests_per_second"])
+    assert limiter.rate == limiter.base_rate
+    assert limiter.burst == max(1.0, config["burst"] / 4)
+
+    # Gọi lại không chia dồn
+    limiter.share(4)
+    assert limiter.base_rate * 4 == pytest.approx(config["requests_per_second"])
@@ -0,0 +1,105 @@
+"""
+RealtimeExtract.extract_symbol_async chạy trên FakeCmcApi (HTTP server cục bộ)
+và mongomock - không gọi CMC thật, không cần MongoDB.
+"""
+
+import asyncio
+import copy
+import logging
+from datetime import datetime, timedelta
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+from benchmark import bench_runner
+from benchmark.fake_cmc_api import FakeCmcApi
+from configs.mongo_config import MongoConfig
+from configs.variable_config import EXTRACT_DATA_CONFIG
+from extract.api_client import ApiClient
+from extract.response_cache import ResponseCache
+from extract.symbol_registry import SymbolRegistry
+from util.interval_util import IntervalUtil
+from util.metrics import Metrics
+from util.rate_limiter import RateLimiter
+
+
+@pytest.fixture()
+def fake_api(monkeypatch):
+    # Coin niêm yết 2 ngày trước: DB rỗng thì realtime lấy 7 ngày → 1 window có dữ liệu
+    with FakeCmcApi(listed_at=datetime.utcnow() - timedelta(days=2)) as api:
+        params = bench_runner.BenchmarkRunner(symbols=2, mongo="mock").params()
+        # Config benchmark trên bản sao; monkeypatch trả lại config gốc sau test
+        config = copy.deepcopy(EXTRACT_DATA_CONFIG)
+        symbols = bench_runner.apply_bench_config(config, params, api.url_template)
+        # Không chờ backoff khi test lỗi
+        config["api"]["async_http"] = dict(
+            config["api"].get("async_http", {}), max_retries=1
+        )
+        for key, value in config.items():
+            monkeypatch.setitem(EXTRACT_DATA_CONFIG, key, value)
+        # Singleton đọc config lúc khởi tạo: tạo mới trong test, khôi phục sau test
+        for singleton in (RateLimiter, ApiClient, ResponseCache, SymbolRegistry):
+            monkeypatch.setattr(singleton, "_instance", None)
+        logging.disable(logging.CRITICAL)
+        try:
+            monkeypatch.setattr(MongoConfig(), "_client", mongomock.MongoClient())
+            bench_runner.prepare_database(MongoConfig().get_client(), params)
+            yield api, symbols
+        finally:
+            logging.disable(logging.NOTSET)
+
+
+def _extract():
+    from extract.realtime_extract import RealtimeExtract
+
+    return RealtimeExtract(IntervalUtil.base_interval())
+
+
+def test_extract_symbol_async_fetches_closed_candles(fake_api):
+    api, symbols = fake_api
+    extractor = _extract()
+
+    async def run():
+        try:
+            return await extractor.extract_symbol_async(symbols[0])
+        finally:
+            await extractor.aclose()
+
+    df, is_already_updated = asyncio.run(run())
+
+    assert not is_already_updated
+    assert api.stats()["requests"] >= 1
+    step = IntervalUtil.to_seconds(IntervalUtil.base_interval())
+    # ~2 ngày nến đã đóng, không trùng, tăng dần
+    assert abs(len(df) - 2 * 86400 // step) <= 2
+    assert df["datetime"].is_monotonic_increasing
+    assert df["datetime"].is_unique
+    assert set(df["symbol"]) == {symbols[0].upper()}
+
+
+def test_fetch_error_is_reported_as_error_not_empty(fake_api):
+    api, symbols = fake_api
+    api.error_rate = 1.0
+    extractor = _extract()
+    errors_before = (
+        Metrics()
+        ._counters.get("cmc_stage_errors_total", {})
+        .get(Metrics._key({"stage": "fetch", "source": "realtime"}), 0)
+    )
+
+    async def run():
+        try:
+            return await extractor.extract(symbols)
+        finally:
+            await extractor.aclose()
+
+    result = asyncio.run(run())
+
+    assert all(df.empty for df in result.values())
+    assert extractor.last_summary["errors"] == len(symbols)
+    assert extractor.last_summary["no_data"] == 0
+    errors_after = Metrics()._counters["cmc_stage_errors_total"][
+        Metrics._key({"stage": "fetch", "source": "realtime"})
+    ]
+    assert errors_after > errors_before
@@ -0,0 +1,51 @@
+"""
+Lease của ShardCoordinator khi MongoDB không heartbeat được.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+from configs.mongo_config import MongoConfig
+from pipeline.shard_coordinator import ShardCoordinator
+
+SYMBOLS = ["eth", "bnb", "xrp", "btc", "sol", "ada"]
+
+
+@pytest.fixture
+def coordinator(monkeypatch):
+    monkeypatch.setattr(MongoConfig(), "_client", mongomock.MongoClient())
+    coordinator = ShardCoordinator(owner="host-a:1")
+    coordinator.enabled = True
+    return coordinator
+
+
+def _unreachable(self):
+    raise ConnectionError("MongoDB unreachable")
+
+
+def test_owned_is_empty_once_lease_expires_without_heartbeat(coordinator, monkeypatch):
+    now = datetime(2024, 1, 1)
+    coordinator.heartbeat(now)
+    assert coordinator.owned(SYMBOLS, now) == SYMBOLS
+
+    monkeypatch.setattr(ShardCoordinator, "collection", property(_unreachable))
+    later = now + timedelta(seconds=coordinator.lease_seconds - 1)
+    coordinator.heartbeat(later)
+    # Lease cũ còn hạn: vẫn giữ symbol
+    assert coordinator.owned(SYMBOLS, later) == SYMBOLS
+
+    expired = now + timedelta(seconds=coordinator.lease_seconds)
+    coordinator.heartbeat(expired)
+    assert coordinator.owned(SYMBOLS, expired) == []
+
+    monkeypatch.undo()
+    monkeypatch.setattr(MongoConfig(), "_client", mongomock.MongoClient())
+    coordinator.heartbeat(expired)
+    assert coordinator.owned(SYMBOLS, expired) == SYMBOLS
+
+
+def test_owned_is_empty_before_first_heartbeat(coordinator):
+    assert coordinator.owned(SYMBOLS) == []
@@ -0,0 +1,120 @@
+"""
+Ghi đồng thời vào layout bucket / timeseries trên mongomock.
+
+Writer thứ 2 được chen vào đúng giữa lúc writer thứ nhất đã đọc bucket và
+chưa ghi (qua codec.to_records) để tái hiện race một cách tất định.
+"""
+
+import threading
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+from load.storage_backend import BucketStorage, TimeSeriesStorage
+from util.datetime_codec import DatetimeCodec
+
+
+def _candles(start: datetime, count: int, symbol: str = "ETH") -> pd.DataFrame:
+    times = pd.date_range(start, periods=count, freq="15min")
+    return pd.DataFrame(
+        {
+            "symbol": symbol,
+            "datetime": times,
+            "time_open": times - timedelta(minutes=15),
+            "close": [float(i) for i in range(count)],
+        }
+    )
+
+
+class InterleavingCodec(DatetimeCodec):
+    """Lần to_records đầu tiên chạy writer khác trước khi trả kết quả."""
+
+    def __init__(self, mode: str, interleave):
+        super().__init__(mode)
+        self.interleave = interleave
+
+    def to_records(self, df):
+        if self.interleave is not None:
+            interleave, self.interleave = self.interleave, None
+            interleave()
+        return super().to_records(df)
+
+
+@pytest.fixture()
+def db():
+    database = mongomock.MongoClient().get_database("storage_test")
+    for name, specs in BucketStorage(DatetimeCodec("datetime")).index_specs().items():
+        for index_name, keys, options in specs:
+            database.get_collection(name).create_index(keys, name=index_name, **options)
+    return database
+
+
+def _bucket_times(db, storage) -> list:
+    docs = db.get_collection(storage.bucket_collection_name).find({})
+    return sorted(
+        DatetimeCodec.decode(value)
+        for doc in docs
+        for value in doc["columns"]["datetime"]
+    )
+
+
+@pytest.mark.parametrize("existing_bucket", [False, True])
+def test_bucket_concurrent_writers_keep_all_candles(db, existing_bucket):
+    day = datetime(2026, 3, 1)
+    other = BucketStorage(DatetimeCodec("datetime"))
+    if existing_bucket:
+        other.write(db, _candles(day + timedelta(hours=12), 4))
+
+    first = _candles(day, 8)
+    second = _candles(day + timedelta(hours=6), 8)
+    storage = BucketStorage(
+        InterleavingCodec("datetime", lambda: other.write(db, second))
+    )
+    stats = storage.write(db, first)
+
+    expected = set(first["datetime"]) | set(second["datetime"])
+    if existing_bucket:
+        expected |= set(_candles(day + timedelta(hours=12), 4)["datetime"])
+    times = _bucket_times(db, storage)
+    assert times == sorted(t.to_pydatetime() for t in expected)
+    assert db.get_collection(storage.bucket_collection_name).count_documents({}) == 1
+    assert stats["errors"] == 0
+    assert stats["inserted"] == len(first)
+
+
+def test_timeseries_writers_do_not_duplicate_shared_edge(db):
+    storage = TimeSeriesStorage(DatetimeCodec("datetime"))
+    start = datetime(2026, 3, 1)
+    # 2 window chồng nhau 1 nến ở biên, mỗi window còn lặp lại nến đầu
+    windows = [_candles(start, 50), _candles(start + timedelta(minutes=15 * 49), 50)]
+    windows = [pd.concat([w, w.head(1)], ignore_index=True) for w in windows]
+
+    threads = [
+        threading.Thread(target=storage.write, args=(db, window)) for window in windows
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    collection = db.get_collection(storage.collection_name)
+    assert collection.count_documents({}) == 99
+    assert len(collection.distinct("datetime")) == 99
+
+
+@pytest.mark.parametrize("layout", [BucketStorage, TimeSeriesStorage])
+def test_latest_by_symbol_returns_newest_candle(db, layout):
+    storage = layout(DatetimeCodec("datetime"))
+    start = datetime(2026, 3, 1)
+    storage.write(db, _candles(start, 200, "ETH"))
+    storage.write(db, _candles(start, 10, "BTC"))
+
+    latest = storage.latest_by_symbol(db, ["eth", "btc", "xrp"])
+
+    assert latest == {
+        "ETH": start + timedelta(minutes=15 * 199),
+        "BTC": start + timedelta(minutes=15 * 9),
+    }